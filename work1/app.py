@@ -0,0 +1,78 @@
+"""
+应用工厂
+
+    from app import create_app
+    app = create_app('production')
+
+配置名对应 config/config.py 中的 config 字典（development / production / testing），
+不传时读取环境变量 FLASK_ENV，默认 development。
+生产环境通过 DATABASE_URL 连接数据库服务器，连接池大小由 DB_POOL_SIZE、DB_MAX_OVERFLOW 等环境变量控制。
+"""
+import os
+from flask import Flask
+from flask_login import LoginManager
+
+from config.config import config
+from models.database import db
+from models.user import User
+from utils.sqlite_profile import configure_sqlite, is_file_sqlite
+from utils.sql_profiler import sql_profiler
+from utils.metrics import metrics
+from services import attendance_rollup
+from services.attendance_writer import attendance_writer
+from sqlalchemy.engine import make_url
+
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+login_manager.login_message = '请先登录'
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    return User.query.get(int(user_id))
+
+
+def database_uri(uri):
+    """兼容 postgres:// 写法（SQLAlchemy 只接受 postgresql://）"""
+    if uri and uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def create_app(config_name=None):
+    """创建并配置应用"""
+    config_name = config_name or os.environ.get('FLASK_ENV') or 'default'
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    # 连接池参数只适用于文件 SQLite 和数据库服务器，内存数据库由 Flask-SQLAlchemy 使用单连接
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and not is_file_sqlite(url):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+
+    db.init_app(app)
+    configure_sqlite(app)
+    sql_profiler.init_app(app)
+    metrics.init_app(app)
+    login_manager.init_app(app)
+
+    # 注册蓝图
+    from routes.dorm import dorm_bp
+    from routes.main import main_bp
+    from routes.auth import auth_bp
+    from routes.admin import admin_bp
+    from routes.attendance import attendance_bp
+    from routes import legacy
+
+    app.register_blueprint(dorm_bp, url_prefix='/dorm')
+    app.register_blueprint(main_bp, url_prefix='/')
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(attendance_bp, url_prefix='/attendance')
+    legacy.init_app(app)
+
+    attendance_rollup.init_app(app)
+    attendance_writer.init_app(app)
+
+    return app
@@ -0,0 +1,56 @@
+"""Add bed counters to dormitories and buildings
+
+Revision ID: 3b9e4c71a2d5
+Revises: 726a2d682e97
+Create Date: 2026-10-17 21:40:12.508133
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e4c71a2d5'
+down_revision = '726a2d682e97'
+branch_labels = None
+depends_on = None
+
+COUNTERS = (
+    ('available_count', 'available'),
+    ('occupied_count', 'occupied'),
+    ('reserved_count', 'reserved'),
+)
+
+
+def upgrade():
+    for table in ('dormitories', 'buildings'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column, _ in COUNTERS:
+                batch_op.add_column(sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+    with op.batch_alter_table('dormitories', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_dormitories_available_count'), ['available_count'], unique=False)
+
+    # 按现有床位状态回填计数（状态为空的床位按空闲计）
+    for column, status in COUNTERS:
+        if status == 'available':
+            match = "(beds.status = 'available' OR beds.status IS NULL)"
+        else:
+            match = f"beds.status = '{status}'"
+        op.execute(
+            f"UPDATE dormitories SET {column} = "
+            f"(SELECT COUNT(*) FROM beds WHERE beds.dorm_id = dormitories.id AND {match})"
+        )
+        op.execute(
+            f"UPDATE buildings SET {column} = "
+            f"(SELECT COALESCE(SUM(dormitories.{column}), 0) FROM dormitories "
+            f"WHERE dormitories.building_id = buildings.id)"
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('dormitories', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_dormitories_available_count'))
+    for table in ('buildings', 'dormitories'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column, _ in reversed(COUNTERS):
+                batch_op.drop_column(column)
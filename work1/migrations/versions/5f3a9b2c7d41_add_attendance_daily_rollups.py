@@ -0,0 +1,34 @@
+"""Add attendance daily rollups
+
+Revision ID: 5f3a9b2c7d41
+Revises: 8c2d5e0f7a19
+Create Date: 2026-10-17 23:05:41.310274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f3a9b2c7d41'
+down_revision = '8c2d5e0f7a19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attendance_daily_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('building_id', sa.Integer(), nullable=False),
+    sa.Column('total_students', sa.Integer(), nullable=False),
+    sa.Column('checked_in', sa.Integer(), nullable=False),
+    sa.Column('finalized', sa.Boolean(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('date', 'building_id', name='unique_rollup_date_building')
+    )
+
+
+def downgrade():
+    op.drop_table('attendance_daily_rollups')
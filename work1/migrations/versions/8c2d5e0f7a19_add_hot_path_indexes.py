@@ -0,0 +1,54 @@
+"""Add composite indexes for hot query paths
+
+Revision ID: 8c2d5e0f7a19
+Revises: 3b9e4c71a2d5
+Create Date: 2026-10-17 22:05:41.226017
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2d5e0f7a19'
+down_revision = '3b9e4c71a2d5'
+branch_labels = None
+depends_on = None
+
+# (表名, 索引名, 列)
+INDEXES = (
+    ('beds', 'ix_beds_dorm_id_status', ['dorm_id', 'status']),
+    ('beds', 'ix_beds_status_dorm_id', ['status', 'dorm_id']),
+    ('students', 'ix_students_current_bed_id', ['current_bed_id']),
+    ('students', 'ix_students_gender_team_id', ['gender', 'team_id', 'current_bed_id']),
+    ('dorm_applications', 'ix_dorm_applications_student_type_status', ['student_id', 'application_type', 'status']),
+    ('dorm_applications', 'ix_dorm_applications_status_created_at', ['status', 'created_at']),
+    ('dorm_applications', 'ix_dorm_applications_created_at', ['created_at']),
+    ('messages', 'ix_messages_receiver_id_is_read', ['receiver_id', 'is_read']),
+    ('messages', 'ix_messages_sender_id', ['sender_id']),
+    ('dorm_reviews', 'ix_dorm_reviews_dorm_id_student_id', ['dorm_id', 'student_id']),
+    ('dorm_reviews', 'ix_dorm_reviews_student_id', ['student_id']),
+    ('announcements', 'ix_announcements_expire_at', ['expire_at']),
+)
+
+
+def _existing_tables():
+    # messages 表由 db.create_all() 创建，旧数据库中可能不存在
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    tables = _existing_tables()
+    for table, name, columns in INDEXES:
+        if table in tables:
+            op.create_index(name, table, columns, unique=False)
+    # 让 SQLite 查询规划器获得索引的统计信息
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('ANALYZE')
+
+
+def downgrade():
+    tables = _existing_tables()
+    for table, name, _ in reversed(INDEXES):
+        if table in tables:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,45 @@
+"""Add attendance month bitmaps
+
+Revision ID: 9a4e7c1d3b62
+Revises: 5f3a9b2c7d41
+Create Date: 2026-10-17 23:48:12.604917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4e7c1d3b62'
+down_revision = '5f3a9b2c7d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bitmaps = op.create_table('attendance_month_bitmaps',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('days', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'month', name='unique_bitmap_user_month')
+    )
+
+    # 由已有的打卡记录生成位图
+    records = sa.table('attendance_records', sa.column('user_id', sa.Integer), sa.column('date', sa.Date),
+                       sa.column('status', sa.String))
+    days = {}
+    for user_id, day in op.get_bind().execute(
+        sa.select(records.c.user_id, records.c.date).where(records.c.status == 'checked_in')
+    ):
+        key = (user_id, day.year * 100 + day.month)
+        days[key] = days.get(key, 0) | 1 << (day.day - 1)
+    if days:
+        op.bulk_insert(bitmaps, [{'user_id': user_id, 'month': month, 'days': bits}
+                                 for (user_id, month), bits in days.items()])
+
+
+def downgrade():
+    op.drop_table('attendance_month_bitmaps')
@@ -0,0 +1,33 @@
+"""Add attendance archives
+
+Revision ID: b7d3f5a8e210
+Revises: 9a4e7c1d3b62
+Create Date: 2026-10-18 00:32:07.118452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f5a8e210'
+down_revision = '9a4e7c1d3b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attendance_archives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('checked_in', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('month')
+    )
+
+
+def downgrade():
+    op.drop_table('attendance_archives')
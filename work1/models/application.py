@@ -35,6 +35,12 @@ class DormApplication(db.Model):
     student = db.relationship('Student', backref='applications')
     bed = db.relationship('Bed', backref='applications')
     processor = db.relationship('User', backref='processed_applications')
+    
+    __table_args__ = (
+        db.Index('ix_dorm_applications_student_type_status', 'student_id', 'application_type', 'status'),  # 学生的待审核申请
+        db.Index('ix_dorm_applications_status_created_at', 'status', 'created_at'),  # 待审核申请数、按时间列出
+        db.Index('ix_dorm_applications_created_at', 'created_at'),  # 最近申请
+    )
 
 class SelectionBatch(db.Model):
     """选宿批次管理"""
@@ -38,3 +38,55 @@ class AttendanceRecord(db.Model):
 
     def __repr__(self):
         return f"<AttendanceRecord user_id={self.user_id} date={self.date} status={self.status}>"
+
+
+class AttendanceMonthBitmap(db.Model):
+    """学生每月的打卡位图：days 的第 n 位（从 0 起）为 1 表示当月 n+1 日已打卡"""
+    __tablename__ = 'attendance_month_bitmaps'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    month = db.Column(db.Integer, nullable=False)  # 年*100+月，如 202610
+    days = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'month', name='unique_bitmap_user_month'),)
+
+    def __repr__(self):
+        return f"<AttendanceMonthBitmap user_id={self.user_id} month={self.month} days={self.days:#x}>"
+
+
+class AttendanceArchive(db.Model):
+    """已归档的打卡月份：该月的打卡记录已导出到压缩 CSV 文件并从 attendance_records 中删除"""
+    __tablename__ = 'attendance_archives'
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, nullable=False, unique=True)  # 年*100+月，如 202603
+    path = db.Column(db.String(255), nullable=False)  # 归档文件路径（相对 ATTENDANCE_ARCHIVE_DIR）
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    checked_in = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<AttendanceArchive month={self.month} rows={self.row_count}>"
+
+
+class AttendanceDailyRollup(db.Model):
+    """每天每栋楼的打卡汇总（building_id 为 0 表示未分配床位的学生）"""
+    __tablename__ = 'attendance_daily_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    building_id = db.Column(db.Integer, nullable=False, default=0)
+    total_students = db.Column(db.Integer, nullable=False, default=0)
+    checked_in = db.Column(db.Integer, nullable=False, default=0)
+    finalized = db.Column(db.Boolean, nullable=False, default=False)  # 当天结束后由定时任务按原始记录重算
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('date', 'building_id', name='unique_rollup_date_building'),)
+
+    @property
+    def absent(self):
+        return self.total_students - self.checked_in
+
+    def __repr__(self):
+        return f"<AttendanceDailyRollup date={self.date} building_id={self.building_id} {self.checked_in}/{self.total_students}>"
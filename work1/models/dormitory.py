@@ -1,5 +1,17 @@
+from collections import Counter
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
 from .database import db, BedStatus
 
+# 床位状态 -> 宿舍/楼栋上维护的计数列（维修中的床位不计数）
+BED_COUNTER_COLUMNS = {
+    BedStatus.AVAILABLE.value: 'available_count',
+    BedStatus.OCCUPIED.value: 'occupied_count',
+    BedStatus.RESERVED.value: 'reserved_count',
+}
+
 class Building(db.Model):
     __tablename__ = 'buildings'
     id = db.Column(db.Integer, primary_key=True)
@@ -11,6 +23,11 @@ class Building(db.Model):
     description = db.Column(db.Text)
     image_url = db.Column(db.String(200))
 
+    # 床位计数，随床位状态变化在同一事务中更新
+    available_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    occupied_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reserved_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
 class Dormitory(db.Model):
     __tablename__ = 'dormitories'
     id = db.Column(db.Integer, primary_key=True)
@@ -29,16 +46,17 @@ class Dormitory(db.Model):
     monthly_rent = db.Column(db.Float)  # 月租金
     area = db.Column(db.Float)  # 面积
     orientation = db.Column(db.String(20))  # 朝向
+
+    # 床位计数，随床位状态变化在同一事务中更新；筛选有空床的宿舍用 available_count > 0
+    available_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+    occupied_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reserved_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     building = db.relationship('Building', backref='dormitories')
     
     @property
     def available_beds(self):
         return [bed for bed in self.beds if bed.status == BedStatus.AVAILABLE.value]
-    
-    @property
-    def occupied_count(self):
-        return len([bed for bed in self.beds if bed.status == BedStatus.OCCUPIED.value])
 
 class Bed(db.Model):
     __tablename__ = 'beds'
@@ -49,3 +67,98 @@ class Bed(db.Model):
     status = db.Column(db.String(20), default=BedStatus.AVAILABLE.value)
     
     dorm = db.relationship('Dormitory', backref='beds')
+    
+    __table_args__ = (
+        db.Index('ix_beds_dorm_id_status', 'dorm_id', 'status'),  # 宿舍内找空床
+        db.Index('ix_beds_status_dorm_id', 'status', 'dorm_id'),  # 按状态统计/筛选宿舍
+    )
+
+
+def apply_bed_counter_deltas(session, deltas):
+    """
+    按 {宿舍ID: {床位状态: 增量}} 调整宿舍及所属楼栋的计数列
+    使用 count = count + n 形式的 UPDATE，并发事务之间不会互相覆盖；
+    批量 UPDATE 床位状态（不经过 ORM 事件）时需要手动调用
+    """
+    deltas = {dorm_id: {status: n for status, n in changes.items() if n and status in BED_COUNTER_COLUMNS}
+              for dorm_id, changes in deltas.items()}
+    deltas = {dorm_id: changes for dorm_id, changes in deltas.items() if changes}
+    if not deltas:
+        return
+
+    connection = session.connection()
+    dorms, buildings = Dormitory.__table__, Building.__table__
+    building_of = dict(connection.execute(
+        select(dorms.c.id, dorms.c.building_id).where(dorms.c.id.in_(deltas))
+    ).all())
+    building_deltas = {}
+    for dorm_id, changes in deltas.items():
+        connection.execute(dorms.update().where(dorms.c.id == dorm_id).values(
+            {BED_COUNTER_COLUMNS[status]: dorms.c[BED_COUNTER_COLUMNS[status]] + n
+             for status, n in changes.items()}
+        ))
+        building_id = building_of.get(dorm_id)
+        if building_id is not None:
+            building_deltas.setdefault(building_id, Counter()).update(changes)
+    for building_id, changes in building_deltas.items():
+        values = {BED_COUNTER_COLUMNS[status]: buildings.c[BED_COUNTER_COLUMNS[status]] + n
+                  for status, n in changes.items() if n}
+        if values:
+            connection.execute(buildings.update().where(buildings.c.id == building_id).values(values))
+
+    # 会话中已加载的宿舍/楼栋对象上的计数已过期，下次访问时重新读取
+    counters = list(BED_COUNTER_COLUMNS.values())
+    for model, ids in ((Dormitory, deltas), (Building, building_deltas)):
+        mapper = inspect(model)
+        for pk in ids:
+            obj = session.identity_map.get(mapper.identity_key_from_primary_key((pk,)))
+            if obj is not None:
+                session.expire(obj, counters)
+
+
+_PENDING_KEY = 'bed_counter_deltas'
+
+
+# 修改床位状态/所属宿舍时加载旧值，保证能从原来的计数中减去
+@event.listens_for(Bed.status, 'set', active_history=True)
+@event.listens_for(Bed.dorm_id, 'set', active_history=True)
+def _track_old_bed_value(target, value, oldvalue, initiator):
+    pass
+
+
+def _previous(obj, key):
+    history = inspect(obj).attrs[key].history
+    return history.deleted[0] if history.deleted else getattr(obj, key)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_bed_counter_deltas(session, flush_context):
+    """汇总本次 flush 中床位的状态变化"""
+    deltas = {}
+
+    def add(dorm_id, status, n):
+        if dorm_id is not None:
+            deltas.setdefault(dorm_id, Counter())[status or BedStatus.AVAILABLE.value] += n
+
+    for obj in session.new:
+        if isinstance(obj, Bed):
+            add(obj.dorm_id, obj.status, 1)
+    for obj in session.dirty:
+        if isinstance(obj, Bed):
+            state = inspect(obj)
+            if state.attrs.status.history.has_changes() or state.attrs.dorm_id.history.has_changes():
+                add(_previous(obj, 'dorm_id'), _previous(obj, 'status'), -1)
+                add(obj.dorm_id, obj.status, 1)
+    for obj in session.deleted:
+        if isinstance(obj, Bed):
+            add(_previous(obj, 'dorm_id'), _previous(obj, 'status'), -1)
+    if deltas:
+        session.info[_PENDING_KEY] = deltas
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_bed_counter_deltas(session, flush_context):
+    # 在同一事务内写回计数，与床位状态一起提交或回滚
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        apply_bed_counter_deltas(session, deltas)
@@ -18,6 +18,11 @@ class DormReview(db.Model):
     
     dorm = db.relationship('Dormitory', backref='reviews')
     student = db.relationship('Student', backref='reviews')
+    
+    __table_args__ = (
+        db.Index('ix_dorm_reviews_dorm_id_student_id', 'dorm_id', 'student_id'),  # 宿舍评价列表、是否已评价
+        db.Index('ix_dorm_reviews_student_id', 'student_id'),  # 我的评价
+    )
 
 class Announcement(db.Model):
     """公告通知"""
@@ -33,4 +38,25 @@ class Announcement(db.Model):
     expire_at = db.Column(db.DateTime)
     
     author = db.relationship('User', backref='announcements')
+    
+    __table_args__ = (
+        db.Index('ix_announcements_expire_at', 'expire_at'),  # 首页未过期公告
+    )
 
+class Message(db.Model):
+    """学生之间的消息"""
+    __tablename__ = 'messages'
+    id = db.Column(db.Integer, primary_key=True)
+    sender_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
+    receiver_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    is_read = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    sender = db.relationship('Student', foreign_keys=[sender_id], backref='sent_messages')
+    receiver = db.relationship('Student', foreign_keys=[receiver_id], backref='received_messages')
+    
+    __table_args__ = (
+        db.Index('ix_messages_receiver_id_is_read', 'receiver_id', 'is_read'),  # 收件箱、未读数
+        db.Index('ix_messages_sender_id', 'sender_id'),  # 发件箱
+    )
@@ -43,3 +43,8 @@ class Student(db.Model):
     
     major = db.relationship('Major', backref='students')
     current_bed = db.relationship('Bed', foreign_keys=[current_bed_id], backref='current_student')
+    
+    __table_args__ = (
+        db.Index('ix_students_current_bed_id', 'current_bed_id'),  # 查床位上的学生、室友
+        db.Index('ix_students_gender_team_id', 'gender', 'team_id', 'current_bed_id'),  # 室友匹配候选人
+    )
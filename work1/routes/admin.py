@@ -1,10 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from datetime import datetime, date
-from models.database import db, UserRole, BedStatus, ApplicationStatus, AttendanceRecord
-from models.user import Student, User
-from models.dormitory import Dormitory, Building, Bed
+from sqlalchemy.orm import joinedload
+from datetime import datetime
+from models.database import db, UserRole, BedStatus, ApplicationStatus
+from models.user import Student
+from models.dormitory import Dormitory, Bed
 from models.application import DormApplication
+from services import attendance_service, bed_service
+from services.bed_service import BedConflictError
+from services.student_import import import_jobs
+from utils.sql_profiler import sql_profiler
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -26,25 +31,15 @@ def dashboard():
     }
     
     # 最新申请
-    recent_applications = DormApplication.query.order_by(
+    recent_applications = DormApplication.query.options(
+        joinedload(DormApplication.student),
+        joinedload(DormApplication.bed).joinedload(Bed.dorm).joinedload(Dormitory.building)
+    ).order_by(
         DormApplication.created_at.desc()
     ).limit(10).all()
     
-    # 获取今日打卡统计
-    today = date.today()
-    total_students = User.query.filter_by(role=UserRole.STUDENT.value).count()
-    checked_in_today = AttendanceRecord.query.filter_by(
-        date=today,
-        status='checked_in'
-    ).count()
-    not_checked_today = total_students - checked_in_today
-    
-    attendance_stats = {
-        'total_students': total_students,
-        'checked_in': checked_in_today,
-        'not_checked': not_checked_today,
-        'date': today.isoformat()
-    }
+    # 获取今日打卡统计（一条聚合查询）
+    attendance_stats = attendance_service.daily_summary()
     
     return render_template('admin/dashboard.html',
                          stats=stats,
@@ -70,46 +65,46 @@ def process_application(app_id):
         
         student = application.student
         
-        # 处理换宿申请
-        if application.application_type == 'change':
-            # 检查目标床位是否仍然可用
-            target_bed = application.bed
-            if target_bed.status != BedStatus.RESERVED.value:
-                flash('目标床位状态已变更，无法批准申请', 'error')
-                return redirect(request.referrer or url_for('admin.dashboard'))
+        try:
+            # 处理换宿申请
+            if application.application_type == 'change':
+                # 目标床位必须仍处于预留状态
+                target_bed = application.bed
+                bed_service.occupy(target_bed.id)
+                
+                # 释放原床位
+                if student.current_bed_id:
+                    bed_service.release(student.current_bed_id, expected=BedStatus.OCCUPIED.value)
+                
+                # 分配新床位
+                student.current_bed_id = target_bed.id
+                
+                application.status = ApplicationStatus.APPROVED.value
+                flash('换宿申请已批准', 'success')
             
-            # 释放原床位
-            if student.current_bed:
-                old_bed = student.current_bed
-                old_bed.status = BedStatus.AVAILABLE.value
+            # 处理新申请（选宿）
+            elif application.application_type == 'new':
+                # 检查学生是否已有床位
+                if student.current_bed_id:
+                    # 释放预留的床位
+                    bed_service.release_if_reserved(application.bed_id)
+                    db.session.commit()
+                    flash('该学生已有床位，无法批准新申请', 'error')
+                    return redirect(request.referrer or url_for('admin.dashboard'))
+                
+                # 分配床位
+                bed_service.occupy(application.bed_id)
+                student.current_bed_id = application.bed_id
+                
+                application.status = ApplicationStatus.APPROVED.value
+                flash('选宿申请已批准', 'success')
             
-            # 分配新床位
-            target_bed.status = BedStatus.OCCUPIED.value
-            student.current_bed_id = target_bed.id
-            
-            application.status = ApplicationStatus.APPROVED.value
-            flash('换宿申请已批准', 'success')
-        
-        # 处理新申请（选宿）
-        elif application.application_type == 'new':
-            # 检查学生是否已有床位
-            if student.current_bed_id:
-                flash('该学生已有床位，无法批准新申请', 'error')
-                # 释放预留的床位
-                if application.bed.status == BedStatus.RESERVED.value:
-                    application.bed.status = BedStatus.AVAILABLE.value
+            else:
+                flash('未知的申请类型', 'error')
                 return redirect(request.referrer or url_for('admin.dashboard'))
-            
-            # 分配床位
-            bed = application.bed
-            bed.status = BedStatus.OCCUPIED.value
-            student.current_bed_id = bed.id
-            
-            application.status = ApplicationStatus.APPROVED.value
-            flash('选宿申请已批准', 'success')
-        
-        else:
-            flash('未知的申请类型', 'error')
+        except BedConflictError:
+            db.session.rollback()
+            flash('目标床位状态已变更，无法批准申请', 'error')
             return redirect(request.referrer or url_for('admin.dashboard'))
         
     elif action == 'reject':
@@ -119,8 +114,8 @@ def process_application(app_id):
         
         application.status = ApplicationStatus.REJECTED.value
         # 释放预留的床位
-        if application.bed and application.bed.status == BedStatus.RESERVED.value:
-            application.bed.status = BedStatus.AVAILABLE.value
+        if application.bed_id:
+            bed_service.release_if_reserved(application.bed_id)
         
         if application.application_type == 'change':
             flash('换宿申请已拒绝', 'info')
@@ -138,3 +133,61 @@ def process_application(app_id):
         db.session.rollback()
         flash(f'处理申请时发生错误：{str(e)}', 'error')
         return redirect(request.referrer or url_for('admin.dashboard'))
+
+@admin_bp.route('/sql-profile', methods=['GET', 'DELETE'])
+@login_required
+def sql_profile():
+    """各端点最近请求的 SQL 条数、数据库耗时和最慢语句；?order=queries_avg 等指定排序字段，DELETE 清空统计"""
+    if current_user.role != UserRole.ADMIN.value:
+        return jsonify({'error': '权限不足'}), 403
+    
+    if request.method == 'DELETE':
+        sql_profiler.reset()
+        return jsonify({'message': '统计已清空'})
+    
+    stats = sql_profiler.snapshot(request.args.get('order', 'db_ms_avg'))
+    return jsonify({
+        'slow_query_ms': sql_profiler.slow_ms,
+        'window': sql_profiler.window,
+        'endpoints': stats
+    })
+
+@admin_bp.route('/students/import', methods=['POST'])
+@login_required
+def import_students_csv():
+    """
+    上传 CSV 批量导入学生（表头格式见 services/student_import.py）
+    表单字段：file（CSV 文件）、assign=1 导入后整批分配宿舍、capacity 宿舍人数偏好
+    导入在后台进行，返回 202 和任务状态，之后通过 status_url 查询结果
+    """
+    if current_user.role != UserRole.ADMIN.value:
+        return jsonify({'error': '权限不足'}), 403
+    
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': '请上传 CSV 文件'}), 400
+    
+    try:
+        job = import_jobs.submit(
+            upload,
+            assign=request.form.get('assign') == '1',
+            preferred_capacity=request.form.get('capacity', type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': f'文件格式错误：{e}'}), 400
+    
+    job['status_url'] = url_for('admin.import_status', job_id=job['id'])
+    return jsonify(job), 202
+
+
+@admin_bp.route('/students/import/<job_id>')
+@login_required
+def import_status(job_id):
+    """查询批量导入任务的状态和结果"""
+    if current_user.role != UserRole.ADMIN.value:
+        return jsonify({'error': '权限不足'}), 403
+    
+    job = import_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job)
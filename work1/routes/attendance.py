@@ -1,61 +1,58 @@
-from flask import Blueprint, request, jsonify, render_template
+import csv
+import io
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from datetime import datetime, date, timedelta
 from models.database import db, AttendanceRecord
-from models.user import User, Student
+from services import attendance_archive, attendance_rollup, attendance_service
+from services.attendance_calendar import get_calendar
+from services.attendance_writer import attendance_writer
+from utils.metrics import metrics
 
 attendance_bp = Blueprint('attendance', __name__)
 
+# 打卡日程表单次查询的最长天数
+MAX_RECORD_DAYS = 366
+
 @attendance_bp.route('/check_in', methods=['POST'])
 @login_required
 def check_in():
-    """用户打卡接口"""
-    today = date.today()
-    
-    # 检查今天是否已经打卡
-    existing_record = AttendanceRecord.query.filter_by(
-        user_id=current_user.id,
-        date=today
-    ).first()
-    
-    if existing_record:
-        if existing_record.status == 'checked_in':
-            return jsonify({
-                'success': False,
-                'message': '今天已经打卡过了！'
-            }), 400
-        else:
-            # 如果之前是未打卡状态，更新为已打卡
-            existing_record.status = 'checked_in'
-            existing_record.check_in_time = datetime.utcnow()
-    else:
-        # 创建新的打卡记录
-        new_record = AttendanceRecord(
-            user_id=current_user.id,
-            date=today,
-            status='checked_in',
-            check_in_time=datetime.utcnow()
-        )
-        db.session.add(new_record)
-    
+    """用户打卡接口（一条 upsert 语句完成，见 services/attendance_service.py）"""
     try:
-        db.session.commit()
-        return jsonify({
-            'success': True,
-            'message': '打卡成功！'
-        }), 200
+        if attendance_writer.enabled:
+            # 写缓冲模式：写入打卡日志即返回，后台批量写入数据库
+            checked_in = attendance_writer.check_in(current_user.id)
+        else:
+            checked_in = attendance_service.check_in(current_user.id)
+            db.session.commit()
     except Exception as e:
         db.session.rollback()
         return jsonify({
             'success': False,
             'message': f'打卡失败：{str(e)}'
         }), 500
+    
+    if not checked_in:
+        return jsonify({
+            'success': False,
+            'message': '今天已经打卡过了！'
+        }), 400
+    
+    metrics.record_checkin()
+    return jsonify({
+        'success': True,
+        'message': '打卡成功！'
+    }), 200
 
 @attendance_bp.route('/check_today', methods=['GET'])
 @login_required
 def check_today():
     """检查今天是否已打卡"""
     today = date.today()
+    checked_in_at = attendance_writer.checked_in_at(current_user.id, today) if attendance_writer.enabled else None
+    if checked_in_at:
+        # 写缓冲模式下刚打的卡可能还没写入数据库
+        return jsonify({'checked': True, 'check_in_time': checked_in_at.isoformat()}), 200
     record = AttendanceRecord.query.filter_by(
         user_id=current_user.id,
         date=today
@@ -74,34 +71,32 @@ def check_today():
 @attendance_bp.route('/records', methods=['GET'])
 @login_required
 def get_records():
-    """获取用户的打卡记录（用于日程表）"""
-    # 获取最近30天的记录
-    start_date = date.today() - timedelta(days=30)
-    end_date = date.today()
-    
-    records = AttendanceRecord.query.filter(
-        AttendanceRecord.user_id == current_user.id,
-        AttendanceRecord.date >= start_date,
-        AttendanceRecord.date <= end_date
-    ).all()
-    
-    # 构建日期到状态的映射
-    record_dict = {r.date: r.status for r in records}
-    
-    # 生成最近30天的日期列表
-    date_list = []
-    current = start_date
-    while current <= end_date:
-        status = record_dict.get(current, 'not_checked')
-        date_list.append({
-            'date': current.isoformat(),
-            'status': status
-        })
-        current += timedelta(days=1)
+    """获取用户的打卡日程表、连续打卡天数和每月出勤率，默认最近30天，可用 start/end 指定范围"""
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args else date.today()
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args \
+            else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': '日期格式应为 YYYY-MM-DD'
+        }), 400
+    if start > end or (end - start).days > MAX_RECORD_DAYS:
+        return jsonify({
+            'success': False,
+            'message': f'查询范围应在 {MAX_RECORD_DAYS} 天以内'
+        }), 400
+    
+    # 只读取范围内各月的打卡位图
+    days, streak, months = get_calendar(current_user.id, start, end)
     
     return jsonify({
         'success': True,
-        'records': date_list
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'records': [{'date': d['date'].isoformat(), 'status': d['status']} for d in days],
+        'streak': streak,
+        'months': months
     }), 200
 
 @attendance_bp.route('/statistics', methods=['GET'])
@@ -122,23 +117,127 @@ def get_statistics():
     except:
         query_date = date.today()
     
-    # 获取所有学生用户
-    students = User.query.filter_by(role='student').all()
-    total_students = len(students)
-    
-    # 获取该日期的打卡记录
-    checked_records = AttendanceRecord.query.filter_by(
-        date=query_date,
-        status='checked_in'
-    ).count()
+    # 分组层级：building / floor / dorm
+    group_by = request.args.get('group_by', 'building')
+    if group_by not in attendance_service.GROUP_LEVELS:
+        return jsonify({
+            'success': False,
+            'message': '分组方式只能是 building、floor 或 dorm'
+        }), 400
     
-    not_checked = total_students - checked_records
+    # 按楼栋读每日汇总表（该天还没有汇总行时现算）；楼层/宿舍一条分组查询得到各组人数。总数由各组相加
+    groups = attendance_rollup.building_stats(query_date) if group_by == 'building' else None
+    if groups is None:
+        groups = attendance_service.daily_breakdown(query_date, group_by)
+    total_students = sum(group['total'] for group in groups)
+    checked_in = sum(group['checked_in'] for group in groups)
     
     return jsonify({
         'success': True,
         'date': query_date.isoformat(),
         'total_students': total_students,
-        'checked_in': checked_records,
-        'not_checked': not_checked
+        'checked_in': checked_in,
+        'not_checked': total_students - checked_in,
+        'group_by': group_by,
+        'groups': groups
+    }), 200
+
+@attendance_bp.route('/trend', methods=['GET'])
+@login_required
+def get_trend():
+    """每日打卡趋势（管理员使用），读每日汇总表，默认最近30天"""
+    if current_user.role != 'admin':
+        return jsonify({
+            'success': False,
+            'message': '权限不足'
+        }), 403
+    
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args else date.today()
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args \
+            else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': '日期格式应为 YYYY-MM-DD'
+        }), 400
+    building_id = request.args.get('building_id', type=int)
+    
+    return jsonify({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': attendance_rollup.trend(start, end, building_id)
     }), 200
 
+@attendance_bp.route('/absentees', methods=['GET'])
+@login_required
+def absentees():
+    """未打卡学生名单（CSV，查寝用），边查询边输出"""
+    if current_user.role != 'admin':
+        return jsonify({
+            'success': False,
+            'message': '权限不足'
+        }), 403
+    
+    query_date_str = request.args.get('date', date.today().isoformat())
+    try:
+        query_date = datetime.strptime(query_date_str, '%Y-%m-%d').date()
+    except ValueError:
+        query_date = date.today()
+    building_id = request.args.get('building_id', type=int)
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['学号', '姓名', '电话', '楼栋', '楼层', '房间', '床号'])
+        for _, student_id, name, phone, building, floor, room_number, bed_number in \
+                attendance_service.iter_absentees(query_date, building_id):
+            writer.writerow([student_id, name, phone, building, floor, room_number, bed_number])
+            if buffer.tell() >= 8192:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    filename = f'absentees-{query_date.isoformat()}.csv'
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@attendance_bp.route('/export', methods=['GET'])
+@login_required
+def export_records():
+    """导出 start 到 end 的打卡记录（CSV，管理员使用）；已归档的月份从归档文件读取"""
+    if current_user.role != 'admin':
+        return jsonify({
+            'success': False,
+            'message': '权限不足'
+        }), 403
+    
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args else date.today()
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args \
+            else end.replace(day=1)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': '日期格式应为 YYYY-MM-DD'
+        }), 400
+    user_id = request.args.get('user_id', type=int)
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['用户ID', '日期', '状态', '打卡时间'])
+        for row in attendance_archive.iter_records(start, end, user_id):
+            writer.writerow([row.user_id, row.date.isoformat(), row.status,
+                             row.check_in_time.isoformat() if row.check_in_time else ''])
+            if buffer.tell() >= 8192:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    filename = f'attendance-{start.isoformat()}-{end.isoformat()}.csv'
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
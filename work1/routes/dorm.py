@@ -1,10 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
-from datetime import datetime
-from models.database import db, BedStatus, ApplicationStatus
+from sqlalchemy.orm import joinedload, contains_eager
+from models.database import db, ApplicationStatus
 from models.dormitory import Dormitory, Building, Bed
-from models.user import Student
 from models.application import DormApplication
+from services import bed_service
+from services.batch_resolver import batch_resolver
+from services.bed_service import BedConflictError
+from services.selection_rush import selection_ledger, ClaimRejected
 
 dorm_bp = Blueprint('dorm', __name__)
 
@@ -15,9 +18,10 @@ def browse():
     capacity = request.args.get('capacity', type=int)
     floor = request.args.get('floor', type=int)
     gender = request.args.get('gender')
+    has_beds = request.args.get('has_beds', type=int)
     
-    # 构建查询
-    query = Dormitory.query.join(Building)
+    # 构建查询（楼栋随宿舍一起取出）
+    query = Dormitory.query.join(Building).options(contains_eager(Dormitory.building))
     
     # 基础筛选
     if building_id:
@@ -28,6 +32,8 @@ def browse():
         query = query.filter(Dormitory.floor == floor)
     if gender:
         query = query.filter(Building.gender == gender)
+    if has_beds:
+        query = query.filter(Dormitory.available_count > 0)
     
     # 分页
     page = request.args.get('page', 1, type=int)
@@ -43,18 +49,18 @@ def browse():
 
 @dorm_bp.route('/<int:dorm_id>')
 def detail(dorm_id):
-    dorm = Dormitory.query.get_or_404(dorm_id)
+    dorm = Dormitory.query.options(joinedload(Dormitory.building)).filter_by(id=dorm_id).first_or_404()
     
-    # 获取评价统计
+    # 获取评价统计（评价人随评价一起取出）
     from models.system import DormReview
-    reviews = DormReview.query.filter_by(dorm_id=dorm_id).all()
+    reviews = DormReview.query.options(joinedload(DormReview.student)).filter_by(dorm_id=dorm_id).all()
     avg_rating = sum(r.rating for r in reviews) / len(reviews) if reviews else 0
     
     # 获取床位状态
     beds_status = {
-        'available': len([b for b in dorm.beds if b.status == BedStatus.AVAILABLE.value]),
-        'occupied': len([b for b in dorm.beds if b.status == BedStatus.OCCUPIED.value]),
-        'reserved': len([b for b in dorm.beds if b.status == BedStatus.RESERVED.value])
+        'available': dorm.available_count,
+        'occupied': dorm.occupied_count,
+        'reserved': dorm.reserved_count
     }
     
     return render_template('dorms/detail.html',
@@ -69,48 +75,78 @@ def select(dorm_id):
     student = current_user.student
     bed_id = request.form.get('bed_id', type=int)
     
-    # 检查是否在选宿时间内
-    from models.application import SelectionBatch
-    current_batch = SelectionBatch.query.filter(
-        SelectionBatch.is_active == True,
-        SelectionBatch.start_time <= datetime.utcnow(),
-        SelectionBatch.end_time >= datetime.utcnow()
-    ).first()
+    # 检查是否在适用于该学生的选宿批次时间内（批次从内存中解析，不访问数据库）
+    current_batch = batch_resolver.for_student(student)
     
     if not current_batch:
         flash('当前不在选宿时间内', 'error')
         return redirect(url_for('dorm.detail', dorm_id=dorm_id))
     
-    # 检查床位状态
-    bed = Bed.query.get_or_404(bed_id)
-    if bed.status != BedStatus.AVAILABLE.value:
-        flash('该床位已被占用', 'error')
+    # 选宿高峰模式：账本属于该学生的批次时直接在内存账本中抢床；
+    # 账本正被另一个开放中的批次（例如其他年级）使用时，该学生走下面的逐请求流程
+    if current_app.config.get('SELECTION_RUSH_MODE') and \
+            selection_ledger.open(current_app._get_current_object(), current_batch):
+        return _rush_select(student, dorm_id, bed_id)
+    
+    bed = Bed.query.options(joinedload(Bed.dorm).joinedload(Dormitory.building)).filter_by(id=bed_id).first_or_404()
+    if bed.dorm_id != dorm_id:
+        flash('床位不属于该宿舍', 'error')
+        return redirect(url_for('dorm.detail', dorm_id=dorm_id))
+    if bed.dorm.building.gender != student.gender:
+        flash('该宿舍楼与您的性别不符', 'error')
+        return redirect(url_for('dorm.detail', dorm_id=dorm_id))
+    
+    # 检查学生是否已有床位
+    if student.current_bed_id:
+        flash('您已有床位，请先退宿后再申请', 'error')
         return redirect(url_for('dorm.detail', dorm_id=dorm_id))
     
     # 创建申请
     application = DormApplication(
         #学生申请换宿，床位id，申请类型，状态
         student_id=student.id,
-        bed_id=bed_id,
+        bed_id=bed.id,
         application_type='new',
         status=ApplicationStatus.PENDING.value
     )
     
     try:
-        # 检查学生是否已有床位
-        if student.current_bed_id:
-            flash('您已有床位，请先退宿后再申请', 'error')
-            return redirect(url_for('dorm.detail', dorm_id=dorm_id))
-        
-        # 更新床位状态为预留
-        bed.status = BedStatus.RESERVED.value
+        # 更新床位状态为预留（条件更新，并发选同一张床只有一人成功）
+        bed_service.reserve(bed.id)
         
         db.session.add(application)
         db.session.commit()
         
         flash('选宿申请已提交，请等待审核', 'success')
         return redirect(url_for('student_dashboard'))
+    except BedConflictError:
+        db.session.rollback()
+        flash('该床位已被占用', 'error')
+        return redirect(url_for('dorm.detail', dorm_id=dorm_id))
     except Exception as e:
         db.session.rollback()
         flash(f'提交申请时发生错误：{str(e)}', 'error')
         return redirect(url_for('dorm.detail', dorm_id=dorm_id))
+
+def _rush_select(student, dorm_id, bed_id):
+    """高峰模式下的选床：抢到即返回，申请由后台批量写入"""
+    if student.current_bed_id:
+        flash('您已有床位，请先退宿后再申请', 'error')
+        return redirect(url_for('dorm.detail', dorm_id=dorm_id))
+    try:
+        selection_ledger.claim(student.id, bed_id, dorm_id, student.gender)
+    except ClaimRejected as e:
+        flash(str(e), 'error')
+        return redirect(url_for('dorm.detail', dorm_id=dorm_id))
+    flash('选宿申请已提交，请等待审核', 'success')
+    return redirect(url_for('student_dashboard'))
+
+@dorm_bp.route('/select/status')
+@login_required
+def select_status():
+    """高峰模式下查询抢床结果：pending 等待写入 / submitted 已提交 / failed 床位已被占用"""
+    student = current_user.student
+    state = selection_ledger.status(student.id) if student else None
+    if state is None:
+        return jsonify({'status': None})
+    return jsonify({'status': state[0], 'bed_id': state[1]})
@@ -0,0 +1,1151 @@
+"""
+核心页面路由（原先直接定义在 start.py 的 app 上）
+
+模板和各蓝图中大量使用 url_for('register')、url_for('student_dashboard') 这类不带蓝图前缀的端点名，
+因此这些路由不放进 Blueprint，而是用 route() 先登记，由应用工厂调用 init_app(app) 注册到应用上。
+"""
+from flask import render_template, request, redirect, url_for, flash, jsonify
+from datetime import datetime, timedelta, date
+from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy.orm import joinedload, selectinload, contains_eager
+from werkzeug.security import generate_password_hash, check_password_hash
+from models.database import db, UserRole, BedStatus, ApplicationStatus
+from models.user import User, Student, Major
+from models.dormitory import Building, Dormitory, Bed
+from models.application import DormTeam, DormApplication
+from models.system import DormReview, Message
+from services import bed_service
+from services.assign_service import assign_and_occupy
+from services.attendance_calendar import get_calendar
+from services.batch_resolver import batch_resolver
+from services.bed_service import BedConflictError
+from services.dorm_service import DormService
+from services.home_cache import home_cache
+from services.roommate_matcher import roommate_matcher
+
+_rules = []
+
+
+def route(rule, **options):
+    """用法与 app.route 相同：先登记路由，init_app 时注册"""
+    def decorator(view):
+        _rules.append((rule, options.pop('endpoint', view.__name__), view, options))
+        return view
+    return decorator
+
+
+# 路由部分
+@route('/')
+def index():
+    # 公告和当前选宿批次来自首页缓存，稳定状态下不查询数据库
+    announcements, current_batch = home_cache.get()
+    
+    return render_template('index.html', 
+                         announcements=announcements,
+                         current_batch=current_batch)
+
+@route('/register', methods=['GET', 'POST'])
+#接收表单信息
+def register():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        name = request.form['name']
+        student_id = request.form['student_id']
+        id_card = request.form['id_card']
+        gender = request.form['gender']
+        major_id = request.form['major_id']
+        phone = request.form['phone']
+        email = request.form['email']
+        
+        # 生活习惯信息
+        sleep_time = request.form.get('sleep_time')
+        wake_time = request.form.get('wake_time')
+        hobbies = request.form.get('hobbies')
+        
+        # 宿舍偏好信息
+        preferred_capacity = request.form.get('preferred_capacity', type=int)
+        
+        # 检查用户名是否存在
+        if User.query.filter_by(username=username).first():
+            flash('用户名已存在', 'error')
+            return redirect(url_for('register'))
+        
+        # 创建用户
+        user = User(
+            username=username,
+            password_hash=generate_password_hash(password),
+            role=UserRole.STUDENT.value
+        )
+        db.session.add(user)
+        db.session.flush()
+        
+        # 创建学生信息
+        student = Student(
+            user_id=user.id,
+            student_id=student_id,
+            name=name,
+            id_card=id_card,
+            gender=gender,
+            major_id=major_id,
+            phone=phone,
+            email=email,
+            grade=datetime.now().year,
+            sleep_time=sleep_time,
+            wake_time=wake_time,
+            hobbies=hobbies
+        )
+        db.session.add(student)
+        db.session.flush()  # 获取student.id
+        
+        # 自动分配宿舍
+        assigned_bed = assign_and_occupy(student, preferred_capacity)
+        if assigned_bed:
+            flash(f'注册成功，宿舍已自动分配（{assigned_bed.dorm.capacity}人间），请登录', 'success')
+        else:
+            flash('注册成功，但暂无可用宿舍，请稍后联系管理员', 'warning')
+        
+        db.session.commit()
+        return redirect(url_for('login'))
+    
+    # 如果数据库中没有楼栋数据，先创建10栋宿舍楼
+    if Building.query.count() == 0:
+        buildings_data = [
+            {'name': '1号宿舍楼', 'gender': '男', 'total_floors': 10, 'location': '校园东区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+            {'name': '2号宿舍楼', 'gender': '女', 'total_floors': 10, 'location': '校园东区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+            {'name': '3号宿舍楼', 'gender': '男', 'total_floors': 10, 'location': '校园西区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+            {'name': '4号宿舍楼', 'gender': '女', 'total_floors': 10, 'location': '校园西区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+            {'name': '5号宿舍楼', 'gender': '男', 'total_floors': 10, 'location': '校园南区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+            {'name': '6号宿舍楼', 'gender': '女', 'total_floors': 10, 'location': '校园南区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+            {'name': '7号宿舍楼', 'gender': '男', 'total_floors': 10, 'location': '校园北区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+            {'name': '8号宿舍楼', 'gender': '女', 'total_floors': 10, 'location': '校园北区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+            {'name': '9号宿舍楼', 'gender': '男', 'total_floors': 10, 'location': '校园中心区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+            {'name': '10号宿舍楼', 'gender': '女', 'total_floors': 10, 'location': '校园中心区', 'facilities': '24小时热水、WiFi覆盖、门禁系统、电梯', 'description': '现代化学生宿舍，设施齐全，环境优美'},
+        ]
+        
+        for building_data in buildings_data:
+            building = Building(**building_data)
+            db.session.add(building)
+        db.session.commit()
+        
+        # 为每栋楼创建宿舍房间
+        buildings = Building.query.all()
+        for building in buildings:
+            for floor in range(1, building.total_floors + 1):
+                # 每层创建25个房间（1-25号）
+                for room_num in range(1, 26):
+                    room_number = f"{floor:02d}{room_num:02d}"
+                    
+                    # 随机分配4人间或6人间
+                    import random
+                    capacity = random.choice([4, 6])
+                    
+                    dorm = Dormitory(
+                        building_id=building.id,
+                        room_number=room_number,
+                        floor=floor,
+                        capacity=capacity,
+                        room_type='标准间',
+                        has_ac=True,
+                        has_bathroom=True,
+                        has_balcony=floor >= 3,
+                        has_water_heater=True,
+                        monthly_rent=800.0 if capacity == 4 else 600.0,  # 4人间贵一些
+                        area=20.0 if capacity == 4 else 25.0,
+                        orientation='南向' if room_num % 2 == 0 else '北向'
+                    )
+                    db.session.add(dorm)
+        
+        db.session.commit()
+        
+        # 为每个宿舍创建床位
+        dorms = Dormitory.query.all()
+        for dorm in dorms:
+            for bed_num in range(1, dorm.capacity + 1):
+                position = '上铺' if bed_num % 2 == 0 else '下铺'
+                bed = Bed(
+                    dorm_id=dorm.id,
+                    bed_number=bed_num,
+                    position=position,
+                    status=BedStatus.AVAILABLE.value
+                )
+                db.session.add(bed)
+        
+        db.session.commit()
+    
+    # 创建管理员账号
+    if not User.query.filter_by(username='admin').first():
+        admin_user = User(
+            username='admin',
+            password_hash=generate_password_hash('admin123'),
+            role=UserRole.ADMIN.value
+        )
+        db.session.add(admin_user)
+        db.session.commit()
+        print("✅ 管理员账号已创建：admin / admin123")
+    
+    # 如果数据库中没有专业数据，先创建一些基础专业
+    if Major.query.count() == 0:
+        majors_data = [
+            {'name': '计算机科学与技术', 'code': 'CS001', 'department': '计算机学院'},
+            {'name': '软件工程', 'code': 'SE001', 'department': '计算机学院'},
+            {'name': '数据科学与大数据技术', 'code': 'DS001', 'department': '计算机学院'},
+            {'name': '人工智能', 'code': 'AI001', 'department': '计算机学院'},
+            {'name': '网络工程', 'code': 'NE001', 'department': '计算机学院'},
+            {'name': '信息安全', 'code': 'IS001', 'department': '计算机学院'},
+            {'name': '电子信息工程', 'code': 'EE001', 'department': '电子工程学院'},
+            {'name': '通信工程', 'code': 'CE001', 'department': '电子工程学院'},
+            {'name': '自动化', 'code': 'AU001', 'department': '电子工程学院'},
+            {'name': '电气工程及其自动化', 'code': 'EA001', 'department': '电子工程学院'},
+            {'name': '机械工程', 'code': 'ME001', 'department': '机械工程学院'},
+            {'name': '机械设计制造及其自动化', 'code': 'MD001', 'department': '机械工程学院'},
+            {'name': '材料科学与工程', 'code': 'MS001', 'department': '材料学院'},
+            {'name': '化学工程与工艺', 'code': 'CE002', 'department': '化学学院'},
+            {'name': '生物工程', 'code': 'BE001', 'department': '生物学院'},
+            {'name': '土木工程', 'code': 'CE003', 'department': '土木工程学院'},
+            {'name': '建筑学', 'code': 'AR001', 'department': '建筑学院'},
+            {'name': '工商管理', 'code': 'BM001', 'department': '管理学院'},
+            {'name': '市场营销', 'code': 'MK001', 'department': '管理学院'},
+            {'name': '会计学', 'code': 'AC001', 'department': '管理学院'},
+            {'name': '金融学', 'code': 'FN001', 'department': '经济学院'},
+            {'name': '国际经济与贸易', 'code': 'IT001', 'department': '经济学院'},
+            {'name': '英语', 'code': 'EN001', 'department': '外国语学院'},
+            {'name': '日语', 'code': 'JP001', 'department': '外国语学院'},
+            {'name': '汉语言文学', 'code': 'CL001', 'department': '文学院'},
+            {'name': '新闻学', 'code': 'JO001', 'department': '新闻学院'},
+            {'name': '法学', 'code': 'LW001', 'department': '法学院'},
+            {'name': '心理学', 'code': 'PS001', 'department': '心理学院'},
+            {'name': '教育学', 'code': 'ED001', 'department': '教育学院'},
+            {'name': '数学与应用数学', 'code': 'MA001', 'department': '数学学院'},
+            {'name': '物理学', 'code': 'PH001', 'department': '物理学院'},
+            {'name': '化学', 'code': 'CH001', 'department': '化学学院'},
+            {'name': '生物科学', 'code': 'BS001', 'department': '生物学院'},
+            {'name': '环境工程', 'code': 'EN002', 'department': '环境学院'},
+            {'name': '食品科学与工程', 'code': 'FS001', 'department': '食品学院'},
+            {'name': '艺术设计', 'code': 'AD001', 'department': '艺术学院'},
+            {'name': '音乐学', 'code': 'MU001', 'department': '艺术学院'},
+            {'name': '体育教育', 'code': 'PE001', 'department': '体育学院'},
+            {'name': '护理学', 'code': 'NU001', 'department': '医学院'},
+            {'name': '临床医学', 'code': 'CM001', 'department': '医学院'},
+            {'name': '药学', 'code': 'PH002', 'department': '药学院'},
+        ]
+        
+        for major_data in majors_data:
+            major = Major(**major_data)
+            db.session.add(major)
+        db.session.commit()
+    
+    majors = Major.query.all()
+    return render_template('auth/register.html', majors=majors)
+
+@route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        password = request.form['password']
+        
+        user = User.query.filter_by(username=username).first()
+        if user and check_password_hash(user.password_hash, password):
+            login_user(user)
+            flash(f'欢迎回来，{user.username}！', 'success')
+            return redirect(url_for('dashboard'))
+        else:
+            flash('用户名或密码错误', 'error')
+            # 调试信息
+            print(f"登录尝试失败 - 用户名: {username}")
+            if user:
+                print(f"用户存在但密码错误")
+            else:
+                print(f"用户不存在")
+    
+    return render_template('auth/login.html')
+
+@route('/logout')
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for('index'))
+
+@route('/dashboard')
+@login_required
+def dashboard():
+    if current_user.role == UserRole.ADMIN.value:
+        return redirect(url_for('admin_dashboard'))
+    elif current_user.role == UserRole.DORM_MANAGER.value:
+        return redirect(url_for('manager_dashboard'))
+    else:
+        return redirect(url_for('student_dashboard'))
+
+@route('/student/dashboard')
+@login_required
+def student_dashboard():
+    # 专业和当前床位所在宿舍、楼栋随学生一次查出，模板中不再逐级懒加载
+    student = Student.query.options(
+        joinedload(Student.major),
+        joinedload(Student.current_bed).joinedload(Bed.dorm).joinedload(Dormitory.building)
+    ).filter_by(user_id=current_user.id).first()
+    
+    # 检查学生记录是否存在
+    if not student:
+        flash('学生信息不存在，请联系管理员', 'error')
+        return redirect(url_for('index'))
+    
+    # 获取当前住宿信息
+    if student.current_bed:
+        dorm_info = {
+            'building': student.current_bed.dorm.building.name,
+            'room': student.current_bed.dorm.room_number,
+            'bed': student.current_bed.bed_number,
+            'roommates': Student.query.join(Bed).filter(
+                Bed.dorm_id == student.current_bed.dorm_id,
+                Student.id != student.id
+            ).all()
+        }
+    else:
+        dorm_info = None
+    
+    # 获取申请记录
+    applications = DormApplication.query.options(
+        joinedload(DormApplication.bed).joinedload(Bed.dorm).joinedload(Dormitory.building)
+    ).filter_by(
+        student_id=student.id
+    ).order_by(DormApplication.created_at.desc()).limit(5).all()
+    
+    # 获取适用于该学生的当前选宿批次
+    available_batch = batch_resolver.for_student(student)
+    
+    # 最近30天的打卡日程和连续打卡天数，由每月打卡位图计算
+    end_date = date.today()
+    attendance_calendar, attendance_streak, _ = get_calendar(
+        current_user.id, end_date - timedelta(days=30), end_date
+    )
+    
+    return render_template('student/dashboard.html',
+                         student=student,
+                         dorm_info=dorm_info,
+                         applications=applications,
+                         available_batch=available_batch,
+                         attendance_calendar=attendance_calendar,
+                         attendance_streak=attendance_streak)
+
+@route('/dorms/browse')
+def browse_dorms():
+    # 获取筛选参数
+    building_id = request.args.get('building_id', type=int)
+    capacity = request.args.get('capacity', type=int)
+    floor = request.args.get('floor', type=int)
+    gender = request.args.get('gender')
+    
+    
+    # 构建查询（楼栋随宿舍一起取出）
+    query = Dormitory.query.join(Building).options(contains_eager(Dormitory.building))
+    
+    # 基础筛选
+    if building_id:
+        query = query.filter(Dormitory.building_id == building_id)
+    if capacity:
+        query = query.filter(Dormitory.capacity == capacity)
+    if floor:
+        query = query.filter(Dormitory.floor == floor)
+    if gender:
+        query = query.filter(Building.gender == gender)
+    
+    
+    # 分页
+    page = request.args.get('page', 1, type=int)
+    pagination = query.paginate(page=page, per_page=12)
+    
+    # 获取楼栋列表用于筛选
+    buildings = Building.query.all()
+    
+    return render_template('dorms/browse.html',
+                         dorms=pagination.items,
+                         pagination=pagination,
+                         buildings=buildings)
+
+@route('/dorm/<int:dorm_id>')
+def dorm_detail(dorm_id):
+    dorm = Dormitory.query.options(joinedload(Dormitory.building)).filter_by(id=dorm_id).first_or_404()
+    
+    # 获取评价统计（评价人随评价一起取出）
+    reviews = DormReview.query.options(joinedload(DormReview.student)).filter_by(dorm_id=dorm_id).all()
+    avg_rating = sum(r.rating for r in reviews) / len(reviews) if reviews else 0
+    
+    # 获取床位状态
+    beds_status = {
+        'available': dorm.available_count,
+        'occupied': dorm.occupied_count,
+        'reserved': dorm.reserved_count
+    }
+    
+    return render_template('dorms/detail.html',
+                         dorm=dorm,
+                         reviews=reviews[:5],  # 显示最新5条评价
+                         avg_rating=avg_rating,
+                         beds_status=beds_status)
+
+@route('/dorm/change', methods=['GET', 'POST'])
+@login_required
+def change_dorm():
+    # 页面显示当前宿舍，床位、宿舍、楼栋随学生一次查出
+    student = Student.query.options(
+        joinedload(Student.current_bed).joinedload(Bed.dorm).joinedload(Dormitory.building)
+    ).filter_by(user_id=current_user.id).first()
+    
+    # 检查学生记录是否存在
+    if not student:
+        flash('学生信息不存在，请联系管理员', 'error')
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        target_dorm_id = request.form.get('target_dorm_id', type=int)
+        reason = request.form.get('reason', '')
+        
+        if not target_dorm_id:
+            flash('请选择目标宿舍', 'error')
+            return redirect(url_for('change_dorm'))
+        
+        # 检查学生是否已有床位
+        if not student.current_bed_id:
+            flash('您当前没有床位，无法申请换宿', 'error')
+            return redirect(url_for('change_dorm'))
+        
+        # 查询目标宿舍
+        target_dorm = Dormitory.query.get_or_404(target_dorm_id)
+        if not target_dorm.available_count:
+            flash('目标宿舍暂无空床', 'error')
+            return redirect(url_for('change_dorm'))
+        
+        # 检查是否已有待审核的换宿申请
+        pending_change = DormApplication.query.filter_by(
+            student_id=student.id,
+            application_type='change',
+            status=ApplicationStatus.PENDING.value
+        ).first()
+        
+        if pending_change:
+            flash('您已有待审核的换宿申请，请等待审核结果', 'error')
+            return redirect(url_for('student_dashboard'))
+        
+        # 将目标宿舍的一张空床设为预留（等待审核），并发抢占失败时换下一张
+        target_bed_id = bed_service.claim_in_dorm(target_dorm.id)
+        if target_bed_id is None:
+            db.session.rollback()
+            flash('目标宿舍暂无空床', 'error')
+            return redirect(url_for('change_dorm'))
+        
+        # 创建换宿申请（不直接执行换宿）
+        application = DormApplication(
+            student_id=student.id,
+            bed_id=target_bed_id,  # 目标床位
+            target_dorm_id=target_dorm_id,
+            application_type='change',
+            status=ApplicationStatus.PENDING.value,
+            reason=reason
+        )
+        
+        try:
+            db.session.add(application)
+            db.session.commit()
+            flash('换宿申请已提交，请等待管理员审核', 'success')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'提交申请时发生错误：{str(e)}', 'error')
+
+        return redirect(url_for('student_dashboard'))
+    
+    # 获取所有可用宿舍
+    available_dorms = Dormitory.query.join(Building).options(contains_eager(Dormitory.building)).filter(
+        Building.gender == student.gender,
+        Dormitory.available_count > 0
+    ).all()
+    
+    return render_template('dorms/change.html', dorms=available_dorms)
+
+@route('/team/create', methods=['GET', 'POST'])
+@login_required
+def create_team():
+    student = current_user.student
+    
+    # 检查学生记录是否存在
+    if not student:
+        flash('学生信息不存在，请联系管理员', 'error')
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        name = request.form['name']
+        max_size = request.form.get('max_size', 4, type=int)
+        
+        # 生成邀请码
+        import random
+        import string
+        invite_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+        
+        team = DormTeam(
+            name=name,
+            leader_id=student.id,
+            max_size=max_size,
+            invite_code=invite_code
+        )
+        db.session.add(team)
+        
+        # 将创建者加入团队
+        student.team_id = team.id
+        db.session.commit()
+        
+        flash(f'团队创建成功！邀请码：{invite_code}', 'success')
+        return redirect(url_for('team_detail', team_id=team.id))
+    
+    return render_template('team/create.html')
+
+@route('/team/<int:team_id>')
+@login_required
+def team_detail(team_id):
+    student = current_user.student
+    
+    # 检查学生记录是否存在
+    if not student:
+        flash('学生信息不存在，请联系管理员', 'error')
+        return redirect(url_for('index'))
+    
+    team = DormTeam.query.get_or_404(team_id)
+    # 检查访问权限：只有团队成员可以查看
+    if student.team_id != team.id:
+        flash('您没有权限查看该团队信息', 'error')
+        return redirect(url_for('student_dashboard'))
+    return render_template('team/detail.html', team=team)
+
+@route('/team/join', methods=['GET', 'POST'])
+@login_required
+def join_team_page():
+    if request.method == 'POST':
+        invite_code = request.form['invite_code']
+        
+        team = DormTeam.query.filter_by(invite_code=invite_code).first()
+        if not team:
+            flash('邀请码无效', 'error')
+            return redirect(url_for('join_team_page'))
+        
+        if len(team.members) >= team.max_size:
+            flash('团队已满', 'error')
+            return redirect(url_for('join_team_page'))
+        
+        if current_user.student.team_id:
+            flash('您已经加入了其他团队', 'error')
+            return redirect(url_for('student_dashboard'))
+        
+        current_user.student.team_id = team.id
+        db.session.commit()
+        flash('成功加入团队', 'success')
+        return redirect(url_for('team_detail', team_id=team.id))
+    
+    return render_template('team/join.html')
+
+@route('/team/<int:team_id>/remove/<int:member_id>', methods=['POST'])
+@login_required
+def remove_team_member(team_id, member_id):
+    team = DormTeam.query.get_or_404(team_id)
+    if current_user.student.id != team.leader_id:
+        flash('只有团队队长可以移除成员', 'error')
+        return redirect(url_for('team_detail', team_id=team_id))
+    
+    member = Student.query.get_or_404(member_id)
+    if member.team_id == team.id:
+        member.team_id = None
+        db.session.commit()
+        flash('成员已被移除', 'success')
+    return redirect(url_for('team_detail', team_id=team_id))
+
+@route('/team/<int:team_id>/leave', methods=['POST'])
+@login_required
+def leave_team(team_id):
+    team = DormTeam.query.get_or_404(team_id)
+    if current_user.student.team_id != team.id:
+        flash('您不是该团队成员', 'error')
+        return redirect(url_for('student_dashboard'))
+    
+    if current_user.student.id == team.leader_id:
+        flash('队长不能直接退出团队，请先转让队长身份或解散团队', 'error')
+        return redirect(url_for('team_detail', team_id=team_id))
+    
+    current_user.student.team_id = None
+    db.session.commit()
+    flash('您已退出团队', 'success')
+    return redirect(url_for('student_dashboard'))
+
+@route('/team/<int:team_id>/delete', methods=['POST'])
+@login_required
+def delete_team(team_id):
+    team = DormTeam.query.get_or_404(team_id)
+    if current_user.student.id != team.leader_id:
+        flash('只有团队队长可以解散团队', 'error')
+        return redirect(url_for('team_detail', team_id=team_id))
+    
+    # 解除所有成员的团队关联
+    for member in team.members:
+        member.team_id = None
+    
+    db.session.delete(team)
+    db.session.commit()
+    flash('团队已解散', 'success')
+    return redirect(url_for('student_dashboard'))
+
+@route('/team/join', methods=['POST'])
+@login_required
+def join_team():
+    invite_code = request.form['invite_code']
+    
+    team = DormTeam.query.filter_by(invite_code=invite_code).first()
+    if not team:
+        flash('邀请码无效', 'error')
+        return redirect(url_for('student_dashboard'))
+    
+    if len(team.members) >= team.max_size:
+        flash('团队已满', 'error')
+        return redirect(url_for('student_dashboard'))
+    
+    current_user.student.team_id = team.id
+    db.session.commit()
+    flash('成功加入团队', 'success')
+    return redirect(url_for('team_detail', team_id=team.id))
+
+@route('/profile/edit', methods=['GET', 'POST'])
+@login_required
+def edit_profile():
+    student = current_user.student
+    
+    if request.method == 'POST':
+        # 更新基本信息
+        student.name = request.form['name']
+        student.phone = request.form.get('phone')
+        student.email = request.form.get('email')
+        
+        # 更新生活习惯
+        student.sleep_time = request.form.get('sleep_time')
+        student.wake_time = request.form.get('wake_time')
+        student.quietness = request.form.get('quietness', type=int)
+        student.cleanliness = request.form.get('cleanliness', type=int)
+        student.hobbies = request.form.get('hobbies')
+        
+        db.session.commit()
+        flash('个人信息更新成功', 'success')
+        return redirect(url_for('student_dashboard'))
+    
+    # 获取所有专业用于选择
+    majors = Major.query.all()
+    return render_template('profile.html', student=student, majors=majors)
+
+@route('/roommate/match')
+@login_required
+def roommate_match():
+    student = current_user.student
+    
+    # 检查学生记录是否存在
+    if not student:
+        flash('学生信息不存在，请联系管理员', 'error')
+        return redirect(url_for('index'))
+    
+    # 基于生活习惯匹配室友（候选人数组化后一次算出全部分数，只取前10名）
+    top = roommate_matcher.top_matches(student, limit=10)
+    candidates = {s.id: s for s in Student.query.filter(Student.id.in_([sid for sid, _ in top]))}
+    matches = [{'student': candidates[sid], 'score': score} for sid, score in top if sid in candidates]
+    
+    return render_template('roommate/match.html', matches=matches)
+
+@route('/admin/dashboard')
+@login_required
+def admin_dashboard():
+    if current_user.role != UserRole.ADMIN.value:
+        flash('权限不足', 'error')
+        return redirect(url_for('index'))
+    
+    # 统计数据
+    stats = {
+        'total_students': Student.query.count(),
+        'total_dorms': Dormitory.query.count(),
+        'occupied_beds': Bed.query.filter_by(status=BedStatus.OCCUPIED.value).count(),
+        'pending_applications': DormApplication.query.filter_by(
+            status=ApplicationStatus.PENDING.value
+        ).count()
+    }
+    
+    # 最新申请
+    recent_applications = DormApplication.query.options(
+        joinedload(DormApplication.student),
+        joinedload(DormApplication.bed).joinedload(Bed.dorm).joinedload(Dormitory.building)
+    ).order_by(
+        DormApplication.created_at.desc()
+    ).limit(10).all()
+    
+    return render_template('admin/dashboard.html',
+                         stats=stats,
+                         recent_applications=recent_applications)
+
+@route('/admin/application/<int:app_id>/process', methods=['POST'])
+@login_required
+def process_application(app_id):
+    if current_user.role not in [UserRole.ADMIN.value, UserRole.DORM_MANAGER.value]:
+        flash('权限不足', 'error')
+        return redirect(url_for('index'))
+    
+    application = DormApplication.query.get_or_404(app_id)
+    action = request.form['action']
+    remarks = request.form.get('remarks', '')
+    
+    if action == 'approve':
+        student = application.student
+        old_bed_id = student.current_bed_id
+        # 分配床位：床位必须仍处于预留状态；换宿申请在同一事务内释放原床位
+        try:
+            bed_service.occupy(application.bed_id)
+            if application.application_type == 'change' and old_bed_id and old_bed_id != application.bed_id:
+                bed_service.release(old_bed_id, expected=BedStatus.OCCUPIED.value)
+        except BedConflictError:
+            db.session.rollback()
+            flash('目标床位状态已变更，无法批准申请', 'error')
+            return redirect(request.referrer or url_for('admin_dashboard'))
+        application.status = ApplicationStatus.APPROVED.value
+        student.current_bed_id = application.bed_id
+        flash('申请已批准', 'success')
+        
+    elif action == 'reject':
+        application.status = ApplicationStatus.REJECTED.value
+        # 释放预留的床位
+        if application.bed_id:
+            bed_service.release_if_reserved(application.bed_id)
+        flash('申请已拒绝', 'info')
+    
+    application.processed_at = datetime.utcnow()
+    application.processed_by = current_user.id
+    application.remarks = remarks
+    
+    db.session.commit()
+    return redirect(request.referrer or url_for('admin_dashboard'))
+
+@route('/admin/students')
+@login_required
+def admin_students():
+    if current_user.role != UserRole.ADMIN.value:#如果用户不是管理员，则返回主页
+        flash('权限不足', 'error')
+        return redirect(url_for('index'))
+    # 获取筛选参数
+    search = request.args.get('search', '')
+    major_id = request.args.get('major_id', type=int)
+    grade = request.args.get('grade', type=int)
+    
+    # 构建查询
+    query = Student.query.join(User).join(Major, Student.major_id == Major.id).options(
+        contains_eager(Student.major),
+        joinedload(Student.current_bed).joinedload(Bed.dorm).joinedload(Dormitory.building)
+    )
+    
+    if search:
+        query = query.filter(
+            db.or_(
+                Student.name.contains(search),
+                Student.student_id.contains(search),
+                Student.phone.contains(search)
+            )
+        )
+    if major_id:
+        query = query.filter(Student.major_id == major_id)
+    if grade:
+        query = query.filter(Student.grade == grade)
+    
+    # 分页
+    page = request.args.get('page', 1, type=int)
+    pagination = query.paginate(page=page, per_page=20)
+    
+    # 获取专业列表用于筛选
+    majors = Major.query.all()
+    
+    return render_template('admin/students.html',
+                         students=pagination.items,
+                         pagination=pagination,
+                         majors=majors,
+                         search=search,
+                         major_id=major_id,
+                         grade=grade)
+
+@route('/admin/students/<int:student_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_student(student_id):
+    if current_user.role != UserRole.ADMIN.value:
+        flash('权限不足', 'error')
+        return redirect(url_for('index'))
+    
+    student = Student.query.get_or_404(student_id)
+    
+    if request.method == 'POST':
+        # 更新学生信息
+        student.name = request.form['name']
+        student.phone = request.form.get('phone')
+        student.email = request.form.get('email')
+        student.major_id = request.form.get('major_id', type=int)
+        student.grade = request.form.get('grade', type=int)
+        
+        # 更新生活习惯
+        student.sleep_time = request.form.get('sleep_time')
+        student.wake_time = request.form.get('wake_time')
+        student.quietness = request.form.get('quietness', type=int)
+        student.cleanliness = request.form.get('cleanliness', type=int)
+        student.hobbies = request.form.get('hobbies')
+        
+        db.session.commit()
+        flash('学生信息更新成功', 'success')
+        return redirect(url_for('admin_students'))
+    
+    majors = Major.query.all()
+    return render_template('admin/edit_student.html', student=student, majors=majors)
+
+@route('/admin/students/<int:student_id>/delete', methods=['POST'])
+@login_required
+def delete_student(student_id):
+    if current_user.role != UserRole.ADMIN.value:
+        flash('权限不足', 'error')
+        return redirect(url_for('index'))
+    
+    student = Student.query.get_or_404(student_id)
+    
+    # 检查是否有住宿记录
+    if student.current_bed_id:
+        flash('该学生有住宿记录，无法删除', 'error')
+        return redirect(url_for('admin_students'))
+    
+    # 删除学生记录
+    db.session.delete(student)
+    db.session.commit()
+    flash('学生信息已删除', 'success')
+    return redirect(url_for('admin_students'))
+
+@route('/admin/buildings')
+@login_required
+def admin_buildings():
+    if current_user.role != UserRole.ADMIN.value:
+        flash('权限不足', 'error')
+        return redirect(url_for('index'))
+    
+    buildings = Building.query.all()
+    return render_template('admin/buildings.html', buildings=buildings)
+
+@route('/admin/buildings/create', methods=['GET', 'POST'])
+@login_required
+def create_building():
+    if current_user.role != UserRole.ADMIN.value:
+        flash('权限不足', 'error')
+        return redirect(url_for('index'))
+    
+    if request.method == 'POST':
+        name = request.form['name']
+        gender = request.form['gender']
+        total_floors = request.form.get('total_floors', type=int)
+        location = request.form.get('location')
+        facilities = request.form.get('facilities')
+        description = request.form.get('description')
+        
+        building = Building(
+            name=name,
+            gender=gender,
+            total_floors=total_floors,
+            location=location,
+            facilities=facilities,
+            description=description
+        )
+        db.session.add(building)
+        db.session.commit()
+        
+        flash('楼栋创建成功', 'success')
+        return redirect(url_for('admin_buildings'))
+    
+    return render_template('admin/create_building.html')
+
+@route('/admin/buildings/<int:building_id>/edit', methods=['GET', 'POST'])
+@login_required
+def edit_building(building_id):
+    if current_user.role != UserRole.ADMIN.value:
+        flash('权限不足', 'error')
+        return redirect(url_for('index'))
+    
+    building = Building.query.get_or_404(building_id)
+    
+    if request.method == 'POST':
+        building.name = request.form['name']
+        building.gender = request.form['gender']
+        building.total_floors = request.form.get('total_floors', type=int)
+        building.location = request.form.get('location')
+        building.facilities = request.form.get('facilities')
+        building.description = request.form.get('description')
+        
+        db.session.commit()
+        flash('楼栋信息更新成功', 'success')
+        return redirect(url_for('admin_buildings'))
+    
+    return render_template('admin/edit_building.html', building=building)
+
+@route('/admin/buildings/<int:building_id>/delete', methods=['POST'])
+@login_required
+def delete_building(building_id):
+    if current_user.role != UserRole.ADMIN.value:
+        flash('权限不足', 'error')
+        return redirect(url_for('index'))
+    
+    building = Building.query.get_or_404(building_id)
+    
+    # 检查是否有宿舍记录
+    if building.dormitories:
+        flash('该楼栋有宿舍记录，无法删除', 'error')
+        return redirect(url_for('admin_buildings'))
+    
+    db.session.delete(building)
+    db.session.commit()
+    flash('楼栋已删除', 'success')
+    return redirect(url_for('admin_buildings'))
+
+@route('/messages')
+@login_required
+def messages():
+    student = current_user.student
+    
+    # 获取收到的消息
+    received_messages = Message.query.filter_by(receiver_id=student.id).order_by(Message.created_at.desc()).all()
+    
+    # 获取发送的消息
+    sent_messages = Message.query.filter_by(sender_id=student.id).order_by(Message.created_at.desc()).all()
+    
+    # 获取未读消息数量
+    unread_count = Message.query.filter_by(receiver_id=student.id, is_read=False).count()
+    
+    return render_template('messages/list.html',
+                         received_messages=received_messages,
+                         sent_messages=sent_messages,
+                         unread_count=unread_count)
+
+@route('/messages/send', methods=['GET', 'POST'])
+@login_required
+def send_message():
+    if request.method == 'POST':
+        receiver_id = request.form.get('receiver_id', type=int)
+        content = request.form.get('content')
+        
+        if not receiver_id or not content:
+            flash('请填写完整信息', 'error')
+            return redirect(url_for('send_message'))
+        
+        # 检查接收者是否存在
+        receiver = Student.query.get(receiver_id)
+        if not receiver:
+            flash('接收者不存在', 'error')
+            return redirect(url_for('send_message'))
+        
+        # 创建消息
+        message = Message(
+            sender_id=current_user.student.id,
+            receiver_id=receiver_id,
+            content=content
+        )
+        db.session.add(message)
+        db.session.commit()
+        
+        flash('消息发送成功', 'success')
+        return redirect(url_for('messages'))
+    
+    # 获取所有学生用于选择接收者
+    students = Student.query.filter(Student.id != current_user.student.id).all()
+    return render_template('messages/send.html', students=students)
+
+@route('/messages/<int:message_id>/read', methods=['POST'])
+@login_required
+def mark_message_read(message_id):
+    message = Message.query.get_or_404(message_id)
+    
+    # 检查权限：只有接收者可以标记为已读
+    if message.receiver_id != current_user.student.id:
+        flash('权限不足', 'error')
+        return redirect(url_for('messages'))
+    
+    message.is_read = True
+    db.session.commit()
+    
+    return jsonify({'status': 'success'})
+
+@route('/messages/<int:message_id>/delete', methods=['POST'])
+@login_required
+def delete_message(message_id):
+    message = Message.query.get_or_404(message_id)
+    
+    # 检查权限：发送者或接收者可以删除
+    if message.sender_id != current_user.student.id and message.receiver_id != current_user.student.id:
+        flash('权限不足', 'error')
+        return redirect(url_for('messages'))
+    
+    db.session.delete(message)
+    db.session.commit()
+    flash('消息已删除', 'success')
+    return redirect(url_for('messages'))
+
+@route('/dorm/<int:dorm_id>/review', methods=['GET', 'POST'])
+@login_required
+def review_dorm(dorm_id):
+    dorm = Dormitory.query.get_or_404(dorm_id)
+    
+    if request.method == 'POST':
+        rating = request.form.get('rating', type=int)
+        environment_rating = request.form.get('environment_rating', type=int)
+        facilities_rating = request.form.get('facilities_rating', type=int)
+        location_rating = request.form.get('location_rating', type=int)
+        comment = request.form.get('comment')
+        
+        # 检查是否已经评价过
+        existing_review = DormReview.query.filter_by(
+            dorm_id=dorm_id,
+            student_id=current_user.student.id
+        ).first()
+        
+        if existing_review:
+            # 更新现有评价
+            existing_review.rating = rating
+            existing_review.environment_rating = environment_rating
+            existing_review.facilities_rating = facilities_rating
+            existing_review.location_rating = location_rating
+            existing_review.comment = comment
+            flash('评价已更新', 'success')
+        else:
+            # 创建新评价
+            review = DormReview(
+                dorm_id=dorm_id,
+                student_id=current_user.student.id,
+                rating=rating,
+                environment_rating=environment_rating,
+                facilities_rating=facilities_rating,
+                location_rating=location_rating,
+                comment=comment
+            )
+            db.session.add(review)
+            flash('评价提交成功', 'success')
+        
+        db.session.commit()
+        return redirect(url_for('dorm_detail', dorm_id=dorm_id))
+    
+    # 检查是否已经评价过
+    existing_review = DormReview.query.filter_by(
+        dorm_id=dorm_id,
+        student_id=current_user.student.id
+    ).first()
+    
+    return render_template('dorms/review.html', dorm=dorm, existing_review=existing_review)
+
+@route('/reviews/my')
+@login_required
+def my_reviews():
+    student = current_user.student
+    reviews = DormReview.query.filter_by(student_id=student.id).order_by(DormReview.created_at.desc()).all()
+    
+    return render_template('reviews/my.html', reviews=reviews)
+
+# API 路由
+@route('/api/dorms/available')
+def api_available_dorms():
+    """返回可用宿舍的JSON数据"""
+    gender = request.args.get('gender')
+    capacity = request.args.get('capacity', type=int)
+    
+    # 与原接口一样返回全部宿舍（含已住满的），空床数读宿舍的计数列
+    query = Dormitory.query.join(Building).options(
+        contains_eager(Dormitory.building)
+    )
+    
+    if gender:
+        query = query.filter(Building.gender == gender)
+    if capacity:
+        query = query.filter(Dormitory.capacity == capacity)
+    
+    dorms = query.all()
+    
+    result = []
+    for dorm in dorms:
+        result.append({
+            'id': dorm.id,
+            'building': dorm.building.name,
+            'room_number': dorm.room_number,
+            'floor': dorm.floor,
+            'capacity': dorm.capacity,
+            'available_beds': dorm.available_count,
+            'monthly_rent': dorm.monthly_rent,
+            'facilities': {
+                'ac': dorm.has_ac,
+                'bathroom': dorm.has_bathroom,
+                'balcony': dorm.has_balcony,
+                'water_heater': dorm.has_water_heater
+            }
+        })
+    
+    return jsonify(result)
+
+@route('/api/bed/<int:bed_id>/status')
+def api_bed_status(bed_id):
+    """获取床位状态"""
+    bed = Bed.query.options(
+        selectinload(Bed.current_student).joinedload(Student.major)
+    ).filter_by(id=bed_id).first_or_404()
+    # current_student 是 Student.current_bed 的反向引用，为列表
+    occupant = bed.current_student[0] if bed.current_student else None
+    return jsonify({
+        'id': bed.id,
+        'status': bed.status,
+        'bed_number': bed.bed_number,
+        'position': bed.position,
+        'dorm_id': bed.dorm_id,
+        'occupant': {
+            'name': occupant.name,
+            'student_id': occupant.student_id,
+            'major': occupant.major.name if occupant.major else None
+        } if occupant else None
+    })
+
+@route('/api/statistics/occupancy')
+def api_occupancy_stats():
+    """获取入住率统计，?by=floor 或 ?by=capacity 附带按楼层/人数的分项统计"""
+    breakdown = request.args.get('by')
+    if breakdown not in (None, 'floor', 'capacity'):
+        return jsonify({'error': 'by 参数只能是 floor 或 capacity'}), 400
+    return jsonify(DormService().get_occupancy_statistics(breakdown))
+
+# 错误处理
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+def internal_error(error):
+    db.session.rollback()
+    return render_template('errors/500.html'), 500
+
+# 上下文处理器
+def inject_enums():
+    return dict(
+        UserRole=UserRole,
+        BedStatus=BedStatus,
+        ApplicationStatus=ApplicationStatus
+    )
+
+# 模板辅助函数：生成分页URL
+def url_for_page(endpoint, page_num, **kwargs):
+    """生成分页URL，排除page参数避免重复"""
+    # 从request.args中获取所有筛选参数，但排除page
+    args = {}
+    for key, value in request.args.items():
+        if key != 'page' and value:
+            args[key] = value
+    # 合并传入的kwargs
+    args.update(kwargs)
+    # 添加新的page参数
+    args['page'] = page_num
+    return url_for(endpoint, **args)
+
+
+def init_app(app):
+    """把登记的路由、错误处理和模板辅助函数注册到应用"""
+    for rule, endpoint, view, options in _rules:
+        app.add_url_rule(rule, endpoint, view, **options)
+    app.register_error_handler(404, not_found_error)
+    app.register_error_handler(500, internal_error)
+    app.context_processor(inject_enums)
+    app.add_template_global(url_for_page)
@@ -6,21 +6,9 @@ main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
 def index():
-    # 获取最新公告
-    from models.system import Announcement
-    from datetime import datetime
-    
-    announcements = Announcement.query.filter(
-        Announcement.expire_at > datetime.utcnow()
-    ).order_by(Announcement.priority.desc(), Announcement.created_at.desc()).limit(5).all()
-    
-    # 获取当前选宿批次
-    from models.application import SelectionBatch
-    current_batch = SelectionBatch.query.filter(
-        SelectionBatch.is_active == True,
-        SelectionBatch.start_time <= datetime.utcnow(),
-        SelectionBatch.end_time >= datetime.utcnow()
-    ).first()
+    # 公告和当前选宿批次来自首页缓存，稳定状态下不查询数据库
+    from services.home_cache import home_cache
+    announcements, current_batch = home_cache.get()
     
     return render_template('index.html', 
                          announcements=announcements,
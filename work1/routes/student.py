@@ -1,10 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template
 from flask_login import login_required, current_user
-from datetime import datetime, date, timedelta
-from models.database import db, BedStatus, ApplicationStatus, AttendanceRecord
+from datetime import date, timedelta
 from models.user import Student, Bed
-from models.dormitory import Dormitory, Building
-from models.application import DormApplication, SelectionBatch
+from models.application import DormApplication
+from services.attendance_calendar import get_calendar
+from services.batch_resolver import batch_resolver
 
 student_bp = Blueprint('student', __name__)
 
@@ -32,40 +32,19 @@ def dashboard():
         student_id=student.id
     ).order_by(DormApplication.created_at.desc()).limit(5).all()
     
-    # 获取当前可用的选宿批次
-    available_batch = SelectionBatch.query.filter(
-        SelectionBatch.is_active == True,
-        SelectionBatch.start_time <= datetime.utcnow(),
-        SelectionBatch.end_time >= datetime.utcnow()
-    ).first()
+    # 获取适用于该学生的当前选宿批次
+    available_batch = batch_resolver.for_student(student)
     
-    # 获取最近30天的打卡记录
-    start_date = date.today() - timedelta(days=30)
+    # 最近30天的打卡日程和连续打卡天数，由每月打卡位图计算
     end_date = date.today()
-    
-    attendance_records = AttendanceRecord.query.filter(
-        AttendanceRecord.user_id == current_user.id,
-        AttendanceRecord.date >= start_date,
-        AttendanceRecord.date <= end_date
-    ).all()
-    
-    # 构建日期到状态的映射
-    attendance_dict = {r.date: r.status for r in attendance_records}
-    
-    # 生成最近30天的日期列表
-    attendance_calendar = []
-    current = start_date
-    while current <= end_date:
-        status = attendance_dict.get(current, 'not_checked')
-        attendance_calendar.append({
-            'date': current,
-            'status': status
-        })
-        current += timedelta(days=1)
+    attendance_calendar, attendance_streak, _ = get_calendar(
+        current_user.id, end_date - timedelta(days=30), end_date
+    )
     
     return render_template('student/dashboard.html',
                          student=student,
                          dorm_info=dorm_info,
                          applications=applications,
                          available_batch=available_batch,
-                         attendance_calendar=attendance_calendar)
+                         attendance_calendar=attendance_calendar,
+                         attendance_streak=attendance_streak)
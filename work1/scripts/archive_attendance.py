@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+打卡记录按月归档
+把最近 ATTENDANCE_HOT_MONTHS 个月之前的打卡记录导出到 ATTENDANCE_ARCHIVE_DIR 下的压缩 CSV，并从数据库中删除。
+建议每月初由 cron 运行一次：
+    30 1 1 * * cd /path/to/work1 && python scripts/archive_attendance.py --vacuum
+"""
+import sys
+import os
+import argparse
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from start import app
+from models.database import db, AttendanceArchive
+from services import attendance_archive
+
+
+def parse_month(value):
+    return int(datetime.strptime(value, '%Y-%m').strftime('%Y%m'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='打卡记录按月归档')
+    parser.add_argument('--month', type=parse_month, help='只归档指定月份（YYYY-MM）')
+    parser.add_argument('--keep', type=int, help='数据库中保留的最近月数，默认 ATTENDANCE_HOT_MONTHS')
+    parser.add_argument('--restore', type=parse_month, metavar='YYYY-MM', help='把已归档的月份写回数据库')
+    parser.add_argument('--list', action='store_true', help='列出已归档的月份')
+    parser.add_argument('--vacuum', action='store_true', help='归档后执行 VACUUM 回收数据库文件空间（仅 SQLite）')
+    args = parser.parse_args()
+
+    with app.app_context():
+        print("=" * 60)
+        if args.list:
+            for archive in AttendanceArchive.query.order_by(AttendanceArchive.month):
+                print(f"{archive.month // 100}-{archive.month % 100:02d}  {archive.row_count:>8} 条  "
+                      f"已打卡 {archive.checked_in:>8}  {archive.path}")
+            print("=" * 60)
+            return
+        if args.restore:
+            restored = attendance_archive.restore_month(args.restore)
+            print(f"✓ {args.restore // 100}-{args.restore % 100:02d} 已写回 {restored} 条打卡记录")
+            print("=" * 60)
+            return
+
+        months = [args.month] if args.month else attendance_archive.archivable_months(args.keep)
+        print(f"归档目录: {attendance_archive.archive_dir()}")
+        print(f"待归档月份: {len(months)} 个")
+        print("=" * 60)
+        for month in months:
+            rows = attendance_archive.archive_month(month)
+            print(f"✓ {month // 100}-{month % 100:02d} 已归档 {rows} 条打卡记录")
+
+        if args.vacuum and months and db.engine.dialect.name == 'sqlite':
+            with db.engine.connect() as conn:
+                conn.execution_options(isolation_level='AUTOCOMMIT').execute(text('VACUUM'))
+            print("✓ 已回收数据库文件空间")
+        print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+新生整批分配宿舍
+一次性为所有尚未分配床位的学生分配宿舍，并输出分配速度（人/秒）
+"""
+import sys
+import os
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from start import app
+from models.user import Student
+from services.assign_service import batch_assign
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为未分配床位的学生整批分配宿舍')
+    parser.add_argument('--grade', type=int, help='只分配指定年级的学生')
+    parser.add_argument('--capacity', type=int, choices=[4, 6], help='宿舍人数偏好')
+    parser.add_argument('--limit', type=int, help='最多分配的学生数')
+    args = parser.parse_args()
+
+    with app.app_context():
+        query = Student.query.filter(Student.current_bed_id == None)
+        if args.grade:
+            query = query.filter(Student.grade == args.grade)
+        query = query.order_by(Student.id)
+        if args.limit:
+            query = query.limit(args.limit)
+        students = query.all()
+
+        print("=" * 60)
+        print(f"待分配学生: {len(students)} 名")
+        print("=" * 60)
+        if not students:
+            return
+
+        result = batch_assign(students, preferred_capacity=args.capacity)
+
+        print(f"成功分配: {result['assigned']} 名")
+        print(f"未分配（无可用床位）: {len(result['unassigned'])} 名")
+        print(f"耗时: {result['elapsed']:.2f} 秒")
+        print(f"速度: {result['rate']:.0f} 人/秒")
+        print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
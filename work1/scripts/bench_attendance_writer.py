@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+查寝打卡高峰压测
+在临时数据库（生产配置：WAL + PRAGMA）中模拟查寝前大量学生同时打卡，对比：
+- 逐请求模式：每次打卡一条 upsert + 一次提交
+- 写缓冲模式：打卡写入进程内日志即返回，后台线程批量写入（ATTENDANCE_WRITE_BEHIND=1）
+输出每秒打卡数，并检查数据库中的打卡记录数是否与成功打卡数一致
+"""
+import sys
+import os
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config.config import ProductionConfig
+from models.database import db, AttendanceRecord
+from models.user import User
+from models.dormitory import Bed
+from models.application import DormTeam
+from services import attendance_service
+from services.attendance_writer import AttendanceWriter
+from utils.sqlite_profile import configure_sqlite
+
+
+def build_app(db_path, users):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS
+    app.config['SQLITE_PRAGMAS'] = ProductionConfig.SQLITE_PRAGMAS
+    db.init_app(app)
+    configure_sqlite(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(User(username=f'bench{i}', password_hash='x') for i in range(users))
+        db.session.commit()
+        user_ids = [user_id for user_id, in db.session.query(User.id).order_by(User.id)]
+    return app, user_ids
+
+
+def run_threads(user_ids, threads, handler):
+    results = {'checked_in': 0, 'duplicate': 0, 'errors': 0}
+    lock = threading.Lock()
+    chunks = [user_ids[i::threads] for i in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def worker(chunk):
+        local = {'checked_in': 0, 'duplicate': 0, 'errors': 0}
+        barrier.wait()
+        for user_id in chunk:
+            local[handler(user_id)] += 1
+        with lock:
+            for key, n in local.items():
+                results[key] += n
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def bench_direct(app, user_ids, threads, log_dir):
+    def handler(user_id):
+        with app.app_context():
+            try:
+                checked_in = attendance_service.check_in(user_id)
+                db.session.commit()
+                return 'checked_in' if checked_in else 'duplicate'
+            except Exception:
+                db.session.rollback()
+                return 'errors'
+
+    results, elapsed = run_threads(user_ids, threads, handler)
+    return results, elapsed, elapsed
+
+
+def bench_write_behind(app, user_ids, threads, log_dir):
+    writer = AttendanceWriter()
+    writer.start(app, log_dir)
+
+    def handler(user_id):
+        # 与真实请求一样，每次打卡都在独立的应用上下文中进行
+        with app.app_context():
+            try:
+                return 'checked_in' if writer.check_in(user_id) else 'duplicate'
+            except Exception:
+                return 'errors'
+
+    results, elapsed = run_threads(user_ids, threads, handler)
+    started = time.perf_counter()
+    writer.close()
+    total = elapsed + time.perf_counter() - started
+    results['commits'] = writer.stats['commits']
+    return results, elapsed, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查寝打卡高峰压测')
+    parser.add_argument('--users', type=int, default=5000, help='打卡学生数')
+    parser.add_argument('--threads', type=int, default=16, help='并发线程数')
+    parser.add_argument('--repeat', type=int, default=2, help='每名学生打卡次数（重复打卡应被拒绝）')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"学生 {args.users} 名，每人打卡 {args.repeat} 次，并发 {args.threads}")
+    print("=" * 60)
+
+    for name, bench in (('逐请求模式', bench_direct), ('写缓冲模式', bench_write_behind)):
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        log_dir = tempfile.mkdtemp()
+        try:
+            app, user_ids = build_app(db_path, args.users)
+            results, check_in_time, total_time = bench(app, user_ids * args.repeat, args.threads, log_dir)
+            with app.app_context():
+                records = AttendanceRecord.query.filter_by(date=date.today()).count()
+            with app.app_context():
+                db.engine.dispose()
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            shutil.rmtree(log_dir)
+
+        attempts = args.users * args.repeat
+        print(f"\n{name}")
+        print(f"  打卡成功: {results['checked_in']}，重复打卡: {results['duplicate']}，出错: {results['errors']}")
+        if 'commits' in results:
+            print(f"  批量提交次数: {results['commits']}")
+        print(f"  打卡耗时: {check_in_time:.3f} 秒，{attempts / check_in_time:.0f} 次/秒")
+        print(f"  含写回总耗时: {total_time:.3f} 秒")
+        print(f"  数据库打卡记录: {records}")
+        if records != results['checked_in'] or records != args.users:
+            print("  ❌ 打卡记录与成功打卡数不一致")
+        else:
+            print("  ✅ 每名学生恰好一条打卡记录")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
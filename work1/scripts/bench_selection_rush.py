@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+选宿高峰压测
+在临时数据库中模拟选宿批次开放时大量学生同时抢床，对比：
+- 逐请求模式：每次抢床一条条件 UPDATE + 插入申请 + 提交
+- 高峰模式：内存账本抢床，后台线程批量写回
+输出每秒抢床数，并检查是否有床位被重复预留
+"""
+import sys
+import os
+import random
+import argparse
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func
+from models.database import db, BedStatus
+from models.user import User, Student
+from models.dormitory import Building, Dormitory, Bed
+from models.application import DormApplication, SelectionBatch
+from services import bed_service
+from services.bed_service import BedConflictError
+from services.selection_rush import SelectionLedger, ClaimRejected
+
+
+def build_app(db_path, dorms, students):
+    """建立临时数据库：dorms 间4人间，students 名学生，以及一个正在开放的选宿批次"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        building = Building(name='压测楼', gender='男', total_floors=10)
+        db.session.add(building)
+        db.session.flush()
+        for i in range(dorms):
+            dorm = Dormitory(building_id=building.id, room_number=f'{i:04d}', floor=i % 10 + 1, capacity=4)
+            db.session.add(dorm)
+            db.session.flush()
+            db.session.add_all(Bed(dorm_id=dorm.id, bed_number=n, status=BedStatus.AVAILABLE.value)
+                               for n in range(1, 5))
+        for i in range(students):
+            user = User(username=f'rush{i}', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Student(user_id=user.id, student_id=f'R{i:06d}', name=f'学生{i}',
+                                   id_card='110101200001010001', gender='男'))
+        now = datetime.utcnow()
+        db.session.add(SelectionBatch(name='压测批次', start_time=now - timedelta(minutes=1),
+                                      end_time=now + timedelta(hours=1)))
+        db.session.commit()
+    return app
+
+
+def claim_plan(app, hot_beds, seed):
+    """每名学生随机挑一张热门床位（热门床位少于学生数，制造争抢）"""
+    with app.app_context():
+        beds = db.session.query(Bed.id, Bed.dorm_id).order_by(Bed.id).all()
+        student_ids = [student_id for student_id, in db.session.query(Student.id).order_by(Student.id)]
+    rng = random.Random(seed)
+    hot = beds[:hot_beds] if hot_beds else beds
+    return [(student_id, *rng.choice(hot)) for student_id in student_ids]
+
+
+def run_threads(plan, threads, handler):
+    results = {'claimed': 0, 'rejected': 0, 'errors': 0}
+    lock = threading.Lock()
+    chunks = [plan[i::threads] for i in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def worker(chunk):
+        local = {'claimed': 0, 'rejected': 0, 'errors': 0}
+        barrier.wait()
+        for claim in chunk:
+            local[handler(*claim)] += 1
+        with lock:
+            for key, n in local.items():
+                results[key] += n
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def bench_direct(app, plan, threads):
+    def handler(student_id, bed_id, dorm_id):
+        with app.app_context():
+            try:
+                bed_service.reserve(bed_id)
+                db.session.add(DormApplication(student_id=student_id, bed_id=bed_id, application_type='new'))
+                db.session.commit()
+                return 'claimed'
+            except BedConflictError:
+                db.session.rollback()
+                return 'rejected'
+            except Exception:
+                db.session.rollback()
+                return 'errors'
+
+    results, elapsed = run_threads(plan, threads, handler)
+    return results, elapsed, elapsed
+
+
+def bench_ledger(app, plan, threads):
+    ledger = SelectionLedger()
+    with app.app_context():
+        ledger.open(app, SelectionBatch.query.first())
+
+        def handler(student_id, bed_id, dorm_id):
+            # 与真实请求一样，每次抢床都在独立的应用上下文中进行
+            with app.app_context():
+                try:
+                    ledger.claim(student_id, bed_id, dorm_id, '男')
+                    return 'claimed'
+                except ClaimRejected:
+                    return 'rejected'
+
+        results, elapsed = run_threads(plan, threads, handler)
+        started = time.perf_counter()
+        ledger.close()
+        total = elapsed + time.perf_counter() - started
+    results['commits'] = ledger.stats['commits']
+    results['conflicts'] = ledger.stats['conflicts']
+    return results, elapsed, total
+
+
+def verify(app):
+    """返回 (重复预留的床位数, 预留床位数, 申请数)"""
+    with app.app_context():
+        doubles = db.session.query(DormApplication.bed_id).group_by(DormApplication.bed_id).having(
+            func.count(DormApplication.id) > 1
+        ).count()
+        reserved = Bed.query.filter_by(status=BedStatus.RESERVED.value).count()
+        applications = DormApplication.query.count()
+    return doubles, reserved, applications
+
+
+def main():
+    parser = argparse.ArgumentParser(description='选宿高峰压测')
+    parser.add_argument('--students', type=int, default=2000, help='参与抢床的学生数')
+    parser.add_argument('--dorms', type=int, default=400, help='4人间数量')
+    parser.add_argument('--hot-beds', type=int, default=600, help='学生只在前 N 张床中挑选（0 表示全部床位）')
+    parser.add_argument('--threads', type=int, default=16, help='并发线程数')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"学生 {args.students} 名，床位 {args.dorms * 4} 张，热门床位 {args.hot_beds or args.dorms * 4} 张，"
+          f"并发 {args.threads}")
+    print("=" * 60)
+
+    for name, bench in (('逐请求模式', bench_direct), ('高峰模式', bench_ledger)):
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            app = build_app(db_path, args.dorms, args.students)
+            plan = claim_plan(app, args.hot_beds, args.seed)
+            results, claim_time, total_time = bench(app, plan, args.threads)
+            doubles, reserved, applications = verify(app)
+        finally:
+            os.remove(db_path)
+
+        print(f"\n{name}")
+        print(f"  抢到床位: {results['claimed']}，被拒绝: {results['rejected']}，出错: {results['errors']}")
+        if 'commits' in results:
+            print(f"  批量提交次数: {results['commits']}，写回冲突: {results['conflicts']}")
+        print(f"  抢床耗时: {claim_time:.3f} 秒，{len(plan) / claim_time:.0f} 次/秒")
+        print(f"  含写回总耗时: {total_time:.3f} 秒")
+        print(f"  预留床位: {reserved}，申请记录: {applications}，重复预留: {doubles}")
+        if doubles or reserved != applications:
+            print("  ❌ 床位与申请不一致")
+        else:
+            print("  ✅ 没有重复预留")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
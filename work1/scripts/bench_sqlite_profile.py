@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+SQLite 连接配置压测
+在临时数据库中同时运行读线程（查询空床宿舍、当天打卡人数）和写线程（逐条打卡并提交），
+分别使用默认配置和 config.ProductionConfig 中的生产配置（WAL + PRAGMA + 连接池），
+输出每秒读写次数、读请求 P95 延迟和 database is locked 错误数
+"""
+import sys
+import os
+import argparse
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from config.config import ProductionConfig
+from models.database import db, BedStatus, AttendanceRecord
+from models.user import User, Student
+from models.dormitory import Building, Dormitory, Bed
+from models.application import DormTeam
+from utils.sqlite_profile import configure_sqlite, current_pragmas
+
+
+def build_app(db_path, tuned):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    if tuned:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS
+        app.config['SQLITE_PRAGMAS'] = ProductionConfig.SQLITE_PRAGMAS
+    db.init_app(app)
+    configure_sqlite(app)
+    return app
+
+
+def seed(app, users, dorms):
+    with app.app_context():
+        db.create_all()
+        building = Building(name='压测楼', gender='男', total_floors=10)
+        db.session.add(building)
+        db.session.flush()
+        for i in range(dorms):
+            dorm = Dormitory(building_id=building.id, room_number=f'{i:04d}', floor=i % 10 + 1, capacity=4)
+            db.session.add(dorm)
+            db.session.flush()
+            db.session.add_all(Bed(dorm_id=dorm.id, bed_number=n, status=BedStatus.AVAILABLE.value)
+                               for n in range(1, 5))
+        for i in range(users):
+            db.session.add(User(username=f'bench{i}', password_hash='x'))
+        db.session.commit()
+        return [user_id for user_id, in db.session.query(User.id).order_by(User.id)]
+
+
+def run(app, user_ids, readers, writers, duration):
+    stats = {'reads': 0, 'writes': 0, 'locked': 0}
+    latencies = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    pending = list(user_ids)
+    today = date.today()
+
+    def reader():
+        local, times = 0, []
+        with app.app_context():
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    Dormitory.query.filter(Dormitory.available_count > 0).order_by(Dormitory.id).limit(50).all()
+                    db.session.query(func.count(AttendanceRecord.id)).filter(AttendanceRecord.date == today).scalar()
+                    db.session.commit()
+                    local += 1
+                    times.append(time.perf_counter() - started)
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        stats['locked'] += 1
+        with lock:
+            stats['reads'] += local
+            latencies.extend(times)
+
+    def writer():
+        local = 0
+        with app.app_context():
+            while not stop.is_set():
+                with lock:
+                    if not pending:
+                        break
+                    user_id = pending.pop()
+                try:
+                    db.session.add(AttendanceRecord(user_id=user_id, date=today, check_in_time=datetime.utcnow()))
+                    db.session.commit()
+                    local += 1
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        stats['locked'] += 1
+        with lock:
+            stats['writes'] += local
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    return stats, elapsed, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 连接配置压测')
+    parser.add_argument('--users', type=int, default=20000, help='参与打卡的用户数（每人最多写一次）')
+    parser.add_argument('--dorms', type=int, default=500, help='宿舍数量')
+    parser.add_argument('--readers', type=int, default=8, help='读线程数')
+    parser.add_argument('--writers', type=int, default=4, help='写线程数')
+    parser.add_argument('--duration', type=float, default=5.0, help='每种配置运行的秒数')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"读线程 {args.readers}，写线程 {args.writers}，每种配置运行 {args.duration} 秒")
+    print("=" * 60)
+
+    for name, tuned in (('默认配置', False), ('生产配置', True)):
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            app = build_app(db_path, tuned)
+            user_ids = seed(app, args.users, args.dorms)
+            with app.app_context():
+                pragmas = current_pragmas()
+                db.session.remove()
+            stats, elapsed, p95 = run(app, user_ids, args.readers, args.writers, args.duration)
+            with app.app_context():
+                db.engine.dispose()
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+        print(f"\n{name}")
+        print(f"  journal_mode={pragmas['journal_mode']}，synchronous={pragmas['synchronous']}，"
+              f"busy_timeout={pragmas['busy_timeout']}")
+        print(f"  读: {stats['reads']} 次，{stats['reads'] / elapsed:.0f} 次/秒，P95 {p95:.1f} ms")
+        print(f"  写: {stats['writes']} 次，{stats['writes'] / elapsed:.0f} 次/秒")
+        print(f"  database is locked: {stats['locked']} 次")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+每日打卡汇总结算
+按原始打卡记录重算已结束日期的各楼栋汇总行（attendance_daily_rollups）并标记为已结算，
+同时建立当天的汇总行。建议每天零点后由 cron 运行一次：
+    5 0 * * * cd /path/to/work1 && python scripts/finalize_attendance.py
+"""
+import sys
+import os
+import argparse
+from datetime import date, datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from start import app
+from models.database import db
+from services import attendance_rollup
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='结算每日打卡汇总')
+    parser.add_argument('--date', type=parse_date, help='只结算指定日期（YYYY-MM-DD），默认昨天')
+    parser.add_argument('--backfill', action='store_true', help='结算从最早打卡记录到昨天之间所有未结算的日期')
+    args = parser.parse_args()
+
+    today = date.today()
+    with app.app_context():
+        if args.backfill:
+            days = attendance_rollup.unfinalized_days()
+        else:
+            days = [args.date or today - timedelta(days=1)]
+        days = [day for day in days if day < today]
+
+        print("=" * 60)
+        print(f"待结算日期: {len(days)} 天")
+        print("=" * 60)
+        for day in days:
+            buildings = attendance_rollup.finalize_day(day)
+            db.session.commit()
+            print(f"✓ {day.isoformat()} 已结算（{buildings} 个楼栋）")
+
+        attendance_rollup.open_day(today)
+        db.session.commit()
+        print(f"✓ 已建立 {today.isoformat()} 的汇总行")
+        print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+批量导入学生
+从 CSV 文件导入学生账号（表头格式见 services/student_import.py），输出导入速度和出错的行：
+    python scripts/import_students.py students.csv --assign --errors errors.csv
+"""
+import sys
+import os
+import argparse
+import csv
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from start import app
+from services.student_import import import_students
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从 CSV 批量导入学生')
+    parser.add_argument('path', help='CSV 文件（UTF-8，可带 BOM）')
+    parser.add_argument('--chunk-size', type=int, help='每批行数，默认 STUDENT_IMPORT_CHUNK_SIZE')
+    parser.add_argument('--workers', type=int, help='计算密码哈希的进程数，默认 CPU 核数')
+    parser.add_argument('--assign', action='store_true', help='导入后为新学生整批分配宿舍')
+    parser.add_argument('--capacity', type=int, choices=[4, 6], help='宿舍人数偏好')
+    parser.add_argument('--errors', metavar='PATH', help='把出错的行号和原因写入 CSV 文件')
+    args = parser.parse_args()
+
+    with app.app_context():
+        print("=" * 60)
+        print(f"导入文件: {args.path}")
+        print("=" * 60)
+        with open(args.path, encoding='utf-8-sig', newline='') as f:
+            result = import_students(
+                f,
+                chunk_size=args.chunk_size or app.config.get('STUDENT_IMPORT_CHUNK_SIZE', 500),
+                workers=args.workers if args.workers is not None else app.config.get('STUDENT_IMPORT_WORKERS'),
+                assign=args.assign,
+                preferred_capacity=args.capacity
+            )
+
+        print(f"数据行: {result['total']}")
+        print(f"成功导入: {result['imported']}")
+        print(f"出错: {result['failed']}")
+        for error in result['errors'][:20]:
+            print(f"  第 {error['line']} 行: {error['message']}")
+        if result['failed'] > 20:
+            print(f"  ……共 {result['failed']} 行出错")
+        if 'assigned' in result:
+            print(f"分配宿舍: {result['assigned']} 名，未分配（无可用床位）: {result['unassigned']} 名")
+        print(f"耗时: {result['elapsed']:.2f} 秒")
+        print(f"导入速度: {result['rate']:.0f} 行/秒")
+        print("=" * 60)
+
+        if args.errors and result['errors']:
+            with open(args.errors, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['行号', '原因'])
+                writer.writerows((error['line'], error['message']) for error in result['errors'])
+            print(f"出错的行已写入 {args.errors}")
+
+
+if __name__ == '__main__':
+    main()
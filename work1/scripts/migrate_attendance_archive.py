@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：创建打卡归档登记表 attendance_archives
+表已存在时跳过，可重复执行；建表后运行 scripts/archive_attendance.py 归档历史打卡记录
+"""
+import sqlite3
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from start import app, db
+
+
+def migrate_database():
+    """创建 attendance_archives 表"""
+    with app.app_context():
+        # 获取数据库路径
+        db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+
+        print(f"正在迁移数据库: {db_path}")
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'attendance_archives'")
+            if cursor.fetchone():
+                print("✓ attendance_archives 表已存在")
+            else:
+                print("创建 attendance_archives 表...")
+                cursor.execute("""
+                    CREATE TABLE attendance_archives (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        month INTEGER NOT NULL UNIQUE,
+                        path VARCHAR(255) NOT NULL,
+                        row_count INTEGER NOT NULL DEFAULT 0,
+                        checked_in INTEGER NOT NULL DEFAULT 0,
+                        archived_at DATETIME
+                    )
+                """)
+                print("✓ attendance_archives 表创建成功")
+
+            conn.commit()
+            print("\n✅ 数据库迁移完成！")
+            print("提示：先运行 python scripts/migrate_attendance_bitmap.py，再运行 python scripts/archive_attendance.py 归档历史打卡记录")
+
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ 迁移失败: {e}")
+            raise
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    migrate_database()
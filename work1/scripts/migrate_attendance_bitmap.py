@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：创建每月打卡位图表 attendance_month_bitmaps，并由已有的打卡记录生成位图
+可重复执行：表已存在时跳过建表，位图按位或合并，不会重复计数
+"""
+import sqlite3
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from start import app, db
+
+
+def migrate_database():
+    """创建 attendance_month_bitmaps 表并回填"""
+    with app.app_context():
+        # 获取数据库路径
+        db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+
+        print(f"正在迁移数据库: {db_path}")
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'attendance_month_bitmaps'")
+            if cursor.fetchone():
+                print("✓ attendance_month_bitmaps 表已存在")
+            else:
+                print("创建 attendance_month_bitmaps 表...")
+                cursor.execute("""
+                    CREATE TABLE attendance_month_bitmaps (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL REFERENCES users (id),
+                        month INTEGER NOT NULL,
+                        days INTEGER NOT NULL DEFAULT 0,
+                        CONSTRAINT unique_bitmap_user_month UNIQUE (user_id, month)
+                    )
+                """)
+                print("✓ attendance_month_bitmaps 表创建成功")
+
+            # 每名学生每天至多一条打卡记录，按月求和即为各天位的按位或
+            print("由打卡记录生成位图...")
+            cursor.execute("""
+                INSERT INTO attendance_month_bitmaps (user_id, month, days)
+                SELECT user_id,
+                       CAST(strftime('%Y%m', date) AS INTEGER),
+                       SUM(1 << (CAST(strftime('%d', date) AS INTEGER) - 1))
+                FROM attendance_records
+                WHERE status = 'checked_in'
+                GROUP BY user_id, CAST(strftime('%Y%m', date) AS INTEGER)
+                ON CONFLICT (user_id, month) DO UPDATE SET days = days | excluded.days
+            """)
+            print(f"✓ 已生成 {cursor.rowcount} 个月度位图")
+
+            conn.commit()
+            print("\n✅ 数据库迁移完成！")
+
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ 迁移失败: {e}")
+            raise
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    migrate_database()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：创建每日打卡汇总表 attendance_daily_rollups
+表已存在时跳过，可重复执行；建表后运行 scripts/finalize_attendance.py --backfill 结算历史数据
+"""
+import sqlite3
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from start import app, db
+
+
+def migrate_database():
+    """创建 attendance_daily_rollups 表"""
+    with app.app_context():
+        # 获取数据库路径
+        db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+
+        print(f"正在迁移数据库: {db_path}")
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'attendance_daily_rollups'")
+            if cursor.fetchone():
+                print("✓ attendance_daily_rollups 表已存在")
+            else:
+                print("创建 attendance_daily_rollups 表...")
+                cursor.execute("""
+                    CREATE TABLE attendance_daily_rollups (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        date DATE NOT NULL,
+                        building_id INTEGER NOT NULL DEFAULT 0,
+                        total_students INTEGER NOT NULL DEFAULT 0,
+                        checked_in INTEGER NOT NULL DEFAULT 0,
+                        finalized BOOLEAN NOT NULL DEFAULT 0,
+                        updated_at DATETIME,
+                        CONSTRAINT unique_rollup_date_building UNIQUE (date, building_id)
+                    )
+                """)
+                print("✓ attendance_daily_rollups 表创建成功")
+
+            conn.commit()
+            print("\n✅ 数据库迁移完成！")
+            print("提示：运行 python scripts/finalize_attendance.py --backfill 结算历史打卡数据")
+
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ 迁移失败: {e}")
+            raise
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    migrate_database()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：为 dormitories 和 buildings 表添加床位计数字段，并按现有床位状态回填
+重复执行时只会重新统计计数，可用于修正计数
+"""
+import sqlite3
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from start import app, db
+
+COUNTERS = (
+    ('available_count', "(beds.status = 'available' OR beds.status IS NULL)"),
+    ('occupied_count', "beds.status = 'occupied'"),
+    ('reserved_count', "beds.status = 'reserved'"),
+)
+
+
+def migrate_database():
+    """添加计数字段并回填"""
+    with app.app_context():
+        # 获取数据库路径
+        db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+
+        print(f"正在迁移数据库: {db_path}")
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        try:
+            for table in ('dormitories', 'buildings'):
+                cursor.execute(f"PRAGMA table_info({table})")
+                columns = [row[1] for row in cursor.fetchall()]
+                for column, _ in COUNTERS:
+                    if column not in columns:
+                        print(f"添加 {table}.{column} 列...")
+                        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+                    else:
+                        print(f"✓ {table}.{column} 列已存在")
+
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS ix_dormitories_available_count ON dormitories (available_count)"
+            )
+
+            print("回填床位计数...")
+            for column, match in COUNTERS:
+                cursor.execute(
+                    f"UPDATE dormitories SET {column} = "
+                    f"(SELECT COUNT(*) FROM beds WHERE beds.dorm_id = dormitories.id AND {match})"
+                )
+                cursor.execute(
+                    f"UPDATE buildings SET {column} = "
+                    f"(SELECT COALESCE(SUM(dormitories.{column}), 0) FROM dormitories "
+                    f"WHERE dormitories.building_id = buildings.id)"
+                )
+
+            conn.commit()
+            print("\n✅ 数据库迁移完成！")
+
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ 迁移失败: {e}")
+            raise
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    migrate_database()
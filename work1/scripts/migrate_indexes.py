@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：为高频查询添加组合索引（床位状态、学生床位、申请、消息、评价、公告）
+索引已存在时跳过，可重复执行
+"""
+import sqlite3
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from start import app, db
+
+# (表名, 索引名, 列)，与 migrations/versions/8c2d5e0f7a19_add_hot_path_indexes.py 一致
+INDEXES = (
+    ('beds', 'ix_beds_dorm_id_status', ['dorm_id', 'status']),
+    ('beds', 'ix_beds_status_dorm_id', ['status', 'dorm_id']),
+    ('students', 'ix_students_current_bed_id', ['current_bed_id']),
+    ('students', 'ix_students_gender_team_id', ['gender', 'team_id', 'current_bed_id']),
+    ('dorm_applications', 'ix_dorm_applications_student_type_status', ['student_id', 'application_type', 'status']),
+    ('dorm_applications', 'ix_dorm_applications_status_created_at', ['status', 'created_at']),
+    ('dorm_applications', 'ix_dorm_applications_created_at', ['created_at']),
+    ('messages', 'ix_messages_receiver_id_is_read', ['receiver_id', 'is_read']),
+    ('messages', 'ix_messages_sender_id', ['sender_id']),
+    ('dorm_reviews', 'ix_dorm_reviews_dorm_id_student_id', ['dorm_id', 'student_id']),
+    ('dorm_reviews', 'ix_dorm_reviews_student_id', ['student_id']),
+    ('announcements', 'ix_announcements_expire_at', ['expire_at']),
+)
+
+
+def migrate_database():
+    """创建索引并更新统计信息"""
+    with app.app_context():
+        # 获取数据库路径
+        db_path = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')
+
+        print(f"正在迁移数据库: {db_path}")
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            tables = {row[0] for row in cursor.fetchall()}
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            indexes = {row[0] for row in cursor.fetchall()}
+
+            for table, name, columns in INDEXES:
+                if table not in tables:
+                    print(f"⚠ {table} 表不存在，跳过 {name}")
+                elif name in indexes:
+                    print(f"✓ {name} 已存在")
+                else:
+                    print(f"创建索引 {name} ({', '.join(columns)})...")
+                    cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+
+            print("更新查询统计信息 (ANALYZE)...")
+            cursor.execute("ANALYZE")
+
+            conn.commit()
+            print("\n✅ 数据库迁移完成！")
+
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ 迁移失败: {e}")
+            raise
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    migrate_database()
@@ -0,0 +1,321 @@
+"""
+宿舍自动分配
+
+同一间宿舍里每张空床的得分完全相同（楼层、设施、人数和室友画像都只取决于宿舍），
+因此按宿舍打分：每间候选宿舍只算一次分，用堆挑出最高分的宿舍，再返回其中任意一张空床。
+
+batch_assign 用于新生入学时整批分配：一次性把空床和宿舍画像读入内存，
+在内存中逐个分配后用批量 UPDATE 写回，评分权重与 auto_assign_dorm 完全相同。
+"""
+import heapq
+import time
+
+from sqlalchemy import bindparam
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models.database import db, BedStatus
+from models.dormitory import Bed, apply_bed_counter_deltas
+from models.user import Student
+from services import bed_service
+from services.bed_index import bed_index
+from services.bed_service import BedConflictError
+from services.dorm_profile import dorm_profiles, load_profiles, DormProfile
+from services.roommate_matcher import roommate_matcher
+
+
+def capacity_order(preferred_capacity):
+    """宿舍人数的向下兼容顺序（最多6人间）"""
+    order = [preferred_capacity]
+    if preferred_capacity == 4:
+        order.extend([6])  # 4人间满则选6人间
+    elif preferred_capacity == 6:
+        order.extend([4])  # 6人间满则选4人间
+    else:
+        order.extend([4, 6])  # 其他情况按常规顺序
+    return order
+
+
+def dorm_base_score(dorm, preferred_capacity=None):
+    """与室友无关的宿舍分数：人数偏好 + 楼层 + 设施"""
+    score = 0
+
+    # 宿舍偏好分数 (30分)
+    # 根据用户偏好和实际宿舍人数计算分数
+    if preferred_capacity:
+        if dorm.capacity == preferred_capacity:
+            score += 30  # 完全匹配偏好
+        elif preferred_capacity == 4 and dorm.capacity == 6:
+            score += 20  # 4人间满，分配6人间
+        elif preferred_capacity == 6 and dorm.capacity == 4:
+            score += 20  # 6人间满，分配4人间
+        else:
+            score += 10  # 其他情况
+    else:
+        # 没有偏好时的默认分数
+        if dorm.capacity == 4:
+            score += 20
+        elif dorm.capacity == 6:
+            score += 15
+        else:
+            score += 5
+
+    # 楼层偏好 (10分)
+    # 优先分配中间楼层 (3-7楼)
+    if 3 <= dorm.floor <= 7:
+        score += 10
+    elif dorm.floor in [2, 8]:
+        score += 5
+
+    # 设施偏好 (10分)
+    if dorm.has_ac:
+        score += 3
+    if dorm.has_bathroom:
+        score += 3
+    if dorm.has_balcony:
+        score += 2
+    if dorm.has_water_heater:
+        score += 2
+
+    return score
+
+
+def score_dorm(student, dorm, profile, preferred_capacity=None):
+    """宿舍总分 = 专业匹配(30) + 生活习惯(40) + 人数偏好(30) + 楼层(10) + 设施(10)"""
+    return (profile.major_score(student)
+            + profile.lifestyle_score(student)
+            + dorm_base_score(dorm, preferred_capacity))
+
+
+def select_capacities(free_beds, preferred_capacity=None):
+    """按人数偏好选出参与打分的分桶：{人数: {宿舍ID: [床位ID]}}"""
+    if preferred_capacity:
+        # 按偏好顺序选择第一个有空床的分桶
+        for capacity in capacity_order(preferred_capacity):
+            if capacity in free_beds:
+                return {capacity: free_beds[capacity]}
+    # 没有偏好，或者所有偏好宿舍都满了，使用所有可用床位
+    return free_beds
+
+
+def auto_assign_dorm(student, preferred_capacity=None):
+    """
+    使用贪心算法自动分配宿舍
+    优先级：性别匹配 > 宿舍人数偏好 > 专业匹配 > 生活习惯匹配 > 随机分配
+    支持向下兼容：4人间满则选6人间，6人间满则选8人间
+    """
+    # 1. 从空闲床位索引中取出与学生性别相同的候选床位（按宿舍人数分桶）
+    free_beds = bed_index.free_beds(student.gender)
+    if not free_beds:
+        return None
+
+    # 2. 按宿舍人数偏好筛选（支持向下兼容）
+    candidates = select_capacities(free_beds, preferred_capacity)
+
+    # 3. 每间宿舍只打一次分，建堆后按分数从高到低取（同分取宿舍ID小的）
+    heap = []
+    for dorm_beds in candidates.values():
+        for dorm_id, bed_ids in dorm_beds.items():
+            dorm = bed_index.dorm(dorm_id)
+            score = score_dorm(student, dorm, dorm_profiles.get(dorm_id), preferred_capacity)
+            heap.append((-score, dorm_id, bed_ids))
+    heapq.heapify(heap)
+
+    # 4. 返回最高分宿舍中的任意一张空床
+    stale = False
+    while heap:
+        _, dorm_id, bed_ids = heapq.heappop(heap)
+        for bed_id in bed_ids:
+            bed = db.session.get(Bed, bed_id)
+            # 索引可能落后于其他进程的提交，取出时再确认一次床位状态
+            if bed and bed.status == BedStatus.AVAILABLE.value:
+                return bed
+            bed_index.discard(bed_id)
+            stale = True
+
+    if stale:
+        # 候选床位都已失效，按刷新后的索引重新挑选（可能回退到其他人数的宿舍）
+        return auto_assign_dorm(student, preferred_capacity)
+
+    return None
+
+
+def assign_and_occupy(student, preferred_capacity=None, attempts=3):
+    """
+    自动分配并用条件更新占用床位，返回床位；没有空床时返回 None
+    挑中的床位被并发请求抢先占用时，从索引中剔除后重新挑选
+    """
+    for _ in range(attempts):
+        bed = auto_assign_dorm(student, preferred_capacity)
+        if bed is None:
+            return None
+        try:
+            bed_service.occupy(bed.id, expected=BedStatus.AVAILABLE.value)
+        except BedConflictError:
+            bed_index.discard(bed.id)
+            continue
+        student.current_bed_id = bed.id
+        return bed
+    return None
+
+
+class _BatchPool:
+    """批量分配时某一性别的内存床位池"""
+
+    def __init__(self, free_beds, profiles, preferred_capacity):
+        self.free = {}        # 宿舍ID -> 剩余空床ID（倒序，pop() 取ID最小的）
+        self.profiles = {}    # 宿舍ID -> DormProfile（分配过程中同步累加）
+        self.base = {}        # 宿舍ID -> 与室友无关的基础分
+        self.empty = {}       # 人数 -> [(-基础分, 宿舍ID)]，尚无人入住的宿舍，按分数排好序
+        self.occupied = {}    # 人数 -> {宿舍ID}，已有室友的宿舍，需要逐个按画像打分
+        self.capacity_of = {}
+        for capacity, dorm_beds in free_beds.items():
+            empty = self.empty.setdefault(capacity, [])
+            occupied = self.occupied.setdefault(capacity, set())
+            for dorm_id, bed_ids in dorm_beds.items():
+                dorm = bed_index.dorm(dorm_id)
+                profile = profiles.get(dorm_id) or DormProfile()
+                self.free[dorm_id] = sorted(bed_ids, reverse=True)
+                self.profiles[dorm_id] = profile
+                self.base[dorm_id] = dorm_base_score(dorm, preferred_capacity)
+                self.capacity_of[dorm_id] = capacity
+                if profile.count:
+                    occupied.add(dorm_id)
+                else:
+                    empty.append((-self.base[dorm_id], dorm_id))
+            empty.sort(reverse=True)  # 末尾是最高分，便于 pop
+
+    def _best_empty(self, capacity):
+        empty = self.empty[capacity]
+        # 已经住进人或已满的宿舍在这里惰性剔除
+        while empty and (self.profiles[empty[-1][1]].count or not self.free[empty[-1][1]]):
+            empty.pop()
+        return empty[-1] if empty else None
+
+    def _has_beds(self, capacity):
+        if capacity not in self.empty:
+            return False
+        return bool(self.occupied[capacity]) or self._best_empty(capacity) is not None
+
+    def assign(self, student, preferred_capacity):
+        if preferred_capacity:
+            capacities = [c for c in capacity_order(preferred_capacity) if self._has_beds(c)][:1]
+        else:
+            capacities = []
+        if not capacities:
+            capacities = [c for c in self.empty if self._has_beds(c)]
+
+        best = None
+        for capacity in capacities:
+            entry = self._best_empty(capacity)
+            if entry is not None and (best is None or entry < best):
+                best = entry
+            for dorm_id in self.occupied[capacity]:
+                profile = self.profiles[dorm_id]
+                entry = (-(self.base[dorm_id] + profile.major_score(student)
+                           + profile.lifestyle_score(student)), dorm_id)
+                if best is None or entry < best:
+                    best = entry
+        if best is None:
+            return None
+
+        dorm_id = best[1]
+        bed_id = self.free[dorm_id].pop()
+        self.profiles[dorm_id].add_student(student)
+        capacity = self.capacity_of[dorm_id]
+        if self.free[dorm_id]:
+            self.occupied[capacity].add(dorm_id)
+        else:
+            self.occupied[capacity].discard(dorm_id)
+        return dorm_id, bed_id
+
+
+# 批量写回时床位被并发占用的最大重试次数
+_BATCH_ATTEMPTS = 3
+
+
+def _plan_batch(students, preferred_capacity):
+    """在内存中规划整批分配，返回 ([(学生, 宿舍ID, 床位ID)], [未分配学生ID])"""
+    # 1. 一次性读入空床和宿舍画像
+    profiles = load_profiles()
+    pools = {gender: _BatchPool(bed_index.free_beds(gender), profiles, preferred_capacity)
+             for gender in {s.gender for s in students}}
+
+    # 2. 在内存中逐个分配
+    assignments = []
+    unassigned = []
+    for student in students:
+        result = pools[student.gender].assign(student, preferred_capacity)
+        if result is None:
+            unassigned.append(student.id)
+        else:
+            assignments.append((student, result[0], result[1]))
+    return assignments, unassigned
+
+
+def _write_batch(assignments):
+    """3. 批量写回：床位用条件 UPDATE，任何一张床已不是空闲状态就抛出 BedConflictError"""
+    beds = Bed.__table__
+    if assignments:
+        result = db.session.execute(
+            beds.update().where(
+                beds.c.id == bindparam('bed_id'), beds.c.status == BedStatus.AVAILABLE.value
+            ).values(status=BedStatus.OCCUPIED.value),
+            [{'bed_id': bed_id} for _, _, bed_id in assignments]
+        )
+        if result.rowcount != len(assignments):
+            raise BedConflictError(None, BedStatus.AVAILABLE.value, BedStatus.OCCUPIED.value)
+    db.session.bulk_update_mappings(Student, [
+        {'id': student.id, 'current_bed_id': bed_id} for student, _, bed_id in assignments
+    ])
+    deltas = {}
+    for _, dorm_id, _ in assignments:
+        changes = deltas.setdefault(dorm_id, {BedStatus.AVAILABLE.value: 0, BedStatus.OCCUPIED.value: 0})
+        changes[BedStatus.AVAILABLE.value] -= 1
+        changes[BedStatus.OCCUPIED.value] += 1
+    apply_bed_counter_deltas(db.session, deltas)
+    db.session.commit()
+
+
+def batch_assign(students, preferred_capacity=None):
+    """
+    整批自动分配宿舍
+    students 为尚未分配床位的 Student 列表；按专业和生活习惯排序后依次贪心分配，
+    相似的学生连续处理更容易被分到同一间宿舍，结果也不再依赖注册先后顺序。
+    返回 {'assigned', 'unassigned', 'elapsed', 'rate'}，rate 为每秒分配的学生数。
+    """
+    started = time.perf_counter()
+    students = sorted(
+        (s for s in students if not s.current_bed_id),
+        key=lambda s: (s.gender, s.major_id or 0, s.sleep_time or '', s.wake_time or '',
+                       s.quietness or 0, s.cleanliness or 0, s.id)
+    )
+
+    for attempt in range(_BATCH_ATTEMPTS):
+        assignments, unassigned = _plan_batch(students, preferred_capacity)
+        try:
+            _write_batch(assignments)
+            break
+        except BedConflictError:
+            # 规划期间有床位被其他请求占用：整批回滚，重建索引后重新规划
+            db.session.rollback()
+            bed_index.reset()
+            if attempt == _BATCH_ATTEMPTS - 1:
+                raise
+        except Exception:
+            db.session.rollback()
+            raise
+
+    # 批量 UPDATE 不经过 ORM 事件，宿舍计数已在事务内手动调整，这里再同步内存对象、空床索引和宿舍画像
+    for student, _, bed_id in assignments:
+        set_committed_value(student, 'current_bed_id', bed_id)
+        bed_index.discard(bed_id)
+    dorm_profiles.invalidate(dorm_ids={dorm_id for _, dorm_id, _ in assignments})
+    roommate_matcher.reset()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'assigned': len(assignments),
+        'unassigned': unassigned,
+        'elapsed': elapsed,
+        'rate': len(assignments) / elapsed if elapsed > 0 else 0.0,
+    }
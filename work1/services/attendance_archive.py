@@ -0,0 +1,213 @@
+"""
+打卡记录按月归档
+
+attendance_records 每天每名学生一行，只增不减。打卡记录以自然月为分区：
+- 最近 ATTENDANCE_HOT_MONTHS 个月（含当月）留在数据库中；
+- 更早的月份由 scripts/archive_attendance.py 导出到 <ATTENDANCE_ARCHIVE_DIR>/attendance-YYYYMM.csv.gz
+  （每行 "用户ID,日期,状态,打卡时间"，按日期、用户ID排序），在 attendance_archives 中登记后从 attendance_records 删除。
+
+归档前先结算该月还没有结算的日期，并用该月的打卡记录补齐打卡位图，
+归档后的统计和打卡日历读汇总表和位图，结果与归档前相同（见 services/attendance_service.py）。
+需要逐条记录（打卡时间、未打卡记录）时用 iter_records：已归档的月份读归档文件，其余读数据库，调用方不需要区分。
+
+已归档月份之后又写入的打卡记录（例如写缓冲日志重放）留在数据库中，读取时与归档文件合并，再次归档时并入归档文件。
+"""
+import csv
+import gzip
+import io
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from models.database import db, AttendanceRecord, AttendanceArchive, AttendanceDailyRollup
+from services import attendance_calendar, attendance_rollup
+from services.attendance_calendar import month_key
+from services.attendance_service import CHECKED_IN
+from utils.upsert import upsert_insert
+
+AttendanceRow = namedtuple('AttendanceRow', 'user_id date status check_in_time')
+
+
+def archive_dir():
+    """归档目录；相对路径按应用根目录解析，定时脚本和 web worker 读写同一个目录"""
+    return os.path.join(current_app.root_path, current_app.config.get('ATTENDANCE_ARCHIVE_DIR', 'archives/attendance'))
+
+
+def _month_bounds(key):
+    first = date(key // 100, key % 100, 1)
+    last = (first + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    return first, last
+
+
+def _shift_months(key, months):
+    index = (key // 100) * 12 + key % 100 - 1 + months
+    return index // 12 * 100 + index % 12 + 1
+
+
+def archived_months():
+    return {month for month, in db.session.query(AttendanceArchive.month)}
+
+
+def archivable_months(keep=None):
+    """数据库中仍有打卡记录、且早于最近 keep 个月（默认 ATTENDANCE_HOT_MONTHS）的月份"""
+    keep = keep if keep is not None else current_app.config.get('ATTENDANCE_HOT_MONTHS', 6)
+    cutoff, _ = _month_bounds(_shift_months(month_key(date.today()), -(keep - 1)))
+    first = db.session.query(func.min(AttendanceRecord.date)).filter(AttendanceRecord.date < cutoff).scalar()
+    if first is None:
+        return []
+    months = []
+    key = month_key(first)
+    while key < month_key(cutoff):
+        start, end = _month_bounds(key)
+        if db.session.query(AttendanceRecord.id).filter(AttendanceRecord.date.between(start, end)).first():
+            months.append(key)
+        key = _shift_months(key, 1)
+    return months
+
+
+def _read_archive(path):
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        for user_id, day, status, at in csv.reader(f):
+            yield AttendanceRow(int(user_id), date.fromisoformat(day), status,
+                                datetime.fromisoformat(at) if at else None)
+
+
+def _hot_rows(start, end, user_id=None):
+    query = db.session.query(
+        AttendanceRecord.user_id, AttendanceRecord.date, AttendanceRecord.status, AttendanceRecord.check_in_time
+    ).filter(AttendanceRecord.date.between(start, end))
+    if user_id is not None:
+        query = query.filter(AttendanceRecord.user_id == user_id)
+    query = query.order_by(AttendanceRecord.date, AttendanceRecord.user_id).execution_options(yield_per=2000)
+    return (AttendanceRow(*row) for row in query)
+
+
+def _merged_rows(archive, start, end, user_id=None):
+    """归档文件与数据库中同一月份的记录合并（数据库中的较新），按日期、用户ID排序"""
+    rows = {(row.date, row.user_id): row for row in _read_archive(os.path.join(archive_dir(), archive.path))
+            if start <= row.date <= end and (user_id is None or row.user_id == user_id)}
+    rows.update(((row.date, row.user_id), row) for row in _hot_rows(start, end, user_id))
+    return (rows[key] for key in sorted(rows))
+
+
+def iter_records(start, end, user_id=None):
+    """start 到 end（含）的打卡记录，按日期、用户ID排序；已归档的月份从归档文件读取"""
+    archives = {archive.month: archive for archive in AttendanceArchive.query.filter(
+        AttendanceArchive.month.between(month_key(start), month_key(end))
+    )}
+    key = month_key(start)
+    while key <= month_key(end):
+        first, last = _month_bounds(key)
+        first, last = max(first, start), min(last, end)
+        if key in archives:
+            yield from _merged_rows(archives[key], first, last, user_id)
+        else:
+            yield from _hot_rows(first, last, user_id)
+        key = _shift_months(key, 1)
+
+
+def _write_archive(path, rows):
+    """写入临时文件后改名，返回 (行数, 已打卡数)"""
+    tmp = f'{path}.tmp-{os.getpid()}'
+    count = checked_in = 0
+    with open(tmp, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+            with io.TextIOWrapper(gz, encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                for row in rows:
+                    writer.writerow((row.user_id, row.date.isoformat(), row.status,
+                                     row.check_in_time.isoformat() if row.check_in_time else ''))
+                    count += 1
+                    checked_in += row.status == CHECKED_IN
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    return count, checked_in
+
+
+def archive_month(key):
+    """
+    把某月的打卡记录导出到归档文件并从 attendance_records 删除，返回归档的行数（含之前已归档的）
+    文件写完后在同一事务内登记归档、删除记录并提交；当月及以后的月份不能归档
+    """
+    if key >= month_key(date.today()):
+        raise ValueError(f'{key} 尚未结束，不能归档')
+    start, end = _month_bounds(key)
+
+    # 汇总行和打卡位图在删除记录前补齐；没有打卡记录的日期不建汇总行
+    finalized = {day for day, in db.session.query(AttendanceDailyRollup.date).filter(
+        AttendanceDailyRollup.finalized == True,
+        AttendanceDailyRollup.date.between(start, end)
+    ).distinct()}
+    recorded = [day for day, in db.session.query(AttendanceRecord.date).filter(
+        AttendanceRecord.date.between(start, end)
+    ).distinct().order_by(AttendanceRecord.date)]
+    for day in recorded:
+        if day not in finalized:
+            attendance_rollup.finalize_day(day)
+    checked = db.session.query(AttendanceRecord.user_id, AttendanceRecord.date).filter(
+        AttendanceRecord.date.between(start, end),
+        AttendanceRecord.status == CHECKED_IN
+    )
+    attendance_calendar.mark_days(db.session, checked.all())
+
+    directory = archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    archive = AttendanceArchive.query.filter_by(month=key).first()
+    name = f'attendance-{key}.csv.gz'
+    if archive is None:
+        rows = _hot_rows(start, end)
+        archive = AttendanceArchive(month=key, path=name)
+        db.session.add(archive)
+    else:
+        rows = list(_merged_rows(archive, start, end))
+    archive.row_count, archive.checked_in = _write_archive(os.path.join(directory, name), rows)
+    archive.path = name
+    archive.archived_at = datetime.utcnow()
+
+    db.session.execute(AttendanceRecord.__table__.delete().where(AttendanceRecord.date.between(start, end)))
+    db.session.commit()
+    return archive.row_count
+
+
+def restore_month(key):
+    """把已归档月份的记录写回 attendance_records 并删除归档文件，返回写回的行数；数据库中已有的记录保持不变"""
+    archive = AttendanceArchive.query.filter_by(month=key).first()
+    if archive is None:
+        raise ValueError(f'{key} 没有归档')
+    path = os.path.join(archive_dir(), archive.path)
+    table = AttendanceRecord.__table__
+    insert = upsert_insert(db.session)
+    start, end = _month_bounds(key)
+    existing = set()
+    if insert is None:
+        # 没有 ON CONFLICT 的数据库先排除已有记录
+        existing = set(db.session.query(AttendanceRecord.user_id, AttendanceRecord.date).filter(
+            AttendanceRecord.date.between(start, end)
+        ))
+    restored = 0
+    batch = []
+    for row in _read_archive(path):
+        if (row.user_id, row.date) in existing:
+            continue
+        batch.append(row._asdict())
+        if len(batch) == 1000:
+            restored += _insert_rows(table, insert, batch)
+            batch = []
+    if batch:
+        restored += _insert_rows(table, insert, batch)
+    db.session.delete(archive)
+    db.session.commit()
+    os.remove(path)
+    return restored
+
+
+def _insert_rows(table, insert, rows):
+    if insert is None:
+        db.session.execute(table.insert(), rows)
+    else:
+        db.session.execute(insert(table).on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.date]), rows)
+    return len(rows)
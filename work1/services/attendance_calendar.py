@@ -0,0 +1,159 @@
+"""
+打卡日历位图
+
+attendance_month_bitmaps 为每名学生每月保存一个整数，第 n 位（从 0 起）表示当月 n+1 日是否已打卡。
+新打卡在同一事务内用 upsert 把对应位或（|）进去（见 services/attendance_service.py），
+与 attendance_records 一同维护；历史打卡记录归档后日历仍然完整。
+
+打卡日历、连续打卡天数、每月出勤率都只需读取查询范围内的几个整数，再做位运算：
+- 某天是否打卡：bits >> (日 - 1) & 1
+- 截至某天的连续打卡天数：把该天之前的位取反后求最高位，逐月向前累加
+- 当月打卡天数：bits 中 1 的个数
+"""
+import calendar as _calendar
+from datetime import date, timedelta
+
+from models.database import db, AttendanceMonthBitmap
+from utils.upsert import upsert_insert
+
+CHECKED_IN = 'checked_in'
+NOT_CHECKED = 'not_checked'
+
+
+def month_key(day):
+    return day.year * 100 + day.month
+
+
+def _month_start(key):
+    return date(key // 100, key % 100, 1)
+
+
+def _month_days(key):
+    return _calendar.monthrange(key // 100, key % 100)[1]
+
+
+def _months(start, end):
+    """start 到 end 之间（含）每个月的 month_key"""
+    key, last = month_key(start), month_key(end)
+    while key <= last:
+        yield key
+        key = key + 1 if key % 100 < 12 else (key // 100 + 1) * 100 + 1
+
+
+def _popcount(bits):
+    return bin(bits).count('1')
+
+
+def mark_days(session, entries):
+    """
+    把 (用户ID, 日期) 对应的位置 1；同一用户同一月份合并成一次 upsert，需要调用方提交
+    """
+    bits = {}
+    for user_id, day in entries:
+        key = (user_id, month_key(day))
+        bits[key] = bits.get(key, 0) | 1 << (day.day - 1)
+    if not bits:
+        return
+
+    insert = upsert_insert(session)
+    if insert is None:
+        for (user_id, month), days in bits.items():
+            bitmap = AttendanceMonthBitmap.query.filter_by(user_id=user_id, month=month).first()
+            if bitmap is None:
+                session.add(AttendanceMonthBitmap(user_id=user_id, month=month, days=days))
+            else:
+                bitmap.days = bitmap.days | days
+        return
+
+    table = AttendanceMonthBitmap.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.month],
+        set_={'days': table.c.days.op('|')(stmt.excluded.days)}
+    )
+    params = [{'user_id': user_id, 'month': month, 'days': days} for (user_id, month), days in bits.items()]
+    session.execute(stmt, params[0] if len(params) == 1 else params)
+
+
+def load_bitmaps(user_id, start, end):
+    """start 到 end 所在各月的位图，{month_key: bits}，没有打卡的月份为 0（一条查询）"""
+    rows = db.session.query(AttendanceMonthBitmap.month, AttendanceMonthBitmap.days).filter(
+        AttendanceMonthBitmap.user_id == user_id,
+        AttendanceMonthBitmap.month.between(month_key(start), month_key(end))
+    )
+    bitmaps = dict.fromkeys(_months(start, end), 0)
+    bitmaps.update(rows)
+    return bitmaps
+
+
+def is_checked(bitmaps, day):
+    return bool(bitmaps.get(month_key(day), 0) >> (day.day - 1) & 1)
+
+
+def days(bitmaps, start, end):
+    """start 到 end 每天的打卡状态，[{'date': 日期, 'status': ...}]"""
+    result = []
+    day = start
+    while day <= end:
+        result.append({'date': day, 'status': CHECKED_IN if is_checked(bitmaps, day) else NOT_CHECKED})
+        day += timedelta(days=1)
+    return result
+
+
+def streak(bitmaps, end):
+    """
+    截至 end 的连续打卡天数；end 当天还没打卡时从前一天算起
+    只用到 bitmaps 中已加载的月份，超出部分视为未打卡
+    """
+    if not is_checked(bitmaps, end):
+        end -= timedelta(days=1)
+    total = 0
+    key, upto = month_key(end), end.day
+    while key in bitmaps:
+        mask = (1 << upto) - 1
+        # 从 upto 日往前第一个未打卡的日子
+        gap = (~bitmaps[key] & mask).bit_length()
+        total += upto - gap
+        if gap:
+            break
+        key = month_key(_month_start(key) - timedelta(days=1))
+        upto = _month_days(key)
+    return total
+
+
+def monthly_rates(bitmaps, start, end):
+    """start 到 end 范围内每个月的打卡天数和出勤率（当月只算到 end）"""
+    result = []
+    for key in _months(start, end):
+        first = max(_month_start(key), start)
+        last = min(_month_start(key) + timedelta(days=_month_days(key) - 1), end)
+        # 只统计范围内的日子
+        mask = ((1 << last.day) - 1) & ~((1 << (first.day - 1)) - 1)
+        checked = _popcount(bitmaps.get(key, 0) & mask)
+        span = last.day - first.day + 1
+        result.append({
+            'month': f'{key // 100}-{key % 100:02d}',
+            'checked_days': checked,
+            'days': span,
+            'rate': round(checked / span, 4),
+        })
+    return result
+
+
+def _streak_start(bitmaps, end, count):
+    """连续打卡的第一天"""
+    last = end if is_checked(bitmaps, end) else end - timedelta(days=1)
+    return last - timedelta(days=count - 1)
+
+
+def get_calendar(user_id, start, end):
+    """读取位图并返回 (每日状态, 连续打卡天数, 每月出勤率)；连续天数截至 end 计算"""
+    # 多读一个月，连续打卡跨月时还能继续往前数
+    bitmaps = load_bitmaps(user_id, min(start, end.replace(day=1) - timedelta(days=1)), end)
+    count = streak(bitmaps, end)
+    # 连续打卡一直延续到已加载的最早月份的月初：再往前读 12 个月（一条查询），直到中断
+    while count and _streak_start(bitmaps, end, count) == _month_start(min(bitmaps)):
+        earliest = _month_start(min(bitmaps))
+        bitmaps.update(load_bitmaps(user_id, earliest.replace(year=earliest.year - 1), earliest - timedelta(days=1)))
+        count = streak(bitmaps, end)
+    return days(bitmaps, start, end), count, monthly_rates(bitmaps, start, end)
@@ -0,0 +1,163 @@
+"""
+每日打卡汇总
+
+attendance_daily_rollups 为每天每栋楼保存一行：学生数、已打卡数、是否已结算。
+- 当天：定时任务（scripts/finalize_attendance.py）和生产环境的应用启动时用一条 INSERT ... SELECT 建立各楼栋的汇总行，
+  之后每次新打卡在同一事务内给所在楼栋的汇总行加一（见 services/attendance_service.py）；
+  当天汇总行的学生数是建立时的人数，当天新注册或调整床位的学生要到结算后才反映；
+- 已结束的日期：定时任务（scripts/finalize_attendance.py）按原始打卡记录重算并标记为已结算。
+
+按楼栋的统计和多月趋势只读汇总行，不再扫描 attendance_records；查询不写数据库，
+汇总行还没有建立的当天按原始打卡记录现算（attendance_service.daily_breakdown）。
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import case, func, insert, literal
+from sqlalchemy.exc import SQLAlchemyError
+
+from models.database import db, AttendanceRecord, AttendanceDailyRollup
+from models.user import User
+from models.dormitory import Building
+from services.attendance_service import checked_in_users, daily_breakdown, students_with_attendance
+from utils.upsert import upsert_insert
+
+_COLUMNS = ('date', 'building_id', 'total_students', 'checked_in', 'finalized')
+
+
+def _rollup_rows(day, finalized):
+    """按原始打卡记录计算某天各楼栋汇总行的 SELECT"""
+    building_id = func.coalesce(Building.id, 0)
+    checked = checked_in_users(day)
+    return students_with_attendance(
+        checked,
+        literal(day, type_=db.Date),
+        building_id,
+        func.count(User.id),
+        func.count(checked.c.user_id),
+        literal(finalized, type_=db.Boolean)
+    ).group_by(building_id).statement
+
+
+def open_day(day=None):
+    """建立某天的汇总行（已存在的保持不变），之后的新打卡会在这些行上累加；需要调用方提交"""
+    day = day or date.today()
+    if db.session.query(AttendanceDailyRollup.id).filter_by(date=day).first():
+        return
+    table = AttendanceDailyRollup.__table__
+    columns = [table.c[name] for name in _COLUMNS]
+    upsert = upsert_insert(db.session)
+    if upsert is not None:
+        # 并发建立时以先提交的为准
+        stmt = upsert(table).from_select(columns, _rollup_rows(day, False)).on_conflict_do_nothing(
+            index_elements=[table.c.date, table.c.building_id]
+        )
+    else:
+        stmt = insert(table).from_select(columns, _rollup_rows(day, False))
+    db.session.execute(stmt)
+
+
+def init_app(app):
+    """ATTENDANCE_ROLLUP_ON_STARTUP 开启时（生产环境）建立当天的汇总行；数据库还没有迁移（没有汇总表）时跳过"""
+    if not app.config.get('ATTENDANCE_ROLLUP_ON_STARTUP'):
+        return
+    with app.app_context():
+        try:
+            open_day()
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+        finally:
+            db.session.remove()
+
+
+def finalize_day(day):
+    """按原始打卡记录重算某天的汇总行并标记为已结算，返回楼栋行数；需要调用方提交"""
+    table = AttendanceDailyRollup.__table__
+    db.session.execute(table.delete().where(table.c.date == day))
+    result = db.session.execute(
+        insert(table).from_select([table.c[name] for name in _COLUMNS], _rollup_rows(day, True))
+    )
+    return result.rowcount
+
+
+def building_stats(day=None):
+    """
+    某天按楼栋的打卡统计（读汇总行），格式与 attendance_service.daily_breakdown(day, 'building') 相同
+    该天还没有汇总行时返回 None，由调用方改用 daily_breakdown
+    """
+    rows = _read_building_rows(day or date.today())
+    if not rows:
+        return None
+    return [{
+        'building_id': building_id or None,
+        'building': name,
+        'total': total,
+        'checked_in': checked_in,
+        'absent': total - checked_in,
+    } for building_id, name, total, checked_in in rows]
+
+
+def _read_building_rows(day):
+    return db.session.query(
+        AttendanceDailyRollup.building_id, Building.name,
+        AttendanceDailyRollup.total_students, AttendanceDailyRollup.checked_in
+    ).outerjoin(
+        Building, Building.id == AttendanceDailyRollup.building_id
+    ).filter(AttendanceDailyRollup.date == day).order_by(AttendanceDailyRollup.building_id).all()
+
+
+def trend(start, end, building_id=None):
+    """
+    start 到 end（含）每天的学生数和已打卡数，只读汇总行；没有汇总行的日期不出现在结果中，
+    当天例外：汇总行还没有建立时按原始打卡记录现算
+    """
+    query = db.session.query(
+        AttendanceDailyRollup.date,
+        func.sum(AttendanceDailyRollup.total_students),
+        func.sum(AttendanceDailyRollup.checked_in),
+        func.min(case((AttendanceDailyRollup.finalized == True, 1), else_=0))
+    ).filter(AttendanceDailyRollup.date.between(start, end))
+    if building_id is not None:
+        query = query.filter(AttendanceDailyRollup.building_id == building_id)
+    query = query.group_by(AttendanceDailyRollup.date).order_by(AttendanceDailyRollup.date)
+    days = [{
+        'date': day.isoformat(),
+        'total_students': total,
+        'checked_in': checked_in,
+        'not_checked': total - checked_in,
+        'finalized': bool(finalized),
+    } for day, total, checked_in, finalized in query]
+
+    today = date.today()
+    if start <= today <= end and not any(entry['date'] == today.isoformat() for entry in days):
+        groups = [group for group in daily_breakdown(today, 'building')
+                  if building_id is None or group['building_id'] == building_id]
+        total = sum(group['total'] for group in groups)
+        checked_in = sum(group['checked_in'] for group in groups)
+        days.append({
+            'date': today.isoformat(),
+            'total_students': total,
+            'checked_in': checked_in,
+            'not_checked': total - checked_in,
+            'finalized': False,
+        })
+    return days
+
+
+def unfinalized_days(until=None):
+    """从最早的打卡记录到 until（默认昨天）之间还没有结算的日期"""
+    until = until or date.today() - timedelta(days=1)
+    first = db.session.query(func.min(AttendanceRecord.date)).scalar()
+    if first is None or first > until:
+        return []
+    finalized = {day for day, in db.session.query(AttendanceDailyRollup.date).filter(
+        AttendanceDailyRollup.finalized == True,
+        AttendanceDailyRollup.date.between(first, until)
+    ).distinct()}
+    days = []
+    day = first
+    while day <= until:
+        if day not in finalized:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
@@ -0,0 +1,275 @@
+"""
+每日打卡
+
+晚间查寝时大量学生集中打卡。打卡用一条 upsert 语句完成：
+    INSERT INTO attendance_records (user_id, date, status, check_in_time) VALUES (...)
+    ON CONFLICT (user_id, date) DO UPDATE SET status = 'checked_in', check_in_time = ...
+    WHERE attendance_records.status != 'checked_in'
+不需要先查询当天记录，同一学生的并发打卡也不会触发 unique_user_date 唯一约束错误。
+影响行数为 1 表示本次是新打卡（新插入，或把未打卡记录改为已打卡），为 0 表示今天已经打过卡。
+
+SQLite 和 PostgreSQL 使用上面的语句，其他数据库退回先查询再写入。
+
+新打卡在同一事务内给 attendance_daily_rollups 中当天所在楼栋的汇总行加一（汇总行已建立时），
+汇总行的建立和结束后的重算见 services/attendance_rollup.py；
+同时把学生当月打卡位图中当天的位置 1，见 services/attendance_calendar.py。
+
+打卡统计和未打卡名单都是以学生用户为主表、经 Student.current_bed 关联楼栋/楼层/宿舍、
+外连接当天打卡记录的集合查询：统计由数据库分组计数，未打卡名单逐批流式读取，
+不再把全部学生加载到内存。已归档月份（见 services/attendance_archive.py）的打卡记录不在数据库中，
+改为外连接当月打卡位图中当天的位，统计结果相同。
+"""
+from collections import Counter
+from datetime import date, datetime
+
+from sqlalchemy import bindparam, case, func, update
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db, AttendanceRecord, AttendanceArchive, AttendanceDailyRollup, AttendanceMonthBitmap, UserRole
+from models.user import User, Student
+from models.dormitory import Building, Dormitory, Bed
+from services import attendance_calendar
+from utils.upsert import upsert_insert
+
+CHECKED_IN = 'checked_in'
+NOT_CHECKED = 'not_checked'
+
+
+def check_in(user_id, day=None, at=None):
+    """
+    为用户记录当天打卡，新打卡同时给当天的楼栋汇总行加一、设置当月打卡位图
+    返回 True 表示本次新打卡，False 表示已经打过卡；成功后仍需调用方提交事务
+    """
+    day = day or date.today()
+    at = at or datetime.utcnow()
+    session = db.session()
+    insert = upsert_insert(session)
+    if insert is None:
+        checked_in = _check_in_fallback(session, user_id, day, at)
+    else:
+        table = AttendanceRecord.__table__
+        stmt = insert(table).values(user_id=user_id, date=day, status=CHECKED_IN, check_in_time=at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.date],
+            set_={'status': CHECKED_IN, 'check_in_time': at},
+            where=table.c.status != CHECKED_IN
+        )
+        checked_in = session.execute(stmt).rowcount == 1
+    if checked_in:
+        _increment_rollup(session, user_id, day)
+        attendance_calendar.mark_days(session, [(user_id, day)])
+    return checked_in
+
+
+def check_in_many(rows):
+    """
+    批量打卡，rows 为 (用户ID, 日期, 打卡时间) 列表；一条 upsert 语句以 executemany 执行
+    已打过卡的记录保持不变，新打卡按楼栋累加到汇总行并设置打卡位图；成功后仍需调用方提交事务
+    """
+    if not rows:
+        return
+    # 同一用户同一天只保留第一条，一次写入的多行 VALUES 中不能有重复键（PostgreSQL）
+    pending = {}
+    for user_id, day, at in rows:
+        pending.setdefault((user_id, day), at)
+    # 排除已打过卡的，剩下的都是新打卡（写缓冲模式重放日志时会遇到）
+    for day in {day for _, day in pending}:
+        user_ids = [user_id for user_id, d in pending if d == day]
+        for start in range(0, len(user_ids), 500):
+            for user_id, in db.session.query(AttendanceRecord.user_id).filter(
+                AttendanceRecord.date == day,
+                AttendanceRecord.status == CHECKED_IN,
+                AttendanceRecord.user_id.in_(user_ids[start:start + 500])
+            ):
+                del pending[(user_id, day)]
+    if not pending:
+        return
+
+    session = db.session()
+    insert = upsert_insert(session)
+    if insert is None:
+        for (user_id, day), at in list(pending.items()):
+            if not _check_in_fallback(session, user_id, day, at):
+                del pending[(user_id, day)]
+    else:
+        table = AttendanceRecord.__table__
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.date],
+            set_={'status': stmt.excluded.status, 'check_in_time': stmt.excluded.check_in_time},
+            where=table.c.status != CHECKED_IN
+        )
+        session.execute(stmt, [
+            {'user_id': user_id, 'date': day, 'status': CHECKED_IN, 'check_in_time': at}
+            for (user_id, day), at in pending.items()
+        ])
+    _increment_rollups(session, pending)
+    attendance_calendar.mark_days(session, pending)
+
+
+def _rollup_building_of(user_id):
+    """用户在汇总表中所属的楼栋：未分配床位为 0，非学生用户为 -1（不计入汇总）"""
+    return db.session.query(
+        case((User.role == UserRole.STUDENT.value, func.coalesce(Dormitory.building_id, 0)), else_=-1)
+    ).select_from(User).outerjoin(
+        Student, Student.user_id == User.id
+    ).outerjoin(
+        Bed, Bed.id == Student.current_bed_id
+    ).outerjoin(
+        Dormitory, Dormitory.id == Bed.dorm_id
+    ).filter(User.id == user_id).scalar_subquery()
+
+
+def _increment_rollup(session, user_id, day):
+    """当天汇总行已建立时给学生所在楼栋的已打卡数加一（一条 UPDATE）"""
+    session.execute(
+        update(AttendanceDailyRollup).where(
+            AttendanceDailyRollup.date == day,
+            AttendanceDailyRollup.building_id == _rollup_building_of(user_id)
+        ).values(checked_in=AttendanceDailyRollup.checked_in + 1),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def _increment_rollups(session, checked_in):
+    """checked_in 为 {(用户ID, 日期): ...}，按日期和楼栋合并后累加"""
+    increments = Counter()
+    for day in {day for _, day in checked_in}:
+        user_ids = [user_id for user_id, d in checked_in if d == day]
+        for start in range(0, len(user_ids), 500):
+            building = func.coalesce(Dormitory.building_id, 0)
+            increments.update({(day, building_id): n for building_id, n in session.query(
+                building, func.count(User.id)
+            ).select_from(User).outerjoin(
+                Student, Student.user_id == User.id
+            ).outerjoin(
+                Bed, Bed.id == Student.current_bed_id
+            ).outerjoin(
+                Dormitory, Dormitory.id == Bed.dorm_id
+            ).filter(
+                User.role == UserRole.STUDENT.value,
+                User.id.in_(user_ids[start:start + 500])
+            ).group_by(building)})
+    if not increments:
+        return
+    table = AttendanceDailyRollup.__table__
+    session.execute(
+        table.update().where(
+            table.c.date == bindparam('b_day'),
+            table.c.building_id == bindparam('b_building')
+        ).values(checked_in=table.c.checked_in + bindparam('b_n')),
+        [{'b_day': day, 'b_building': building_id, 'b_n': n} for (day, building_id), n in increments.items()]
+    )
+
+
+def _check_in_fallback(session, user_id, day, at):
+    record = AttendanceRecord.query.filter_by(user_id=user_id, date=day).first()
+    if record is not None:
+        if record.status == CHECKED_IN:
+            return False
+        record.status = CHECKED_IN
+        record.check_in_time = at
+        return True
+    try:
+        with session.begin_nested():
+            session.add(AttendanceRecord(user_id=user_id, date=day, status=CHECKED_IN, check_in_time=at))
+    except IntegrityError:
+        # 并发打卡，另一请求已插入当天记录
+        return False
+    return True
+
+
+# 统计的分组层级 -> 分组列
+GROUP_LEVELS = {
+    'building': (Building.id, Building.name),
+    'floor': (Building.id, Building.name, Dormitory.floor),
+    'dorm': (Building.id, Building.name, Dormitory.floor, Dormitory.id, Dormitory.room_number),
+}
+_GROUP_KEYS = ('building_id', 'building', 'floor', 'dorm_id', 'room_number')
+
+
+def checked_in_users(day):
+    """
+    某天已打卡用户的子查询（列 user_id）
+    已归档的月份读当月打卡位图，其余读 attendance_records
+    """
+    key = attendance_calendar.month_key(day)
+    archived = key < attendance_calendar.month_key(date.today()) and db.session.query(
+        AttendanceArchive.id
+    ).filter(AttendanceArchive.month == key).first() is not None
+    if archived:
+        query = db.session.query(AttendanceMonthBitmap.user_id).filter(
+            AttendanceMonthBitmap.month == key,
+            AttendanceMonthBitmap.days.op('&')(1 << (day.day - 1)) != 0
+        )
+    else:
+        query = db.session.query(AttendanceRecord.user_id).filter(
+            AttendanceRecord.date == day,
+            AttendanceRecord.status == CHECKED_IN
+        )
+    return query.subquery('checked')
+
+
+def students_with_attendance(checked, *columns):
+    """学生用户 -> 床位/宿舍/楼栋 -> 已打卡用户（checked_in_users 的子查询）的外连接查询"""
+    return db.session.query(*columns).select_from(User).outerjoin(
+        Student, Student.user_id == User.id
+    ).outerjoin(
+        Bed, Bed.id == Student.current_bed_id
+    ).outerjoin(
+        Dormitory, Dormitory.id == Bed.dorm_id
+    ).outerjoin(
+        Building, Building.id == Dormitory.building_id
+    ).outerjoin(
+        checked, checked.c.user_id == User.id
+    ).filter(User.role == UserRole.STUDENT.value)
+
+
+def daily_summary(day=None):
+    """某天的学生总数、已打卡数、未打卡数（一条聚合查询）"""
+    day = day or date.today()
+    checked = checked_in_users(day)
+    total, checked_in = students_with_attendance(
+        checked, func.count(User.id), func.count(checked.c.user_id)
+    ).one()
+    return {'date': day.isoformat(), 'total_students': total, 'checked_in': checked_in,
+            'not_checked': total - checked_in}
+
+
+def daily_breakdown(day=None, level='building'):
+    """
+    按楼栋/楼层/宿舍分组的打卡统计（一条分组查询）
+    未分配床位的学生归入 building_id 为 None 的一组
+    """
+    day = day or date.today()
+    columns = GROUP_LEVELS[level]
+    checked = checked_in_users(day)
+    query = students_with_attendance(
+        checked, *columns, func.count(User.id), func.count(checked.c.user_id)
+    ).group_by(*columns).order_by(*columns)
+
+    groups = []
+    for *keys, total, checked_in in query:
+        group = dict(zip(_GROUP_KEYS, keys))
+        group.update(total=total, checked_in=checked_in, absent=total - checked_in)
+        groups.append(group)
+    return groups
+
+
+def iter_absentees(day=None, building_id=None, batch_size=1000):
+    """
+    逐条产出某天未打卡的学生，按楼栋、楼层、房间、床号排序
+    结果分批从数据库读取（yield_per），内存占用与学生总数无关
+    """
+    day = day or date.today()
+    checked = checked_in_users(day)
+    query = students_with_attendance(
+        checked, User.id, Student.student_id, Student.name, Student.phone,
+        Building.name, Dormitory.floor, Dormitory.room_number, Bed.bed_number
+    ).filter(checked.c.user_id.is_(None))
+    if building_id is not None:
+        query = query.filter(Building.id == building_id)
+    query = query.order_by(
+        Building.id, Dormitory.floor, Dormitory.room_number, Bed.bed_number, User.id
+    ).execution_options(yield_per=batch_size)
+    yield from query
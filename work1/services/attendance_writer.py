@@ -0,0 +1,302 @@
+"""
+打卡写缓冲（write-behind）模式
+
+查寝前几分钟内成千上万名学生同时打卡，逐请求提交时每次打卡都是一个独立的 SQLite 事务和一次 fsync。
+开启 ATTENDANCE_WRITE_BEHIND 后：
+- 打卡先追加写入本进程的打卡日志（<ATTENDANCE_LOG_DIR>/<pid>.log，每行 "用户ID 日期 打卡时间"），
+  写入后即返回打卡成功；
+- 后台线程每隔 ATTENDANCE_FLUSH_MS 毫秒或攒够 ATTENDANCE_FLUSH_ROWS 条，用一个事务批量 upsert 到 attendance_records；
+- 每次写回前把当前日志改名为分段（<pid>-<序号>.log）并另开新日志，分段中的打卡提交后才删除分段，
+  写回失败时分段保留到下次写回成功；写回期间的新打卡写入新日志，不受影响；
+- 进程启动时先重放已退出进程（以及本进程上次）留下的日志和分段，再开始接收打卡。
+- gunicorn --preload 时写回线程在主进程中启动，fork 出的 worker 按 pid 判断，首次使用时打开自己的日志并启动自己的写回线程。
+
+upsert 是幂等的，日志重放多次也不会产生重复记录。
+"今天是否已打卡"由内存中当天已打卡的用户集合判断，首次使用时从数据库加载；
+多进程部署时同一学生在两个进程各打一次卡，两次都会返回成功，数据库中仍只有一条记录。
+
+每次打卡默认在日志 fsync 之后才返回成功，返回成功后即使断电或系统崩溃也不会丢失
+（每次打卡一次 fsync，仍远少于逐请求提交时 SQLite 的 fsync 次数）。
+ATTENDANCE_LOG_FSYNC=0 时日志只写入操作系统缓存：进程崩溃不丢失，但断电或系统崩溃可能丢失最近几秒已返回成功的打卡。
+"""
+import atexit
+import glob
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime
+
+from models.database import db, AttendanceRecord
+from services import attendance_service
+from utils.process import pid_alive
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_line(line):
+    user_id, day, at = line.split()
+    return int(user_id), date.fromisoformat(day), datetime.fromisoformat(at)
+
+
+class AttendanceWriter:
+    """进程内的打卡日志和批量写回线程"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self._log_dir = None
+        self._log = None
+        self._log_path = None
+        self._seq = 0
+        self._segments = []       # 已改名、尚未写回成功的日志分段
+        self._fsync = True
+        self.flush_interval = 0.05
+        self.flush_size = 500
+        self._queue = []          # 待写回的 (用户ID, 日期, 打卡时间)
+        self._day = None
+        self._checked = {}        # _day 当天已打卡的用户ID -> 打卡时间
+        self._closing = False
+        self._fork_lock = threading.Lock()
+        self.stats = Counter()
+
+    @property
+    def enabled(self):
+        if self._thread is None:
+            return False
+        self._ensure_process()
+        return True
+
+    def init_app(self, app):
+        """ATTENDANCE_WRITE_BEHIND 开启时重放遗留日志并启动写回线程"""
+        if not app.config.get('ATTENDANCE_WRITE_BEHIND'):
+            return
+        self.start(app, app.config.get('ATTENDANCE_LOG_DIR', 'logs/attendance'),
+                   flush_interval=app.config.get('ATTENDANCE_FLUSH_MS', 50) / 1000,
+                   flush_size=app.config.get('ATTENDANCE_FLUSH_ROWS', 500),
+                   fsync=app.config.get('ATTENDANCE_LOG_FSYNC', True))
+
+    def start(self, app, log_dir, flush_interval=0.05, flush_size=500, fsync=True):
+        self.close()
+        os.makedirs(log_dir, exist_ok=True)
+        with self._lock:
+            self._app = app
+            self.flush_interval = flush_interval
+            self.flush_size = flush_size
+            self._fsync = fsync
+            self._queue = []
+            self._day = None
+            self._checked = {}
+            self._closing = False
+            self.stats = Counter()
+        self.replay(log_dir)
+        self._log_dir = log_dir
+        self._open()
+
+    def _open(self):
+        """打开本进程的日志并启动写回线程"""
+        self._pid = os.getpid()
+        self._seq = 0
+        self._segments = []
+        self._log_path = os.path.join(self._log_dir, f'{self._pid}.log')
+        self._log = open(self._log_path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+        self._thread.start()
+
+    def _forget_parent(self):
+        """fork 出的子进程丢弃从父进程继承的状态：线程和锁属于父进程，队列中的打卡在父进程的日志中，由父进程写回"""
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._fork_lock = threading.Lock()
+        self._thread = None
+        if self._log is not None:
+            self._log.close()
+        self._log = None
+        self._queue = []
+        self._day = None
+        self._checked = {}
+        self.stats = Counter()
+
+    def _ensure_process(self):
+        if self._pid == os.getpid():
+            return
+        with self._fork_lock:
+            if self._pid == os.getpid() or self._thread is None:
+                return
+            self._forget_parent()
+            self._open()
+
+    def replay(self, log_dir):
+        """把已退出进程和本进程上次遗留的日志写入数据库，返回重放的打卡数"""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(log_dir, '*.log'))):
+            # <pid>.log 或 <pid>-<序号>.log
+            pid = os.path.basename(path)[:-len('.log')].split('-')[0]
+            if pid.isdigit() and int(pid) != os.getpid() and pid_alive(int(pid)):
+                continue
+            # 先改名认领，避免多个 worker 同时重放同一份日志
+            claimed = f'{path}.replay-{os.getpid()}'
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            rows = []
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rows.append(_parse_line(line))
+                    except ValueError:
+                        # 崩溃时写了一半的行
+                        logger.warning('跳过无法解析的打卡日志行: %r', line)
+            if rows:
+                with self._app.app_context():
+                    try:
+                        self._write(rows)
+                    finally:
+                        db.session.remove()
+            os.remove(claimed)
+            replayed += len(rows)
+        if replayed:
+            logger.info('已重放 %d 条打卡日志', replayed)
+        self.stats['replayed'] += replayed
+        return replayed
+
+    def _load_day(self, day):
+        """切换到新的一天时从数据库加载当天已打卡的用户（需要在应用上下文中调用）"""
+        checked = dict(db.session.query(AttendanceRecord.user_id, AttendanceRecord.check_in_time).filter(
+            AttendanceRecord.date == day,
+            AttendanceRecord.status == attendance_service.CHECKED_IN
+        ))
+        with self._lock:
+            if self._day != day:
+                self._day = day
+                self._checked = checked
+
+    def check_in(self, user_id, day=None, at=None):
+        """打卡；写入日志后返回 True，当天已打过卡返回 False"""
+        self._ensure_process()
+        day = day or date.today()
+        at = at or datetime.utcnow()
+        if self._day != day:
+            self._load_day(day)
+        with self._lock:
+            if self._closing:
+                raise RuntimeError('打卡写回线程已停止')
+            if day == self._day:
+                if user_id in self._checked:
+                    return False
+                self._checked[user_id] = at
+            self._log.write(f'{user_id} {day.isoformat()} {at.isoformat()}\n')
+            self._log.flush()
+            if self._fsync:
+                os.fsync(self._log.fileno())
+            self._queue.append((user_id, day, at))
+            self.stats['checked_in'] += 1
+            if len(self._queue) >= self.flush_size:
+                self._wakeup.notify()
+        return True
+
+    def checked_in_at(self, user_id, day=None):
+        """当天的打卡时间（可能尚未写入数据库），未打卡或不是当天时返回 None"""
+        self._ensure_process()
+        day = day or date.today()
+        if day != self._day:
+            return None
+        return self._checked.get(user_id)
+
+    def flush(self):
+        """把排队的打卡写入数据库，返回写入条数"""
+        with self._flush_lock:
+            with self._lock:
+                queue, self._queue = self._queue, []
+                if queue and self._log is not None:
+                    self._rotate()
+                segments = list(self._segments)
+            if not queue:
+                return 0
+            with self._app.app_context():
+                try:
+                    self._write(queue)
+                except Exception:
+                    # 写回失败（例如数据库繁忙），放回队首等待下一轮；分段仍保留这些打卡
+                    with self._lock:
+                        self._queue[:0] = queue
+                    self.stats['errors'] += 1
+                    raise
+                finally:
+                    db.session.remove()
+            # 这些分段中的打卡都已提交
+            for path in segments:
+                os.remove(path)
+            with self._lock:
+                self._segments = self._segments[len(segments):]
+                self.stats['flushed'] += len(queue)
+                self.stats['commits'] += 1
+            return len(queue)
+
+    def _rotate(self):
+        """把当前日志改名为分段并另开新日志（持有 _lock 时调用）"""
+        self._log.close()
+        self._seq += 1
+        segment = os.path.join(self._log_dir, f'{self._pid}-{self._seq}.log')
+        os.replace(self._log_path, segment)
+        self._segments.append(segment)
+        self._log = open(self._log_path, 'a', encoding='utf-8')
+
+    def _write(self, rows):
+        attendance_service.check_in_many(rows)
+        db.session.commit()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if len(self._queue) < self.flush_size and not self._closing:
+                    self._wakeup.wait(self.flush_interval)
+                closing = self._closing
+                idle = not self._queue
+            if idle:
+                if closing:
+                    return
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('打卡批量写回失败')
+                if closing:
+                    # 停止时写回失败，保留日志等下次启动重放
+                    return
+                time.sleep(self.flush_interval)
+
+    def close(self):
+        """写回剩余打卡并停止后台线程"""
+        if self._pid is not None and self._pid != os.getpid():
+            # fork 出的子进程从未使用过写回，父进程的线程和日志与它无关
+            self._forget_parent()
+            return
+        with self._lock:
+            thread, self._closing = self._thread, True
+            self._wakeup.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+        if self._app is not None:
+            try:
+                self.flush()
+            except Exception:
+                # 保留日志，下次启动时重放
+                logger.exception('停止时写回打卡失败')
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+            if self._log_path and os.path.exists(self._log_path) and os.path.getsize(self._log_path) == 0:
+                os.remove(self._log_path)
+
+
+attendance_writer = AttendanceWriter()
+atexit.register(attendance_writer.close)
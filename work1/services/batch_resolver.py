@@ -0,0 +1,143 @@
+"""
+当前选宿批次解析
+
+首页、学生主页、选宿提交等处都要判断"现在开放的是哪个选宿批次"，原先每次请求各查一遍，
+而且忽略了批次的适用年级（grade）和适用专业（major_ids）。
+
+解析器一次加载全部未结束的有效批次，在内存中：
+- 按 (年级, 专业) 建立当前开放批次的查找表，为某个学生解析批次只需查 4 个键；
+- 预先算出下一个时间边界（某个批次开始，或当前开放批次结束），到达边界时才重新加载；
+- 批次经 ORM 新增/修改/删除并提交后立即重新加载；BATCH_CACHE_TTL（默认 300 秒）兜底其他进程的修改。
+
+批次 grade 为空表示不限年级，major_ids 为空表示不限专业；学生未填写年级或专业时不按该项筛选。
+返回的是与数据库会话无关的快照。
+"""
+import json
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.database import db
+from models.application import SelectionBatch
+
+DEFAULT_TTL = 300  # 秒
+
+ANY = None  # 查找表中"不限"的键
+
+_PENDING_KEY = 'batch_resolver_changes'
+
+logger = logging.getLogger(__name__)
+
+BatchSnapshot = namedtuple('BatchSnapshot', 'id name grade major_ids start_time end_time max_applications description')
+
+
+def parse_major_ids(value):
+    """major_ids 列（JSON 列表）转成专业ID集合；为空时返回 None（不限专业）"""
+    if not value:
+        return None
+    try:
+        major_ids = frozenset(int(major_id) for major_id in json.loads(value))
+    except (TypeError, ValueError):
+        logger.warning('选宿批次 major_ids 格式错误，按不限专业处理: %r', value)
+        return None
+    return major_ids or None
+
+
+def batch_snapshot(batch):
+    return BatchSnapshot(batch.id, batch.name, batch.grade, parse_major_ids(batch.major_ids),
+                         batch.start_time, batch.end_time, batch.max_applications, batch.description)
+
+
+class BatchResolver:
+    """当前开放的选宿批次，按年级和专业查找"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._engine = None
+            self._open = ()       # 当前开放的批次，按开始时间排序
+            self._lookup = {}     # (年级或 ANY, 专业或 ANY) -> 批次在 _open 中的序号
+            self._expires_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._engine = None
+
+    def _load(self, now):
+        batches = [batch_snapshot(batch) for batch in SelectionBatch.query.filter(
+            SelectionBatch.is_active == True,
+            SelectionBatch.end_time >= now
+        ).order_by(SelectionBatch.start_time, SelectionBatch.id)]
+
+        opened = tuple(batch for batch in batches if batch.start_time <= now)
+        lookup = {}
+        for rank, batch in enumerate(opened):
+            for major_id in batch.major_ids or (ANY,):
+                # 多个批次同时适用时取最早开始的
+                lookup.setdefault((batch.grade, major_id), rank)
+
+        # 下一个时间边界：未开始批次的 start_time、已开放批次的 end_time（当刻仍开放）
+        boundaries = [batch.start_time for batch in batches if batch.start_time > now]
+        boundaries.extend(batch.end_time + timedelta(microseconds=1) for batch in opened)
+        ttl = current_app.config.get('BATCH_CACHE_TTL', DEFAULT_TTL)
+        expires_at = min([now + timedelta(seconds=ttl), *boundaries])
+        return opened, lookup, expires_at
+
+    def _state(self, now):
+        engine = db.engine
+        with self._lock:
+            if self._engine is not engine or now >= self._expires_at:
+                self._open, self._lookup, self._expires_at = self._load(now)
+                self._engine = engine
+            return self._open, self._lookup
+
+    def current(self, now=None):
+        """任一当前开放的批次（最早开始的），没有时返回 None"""
+        opened, _ = self._state(now or datetime.utcnow())
+        return opened[0] if opened else None
+
+    def for_student(self, student, now=None):
+        """适用于该学生的当前开放批次，没有时返回 None"""
+        opened, lookup = self._state(now or datetime.utcnow())
+        if not opened:
+            return None
+        grades = (student.grade, ANY) if student.grade is not None else {batch.grade for batch in opened}
+        majors = (student.major_id, ANY) if student.major_id is not None else None
+        ranks = []
+        for grade in grades:
+            if majors is None:
+                ranks.extend(rank for (g, _), rank in lookup.items() if g == grade)
+            else:
+                ranks.extend(lookup[key] for key in ((grade, major) for major in majors) if key in lookup)
+        return opened[min(ranks)] if ranks else None
+
+
+batch_resolver = BatchResolver()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_batch_changes(session, flush_context):
+    if session.info.get(_PENDING_KEY):
+        return
+    session.info[_PENDING_KEY] = any(
+        isinstance(obj, SelectionBatch) for obj in (*session.new, *session.dirty, *session.deleted)
+    )
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_batch_changes(session):
+    if session.info.pop(_PENDING_KEY, False):
+        batch_resolver.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_batch_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,194 @@
+"""
+空闲床位内存索引
+
+按 (楼栋性别, 宿舍人数) 分桶保存所有空闲床位，自动分配宿舍时只需要在对应的桶里挑选，
+不必每次注册都把全校的 Bed 读进内存再逐个懒加载宿舍和楼栋。
+
+索引在第一次使用时用一条联表查询构建，之后通过 Session 事件在每次提交后增量更新；
+事务回滚时收集到的变更会被丢弃。楼栋或宿舍本身发生变化（例如修改楼栋性别）时整体重建。
+增量更新只覆盖本进程的提交，另设 BED_INDEX_TTL（默认 30 秒）兜底，到期后整体重建，
+覆盖其他 worker 或脚本释放、新增的床位。
+"""
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models.database import db, BedStatus
+from models.dormitory import Building, Dormitory, Bed
+
+# 打分需要的宿舍属性，避免为每个候选床位懒加载 Dormitory
+DormInfo = namedtuple('DormInfo', [
+    'id', 'building_id', 'gender', 'capacity', 'floor',
+    'has_ac', 'has_bathroom', 'has_balcony', 'has_water_heater'
+])
+
+_PENDING_KEY = 'bed_index_changes'
+_RELOAD = object()
+DEFAULT_TTL = 30  # 秒
+
+
+class BedIndex:
+    """空闲床位索引：(性别, 人数) -> {宿舍ID: {床位ID}}"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._engine = None
+        self._dorms = {}      # 宿舍ID -> DormInfo
+        self._bed_dorm = {}   # 床位ID -> 宿舍ID（全部床位）
+        self._free = {}       # (性别, 人数) -> {宿舍ID: set(床位ID)}
+        self._expires_at = 0.0
+
+    def reset(self):
+        """丢弃索引，下次使用时重新构建"""
+        with self._lock:
+            self._engine = None
+            self._expires_at = 0.0
+            self._dorms = {}
+            self._bed_dorm = {}
+            self._free = {}
+
+    def _ensure_loaded(self):
+        engine = db.engine
+        if self._engine is engine and time.monotonic() < self._expires_at:
+            return
+        with self._lock:
+            if self._engine is engine and time.monotonic() < self._expires_at:
+                return
+            rows = db.session.query(
+                Bed.id, Bed.status, Dormitory.id, Dormitory.building_id, Building.gender,
+                Dormitory.capacity, Dormitory.floor, Dormitory.has_ac, Dormitory.has_bathroom,
+                Dormitory.has_balcony, Dormitory.has_water_heater
+            ).join(Dormitory, Bed.dorm_id == Dormitory.id).join(
+                Building, Dormitory.building_id == Building.id
+            ).all()
+
+            dorms, bed_dorm, free = {}, {}, {}
+            for bed_id, status, *dorm_row in rows:
+                dorm = dorms.get(dorm_row[0])
+                if dorm is None:
+                    dorm = dorms[dorm_row[0]] = DormInfo(*dorm_row)
+                bed_dorm[bed_id] = dorm.id
+                if status == BedStatus.AVAILABLE.value:
+                    free.setdefault((dorm.gender, dorm.capacity), {}).setdefault(dorm.id, set()).add(bed_id)
+
+            self._dorms, self._bed_dorm, self._free = dorms, bed_dorm, free
+            self._engine = engine
+            self._expires_at = time.monotonic() + current_app.config.get('BED_INDEX_TTL', DEFAULT_TTL)
+
+    def load(self):
+        """预先构建索引，避免第一次查询时才加载"""
+        self._ensure_loaded()
+
+    def dorm(self, dorm_id):
+        """返回宿舍的 DormInfo"""
+        self._ensure_loaded()
+        return self._dorms.get(dorm_id)
+
+    def dorm_of(self, bed_id):
+        """返回床位所在的宿舍ID"""
+        self._ensure_loaded()
+        return self._bed_dorm.get(bed_id)
+
+    def free_beds(self, gender):
+        """返回该性别下的空闲床位快照：{人数: {宿舍ID: [床位ID, ...]}}"""
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                capacity: {dorm_id: sorted(beds) for dorm_id, beds in dorm_beds.items() if beds}
+                for (bucket_gender, capacity), dorm_beds in self._free.items()
+                if bucket_gender == gender and any(dorm_beds.values())
+            }
+
+    def is_free(self, bed_id):
+        """床位当前是否空闲（以已提交的数据为准）"""
+        self._ensure_loaded()
+        with self._lock:
+            dorm = self._dorms.get(self._bed_dorm.get(bed_id))
+            if dorm is None:
+                return False
+            return bed_id in self._free.get((dorm.gender, dorm.capacity), {}).get(dorm.id, ())
+
+    def discard(self, bed_id):
+        """把已经不可用的床位移出索引（例如被其他进程抢先占用）"""
+        with self._lock:
+            self._remove(bed_id)
+
+    def _remove(self, bed_id):
+        dorm = self._dorms.get(self._bed_dorm.get(bed_id))
+        if dorm is not None:
+            beds = self._free.get((dorm.gender, dorm.capacity), {}).get(dorm.id)
+            if beds is not None:
+                beds.discard(bed_id)
+
+    def apply(self, changes):
+        """应用已提交的床位变更：[(床位ID, 宿舍ID, 状态)]，宿舍ID为 None 表示已删除"""
+        if self._engine is None:
+            return
+        with self._lock:
+            for change in changes:
+                if change is _RELOAD:
+                    self.reset()
+                    return
+                bed_id, dorm_id, status = change
+                self._remove(bed_id)
+                if dorm_id is None:
+                    self._bed_dorm.pop(bed_id, None)
+                    continue
+                dorm = self._dorms.get(dorm_id)
+                if dorm is None:
+                    # 新建的宿舍，索引中没有它的属性，直接重建
+                    self.reset()
+                    return
+                self._bed_dorm[bed_id] = dorm_id
+                if (status or BedStatus.AVAILABLE.value) == BedStatus.AVAILABLE.value:
+                    self._free.setdefault((dorm.gender, dorm.capacity), {}).setdefault(dorm_id, set()).add(bed_id)
+
+
+bed_index = BedIndex()
+
+
+def track_bed_change(session, bed_id, dorm_id, status):
+    """记录不经过 ORM 的床位状态变更（例如条件 UPDATE），随事务提交写入索引"""
+    session.info.setdefault(_PENDING_KEY, []).append((bed_id, dorm_id, status))
+
+
+def _bed_changed(obj):
+    state = inspect(obj)
+    return state.attrs.status.history.has_changes() or state.attrs.dorm_id.history.has_changes()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_bed_changes(session, flush_context):
+    """在 flush 时记录床位变更，等事务提交后再写入索引"""
+    changes = session.info.setdefault(_PENDING_KEY, [])
+    for obj in session.new:
+        if isinstance(obj, Bed):
+            changes.append((obj.id, obj.dorm_id, obj.status))
+        elif isinstance(obj, (Dormitory, Building)):
+            changes.append(_RELOAD)
+    for obj in session.dirty:
+        if isinstance(obj, Bed) and _bed_changed(obj):
+            changes.append((obj.id, obj.dorm_id, obj.status))
+        elif isinstance(obj, (Dormitory, Building)) and session.is_modified(obj):
+            changes.append(_RELOAD)
+    for obj in session.deleted:
+        if isinstance(obj, Bed):
+            changes.append((obj.id, None, None))
+        elif isinstance(obj, (Dormitory, Building)):
+            changes.append(_RELOAD)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_bed_changes(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        bed_index.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_bed_changes(session):
+    session.info.pop(_PENDING_KEY, None)
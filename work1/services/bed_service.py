@@ -0,0 +1,123 @@
+"""
+床位状态流转
+
+所有床位状态变化都通过条件 UPDATE 完成：
+    UPDATE beds SET status = :目标状态 WHERE id = :床位ID AND status = :预期状态
+只有一条请求能把同一张床从预期状态改走，其余请求影响行数为 0，抛出 BedConflictError。
+不需要行锁或表锁，同一选宿批次内的并发请求也不会重复占用同一张床。
+
+条件 UPDATE 不经过 ORM 的 flush 事件，这里在同一事务内手动调整宿舍/楼栋计数，
+并登记空床索引和宿舍画像的变更，随事务提交生效、回滚丢弃。
+"""
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models.database import db, BedStatus
+from models.dormitory import Bed, apply_bed_counter_deltas
+from services.bed_index import bed_index, track_bed_change
+from services.dorm_profile import track_dorm_change
+from utils.metrics import metrics
+
+AVAILABLE = BedStatus.AVAILABLE.value
+RESERVED = BedStatus.RESERVED.value
+OCCUPIED = BedStatus.OCCUPIED.value
+MAINTENANCE = BedStatus.MAINTENANCE.value
+
+# 允许的状态流转：(原状态, 新状态)
+TRANSITIONS = {
+    (AVAILABLE, RESERVED),     # 选宿/换宿申请预留
+    (RESERVED, OCCUPIED),      # 申请审批通过
+    (RESERVED, AVAILABLE),     # 申请被拒绝，释放预留
+    (AVAILABLE, OCCUPIED),     # 自动分配、直接入住
+    (OCCUPIED, AVAILABLE),     # 退宿、换宿后释放原床位
+    (AVAILABLE, MAINTENANCE),  # 报修
+    (MAINTENANCE, AVAILABLE),  # 维修完成
+}
+
+
+class BedConflictError(Exception):
+    """床位已不处于预期状态（被其他请求抢先修改或不存在）"""
+
+    def __init__(self, bed_id, expected, target):
+        self.bed_id = bed_id
+        self.expected = expected
+        self.target = target
+        super().__init__(f'床位 {bed_id} 已不是 {expected} 状态，无法变更为 {target}')
+
+
+def transition(bed_id, expected, target):
+    """
+    把床位从 expected 状态原子地改为 target 状态
+    失败时抛出 BedConflictError，调用方决定回滚还是换一张床重试；成功后仍需调用方提交事务
+    """
+    if (expected, target) not in TRANSITIONS:
+        raise ValueError(f'不允许的床位状态变更：{expected} -> {target}')
+
+    session = db.session()
+    result = session.execute(
+        update(Bed).where(Bed.id == bed_id, Bed.status == expected).values(status=target),
+        execution_options={'synchronize_session': False}
+    )
+
+    bed = session.identity_map.get(session.identity_key(Bed, bed_id))
+    if result.rowcount != 1:
+        if bed is not None:
+            session.expire(bed, ['status'])
+        metrics.bed_conflicts.inc(target=target)
+        raise BedConflictError(bed_id, expected, target)
+
+    if bed is not None:
+        set_committed_value(bed, 'status', target)
+        dorm_id = bed.dorm_id
+    else:
+        dorm_id = bed_index.dorm_of(bed_id)
+        if dorm_id is None:
+            dorm_id = session.query(Bed.dorm_id).filter(Bed.id == bed_id).scalar()
+
+    apply_bed_counter_deltas(session, {dorm_id: {expected: -1, target: 1}})
+    track_bed_change(session, bed_id, dorm_id, target)
+    if OCCUPIED in (expected, target):
+        track_dorm_change(session, dorm_id)
+
+
+def reserve(bed_id):
+    """预留空床（选宿/换宿申请）"""
+    transition(bed_id, AVAILABLE, RESERVED)
+
+
+def occupy(bed_id, expected=RESERVED):
+    """入住：默认从预留状态转入，自动分配时从空闲状态转入"""
+    transition(bed_id, expected, OCCUPIED)
+
+
+def release(bed_id, expected=RESERVED):
+    """释放床位：默认释放预留，退宿/换宿时释放已入住的床位"""
+    transition(bed_id, expected, AVAILABLE)
+
+
+def release_if_reserved(bed_id):
+    """床位仍处于预留状态时释放，已被处理则忽略；返回是否释放"""
+    try:
+        release(bed_id)
+        return True
+    except BedConflictError:
+        return False
+
+
+def claim_in_dorm(dorm_id, target=RESERVED, candidates=5):
+    """在宿舍中抢占一张空床，返回床位ID；没有空床或全部被抢走时返回 None"""
+    bed_ids = [bed_id for bed_id, in db.session.query(Bed.id).filter(
+        Bed.dorm_id == dorm_id, Bed.status == AVAILABLE
+    ).order_by(Bed.id).limit(candidates)]
+    return claim_first(bed_ids, AVAILABLE, target)
+
+
+def claim_first(bed_ids, expected=AVAILABLE, target=RESERVED):
+    """依次尝试候选床位，返回第一张抢占成功的床位ID；全部失败返回 None"""
+    for bed_id in bed_ids:
+        try:
+            transition(bed_id, expected, target)
+            return bed_id
+        except BedConflictError:
+            continue
+    return None
@@ -0,0 +1,212 @@
+"""
+宿舍入住画像缓存
+
+为每间宿舍预先汇总已入住学生的专业人数、作息分布以及安静/整洁程度分布，
+自动分配宿舍时宿舍的专业分和生活习惯分可以在常数时间内算出，
+不再为每个已占用床位单独查询一次 Student。
+
+画像由一条分组查询整体构建；学生换床、修改生活习惯或床位状态变化后，
+只把受影响的宿舍标记为脏，下次读取时再用一条分组查询重建这些宿舍。
+"""
+import threading
+from collections import Counter
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from models.database import db, BedStatus
+from models.dormitory import Bed
+from models.user import Student
+from services.bed_index import bed_index
+
+# 影响宿舍画像的学生字段
+PROFILE_FIELDS = ('current_bed_id', 'major_id', 'sleep_time', 'wake_time', 'quietness', 'cleanliness')
+
+_PENDING_KEY = 'dorm_profile_changes'
+
+
+class DormProfile:
+    """一间宿舍已入住学生的汇总信息"""
+    __slots__ = ('count', 'majors', 'sleep', 'wake', 'quietness', 'cleanliness')
+
+    def __init__(self):
+        self.count = 0
+        self.majors = Counter()
+        self.sleep = Counter()
+        self.wake = Counter()
+        # 安静/整洁程度取值只有 1-5，按取值计数即可精确还原逐人打分的结果
+        self.quietness = Counter()
+        self.cleanliness = Counter()
+
+    def add(self, major_id, sleep_time, wake_time, quietness, cleanliness, n=1):
+        """加入 n 名具有相同属性的室友"""
+        self.count += n
+        self.majors[major_id] += n
+        self.sleep[sleep_time] += n
+        self.wake[wake_time] += n
+        if quietness:
+            self.quietness[quietness] += n
+        if cleanliness:
+            self.cleanliness[cleanliness] += n
+
+    def add_student(self, student):
+        self.add(student.major_id, student.sleep_time, student.wake_time,
+                 student.quietness, student.cleanliness)
+
+    def major_score(self, student):
+        """专业匹配分数 (30分)"""
+        if not student.major_id:
+            return 0
+        return min(self.majors[student.major_id] * 10, 30)  # 最多30分
+
+    def lifestyle_score(self, student):
+        """生活习惯匹配分数 (40分)"""
+        if not (student.sleep_time and student.wake_time):
+            return 0
+        # 作息时间匹配
+        score = self.sleep[student.sleep_time] * 10 + self.wake[student.wake_time] * 10
+        # 安静程度匹配
+        if student.quietness:
+            score += sum(n * max(0, 10 - abs(value - student.quietness) * 2)
+                         for value, n in self.quietness.items())
+        # 整洁程度匹配
+        if student.cleanliness:
+            score += sum(n * max(0, 10 - abs(value - student.cleanliness) * 2)
+                         for value, n in self.cleanliness.items())
+        return min(score, 40)  # 最多40分
+
+
+EMPTY_PROFILE = DormProfile()
+
+
+def load_profiles(dorm_ids=None):
+    """一条分组查询汇总入住学生；dorm_ids 为 None 时加载全部宿舍"""
+    query = db.session.query(
+        Bed.dorm_id, Student.major_id, Student.sleep_time, Student.wake_time,
+        Student.quietness, Student.cleanliness, func.count(Student.id)
+    ).join(Student, Student.current_bed_id == Bed.id).filter(
+        Bed.status == BedStatus.OCCUPIED.value
+    )
+    if dorm_ids is not None:
+        query = query.filter(Bed.dorm_id.in_(dorm_ids))
+    query = query.group_by(
+        Bed.dorm_id, Student.major_id, Student.sleep_time, Student.wake_time,
+        Student.quietness, Student.cleanliness
+    )
+
+    profiles = {}
+    for dorm_id, *attrs, n in query:
+        profile = profiles.get(dorm_id)
+        if profile is None:
+            profile = profiles[dorm_id] = DormProfile()
+        profile.add(*attrs, n=n)
+    return profiles
+
+
+class DormProfileCache:
+    """宿舍ID -> DormProfile，按需增量重建"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._engine = None
+        self._profiles = {}
+        self._dirty_dorms = set()
+        self._dirty_beds = set()
+
+    def reset(self):
+        with self._lock:
+            self._engine = None
+            self._profiles = {}
+            self._dirty_dorms = set()
+            self._dirty_beds = set()
+
+    def _refresh(self):
+        engine = db.engine
+        with self._lock:
+            if self._engine is not engine:
+                self._profiles = load_profiles()
+                self._dirty_dorms = set()
+                self._dirty_beds = set()
+                self._engine = engine
+                return
+            if self._dirty_beds:
+                for bed_id in self._dirty_beds:
+                    dorm_id = bed_index.dorm_of(bed_id)
+                    if dorm_id is None:
+                        # 床位不在索引中，无法定位宿舍，整体重建
+                        self._engine = None
+                        return self._refresh()
+                    self._dirty_dorms.add(dorm_id)
+                self._dirty_beds = set()
+            if self._dirty_dorms:
+                dirty = list(self._dirty_dorms)
+                fresh = load_profiles(dirty)
+                for dorm_id in dirty:
+                    self._profiles.pop(dorm_id, None)
+                self._profiles.update(fresh)
+                self._dirty_dorms = set()
+
+    def get(self, dorm_id):
+        """返回宿舍画像；没有入住学生时返回空画像"""
+        self._refresh()
+        return self._profiles.get(dorm_id, EMPTY_PROFILE)
+
+    def invalidate(self, dorm_ids=(), bed_ids=()):
+        with self._lock:
+            self._dirty_dorms.update(dorm_ids)
+            self._dirty_beds.update(bed_ids)
+
+
+dorm_profiles = DormProfileCache()
+
+
+def track_dorm_change(session, dorm_id):
+    """记录不经过 ORM 的入住变化，事务提交后使该宿舍画像失效"""
+    dorm_ids, _ = session.info.setdefault(_PENDING_KEY, (set(), set()))
+    dorm_ids.add(dorm_id)
+
+
+def _old_and_new(obj, key):
+    """字段的旧值（本次 flush 前）和当前值"""
+    history = inspect(obj).attrs[key].history
+    values = set(history.deleted)
+    values.add(getattr(obj, key))
+    values.discard(None)
+    return values
+
+
+def _changed(session, obj, keys):
+    if obj in session.new or obj in session.deleted:
+        return True
+    state = inspect(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+# 修改 current_bed_id 时加载旧值，保证能找到学生离开的那间宿舍
+@event.listens_for(Student.current_bed_id, 'set', active_history=True)
+def _track_old_bed(target, value, oldvalue, initiator):
+    pass
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_profile_changes(session, flush_context):
+    """记录受影响的宿舍/床位，提交后再使画像失效"""
+    dorm_ids, bed_ids = session.info.setdefault(_PENDING_KEY, (set(), set()))
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Bed) and _changed(session, obj, ('status', 'dorm_id')):
+            dorm_ids.update(_old_and_new(obj, 'dorm_id'))
+        elif isinstance(obj, Student) and _changed(session, obj, PROFILE_FIELDS):
+            # 新旧床位所在的宿舍都需要重建
+            bed_ids.update(_old_and_new(obj, 'current_bed_id'))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_profile_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        dorm_profiles.invalidate(*pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_profile_changes(session):
+    session.info.pop(_PENDING_KEY, None)
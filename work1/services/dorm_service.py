@@ -1,9 +1,11 @@
-from models.database import db, UserRole, BedStatus, ApplicationStatus
-from models.user import User, Student
-from models.dormitory import Dormitory, Bed
+from sqlalchemy import case, func
+from models.database import db, BedStatus, ApplicationStatus
+from models.user import Student
+from models.dormitory import Building, Dormitory, Bed
 from models.application import DormApplication
 from datetime import datetime
-from werkzeug.security import generate_password_hash
+from services import bed_service
+from services.bed_service import BedConflictError
 
 class DormService:#宿舍审批
     def get_dashboard_statistics(self):
@@ -22,6 +24,75 @@ class DormService:#宿舍审批
             'occupancy_rate': (occupied_beds / total_beds * 100) if total_beds > 0 else 0,
             'pending_applications': pending_applications
         }
+
+    def get_occupancy_statistics(self, breakdown=None):
+        """
+        入住率统计：一条分组查询按 (楼栋, 楼层, 人数) 汇总床位状态，再在内存中逐级合计
+        breakdown 为 'floor' 或 'capacity' 时，每栋楼附带对应的分项统计
+        """
+        def status_sum(status):
+            return func.sum(case((Bed.status == status.value, 1), else_=0))
+
+        rows = db.session.query(
+            Building.id, Building.name, Dormitory.floor, Dormitory.capacity,
+            func.count(func.distinct(Dormitory.id)),
+            status_sum(BedStatus.OCCUPIED), status_sum(BedStatus.RESERVED),
+            status_sum(BedStatus.AVAILABLE), status_sum(BedStatus.MAINTENANCE)
+        ).outerjoin(Dormitory, Dormitory.building_id == Building.id).outerjoin(
+            Bed, Bed.dorm_id == Dormitory.id
+        ).group_by(
+            Building.id, Building.name, Dormitory.floor, Dormitory.capacity
+        ).order_by(Building.id, Dormitory.floor, Dormitory.capacity).all()
+
+        stats = {}
+        for building_id, name, floor, capacity, dorm_count, *counts in rows:
+            building = stats.get(building_id)
+            if building is None:
+                building = stats[building_id] = self._occupancy_entry(building=name)
+                if breakdown == 'floor':
+                    building['floors'] = {}
+                elif breakdown == 'capacity':
+                    building['capacities'] = {}
+            if floor is None:
+                continue  # 没有宿舍的楼栋
+            # 总床位数沿用宿舍的额定人数
+            total = dorm_count * capacity
+            self._add_occupancy(building, total, counts)
+            if breakdown == 'floor':
+                group = building['floors'].setdefault(floor, self._occupancy_entry(floor=floor))
+                self._add_occupancy(group, total, counts)
+            elif breakdown == 'capacity':
+                group = building['capacities'].setdefault(capacity, self._occupancy_entry(capacity=capacity))
+                self._add_occupancy(group, total, counts)
+
+        result = []
+        for building in stats.values():
+            for key in ('floors', 'capacities'):
+                if key in building:
+                    building[key] = [self._finish_occupancy(group) for group in building[key].values()]
+            result.append(self._finish_occupancy(building))
+        return result
+
+    @staticmethod
+    def _occupancy_entry(**labels):
+        labels.update(total_beds=0, occupied_beds=0, reserved_beds=0,
+                      available_beds=0, maintenance_beds=0)
+        return labels
+
+    @staticmethod
+    def _add_occupancy(entry, total, counts):
+        occupied, reserved, available, maintenance = (n or 0 for n in counts)
+        entry['total_beds'] += total
+        entry['occupied_beds'] += occupied
+        entry['reserved_beds'] += reserved
+        entry['available_beds'] += available
+        entry['maintenance_beds'] += maintenance
+
+    @staticmethod
+    def _finish_occupancy(entry):
+        total = entry['total_beds']
+        entry['occupancy_rate'] = (entry['occupied_beds'] / total * 100) if total > 0 else 0
+        return entry
         
     def approve_application(self, application_id, admin_id):
         """审批通过宿舍申请"""
@@ -31,21 +102,29 @@ class DormService:#宿舍审批
             
         # 检查床位可用性
         if application.application_type == 'change':
-            target_dorm = Dormitory.query.get(application.target_dorm_id)
-            available_beds = [bed for bed in target_dorm.beds 
-                            if bed.status == BedStatus.AVAILABLE.value]
-            if not available_beds:
+            # 优先入住申请时预留的床位
+            new_bed_id = None
+            if application.bed_id:
+                new_bed_id = bed_service.claim_first(
+                    [application.bed_id], expected=BedStatus.RESERVED.value, target=BedStatus.OCCUPIED.value
+                )
+            if new_bed_id is None:
+                new_bed_id = bed_service.claim_in_dorm(application.target_dorm_id, target=BedStatus.OCCUPIED.value)
+            if new_bed_id is None:
+                db.session.rollback()
                 raise ValueError('目标宿舍暂无空床')
                 
             student = Student.query.get(application.student_id)
             # 释放原床位
-            if student.current_bed:
-                student.current_bed.status = BedStatus.AVAILABLE.value
+            if student.current_bed_id:
+                try:
+                    bed_service.release(student.current_bed_id, expected=BedStatus.OCCUPIED.value)
+                except BedConflictError:
+                    db.session.rollback()
+                    raise ValueError('原床位状态已变更，请刷新后重试')
                 
             # 分配新床位
-            new_bed = available_beds[0]
-            new_bed.status = BedStatus.OCCUPIED.value
-            student.current_bed_id = new_bed.id
+            student.current_bed_id = new_bed_id
             
         application.status = ApplicationStatus.APPROVED.value
         application.processed_at = datetime.now()
@@ -65,6 +144,9 @@ class DormService:#宿舍审批
             raise ValueError('该申请已被处理')
             
         application.status = ApplicationStatus.REJECTED.value
+        # 释放预留的床位
+        if application.bed_id:
+            bed_service.release_if_reserved(application.bed_id)
         application.processed_at = datetime.now()
         application.processed_by = admin_id
         
@@ -0,0 +1,98 @@
+"""
+首页数据缓存
+
+首页是访问量最大的页面，每次访问都要查询未过期公告和当前选宿批次。
+公告很少变化，缓存为与数据库会话无关的快照：
+- 公告经 ORM 新增/修改/删除并提交后，缓存立即失效；
+- 缓存在首页公告中最早的 expire_at 自动过期，保证公告过期的那一刻首页随之变化；
+- 另设 HOME_CACHE_TTL（默认 60 秒）兜底，覆盖其他进程的修改和绕过 ORM 的写入。
+当前选宿批次由 services/batch_resolver.py 解析，批次开始/结束时同样自动更新。
+
+稳定状态下首页不再访问数据库。
+"""
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.database import db
+from models.system import Announcement
+from services.batch_resolver import batch_resolver
+
+HOME_ANNOUNCEMENTS = 5
+DEFAULT_TTL = 60  # 秒
+
+_PENDING_KEY = 'home_cache_changes'
+
+AnnouncementSnapshot = namedtuple('AnnouncementSnapshot', 'id title content category priority created_at expire_at')
+
+
+def announcement_snapshot(announcement):
+    return AnnouncementSnapshot(announcement.id, announcement.title, announcement.content, announcement.category,
+                                announcement.priority, announcement.created_at, announcement.expire_at)
+
+
+class HomePageCache:
+    """首页公告的快照"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._engine = None
+            self._announcements = ()
+            self._expires_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._engine = None
+
+    def _load(self, now):
+        announcements = tuple(announcement_snapshot(a) for a in Announcement.query.filter(
+            Announcement.expire_at > now
+        ).order_by(Announcement.priority.desc(), Announcement.created_at.desc()).limit(HOME_ANNOUNCEMENTS))
+
+        # 首页公告中最早过期的那条过期后，后面的公告补上来
+        boundaries = [a.expire_at for a in announcements]
+        ttl = current_app.config.get('HOME_CACHE_TTL', DEFAULT_TTL)
+        expires_at = min([now + timedelta(seconds=ttl), *(b for b in boundaries if b > now)])
+        return announcements, expires_at
+
+    def get(self, now=None):
+        """返回 (公告快照列表, 当前批次快照或 None)"""
+        now = now or datetime.utcnow()
+        engine = db.engine
+        with self._lock:
+            if self._engine is not engine or now >= self._expires_at:
+                self._announcements, self._expires_at = self._load(now)
+                self._engine = engine
+            announcements = list(self._announcements)
+        return announcements, batch_resolver.current(now)
+
+
+home_cache = HomePageCache()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_home_changes(session, flush_context):
+    if session.info.get(_PENDING_KEY):
+        return
+    session.info[_PENDING_KEY] = any(
+        isinstance(obj, Announcement) for obj in (*session.new, *session.dirty, *session.deleted)
+    )
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_home_changes(session):
+    if session.info.pop(_PENDING_KEY, False):
+        home_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_home_changes(session):
+    session.info.pop(_PENDING_KEY, None)
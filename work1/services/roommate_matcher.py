@@ -0,0 +1,338 @@
+"""
+室友匹配向量化打分
+
+把所有候选室友（未分配床位、未加入团队）的作息和生活习惯按性别打包成 NumPy 数组，
+一次数组运算算出查询学生与全部候选人的匹配度，再用 argpartition 取前 N 名，
+避免在 Python 循环里逐个打分并对整个列表排序。
+
+每个学生的前 N 名结果会被缓存，之后直接返回。学生资料、床位或团队变化提交后只做增量维护：
+- 候选池中对应的那一行原地更新，不重新查询整张表；
+- 变化的学生本人以及把他列入前 N 名的学生，缓存失效；
+- 变化后的候选人与所有已缓存学生算一次分（匹配分是对称的），挤进前 N 名的直接插入缓存。
+候选池和缓存只在本进程内维护，另设 ROOMMATE_CACHE_TTL（默认 300 秒）兜底，
+到期后整体重新加载，覆盖其他进程的修改和绕过 ORM 的写入（例如批量导入）。
+"""
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models.database import db
+from models.user import Student
+
+# 缓存的匹配人数
+CACHE_SIZE = 10
+DEFAULT_TTL = 300  # 秒
+
+# 影响匹配分数的学生字段
+PROFILE_FIELDS = ('gender', 'sleep_time', 'wake_time', 'quietness', 'cleanliness')
+# 影响候选资格的字段
+ELIGIBILITY_FIELDS = ('current_bed_id', 'team_id')
+
+# 缓存门槛的哨兵值：未缓存的行任何分数都进不去，缓存不足 N 人的行任何分数都能进
+_NEVER = np.iinfo(np.int16).max
+_ALWAYS = -1
+
+_PENDING_KEY = 'roommate_matcher_changes'
+
+
+class _Pool:
+    """同一性别候选人的打包数组，支持原地更新和追加"""
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.rows = {}  # 学生ID -> 行号
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.sleep = np.zeros(capacity, dtype=np.int16)
+        self.wake = np.zeros(capacity, dtype=np.int16)
+        # 未填写记为 0，打分时与原逻辑一样跳过
+        self.quietness = np.zeros(capacity, dtype=np.int8)
+        self.cleanliness = np.zeros(capacity, dtype=np.int8)
+        self.active = np.zeros(capacity, dtype=bool)
+        # 该行学生已缓存的第 N 名（分数, 学生ID），用于判断新候选人能否挤进前 N 名
+        self.kth_score = np.full(capacity, _NEVER, dtype=np.int16)
+        self.kth_id = np.zeros(capacity, dtype=np.int64)
+
+    def _columns(self):
+        return ('ids', 'sleep', 'wake', 'quietness', 'cleanliness', 'active', 'kth_score', 'kth_id')
+
+    def _resize(self):
+        live = np.flatnonzero(self.active[:self.size])
+        old = {name: getattr(self, name)[live] for name in self._columns()}
+        # 空洞过多时原地压缩，否则扩容一倍
+        capacity = max(64, len(live) * 2)
+        self._allocate(capacity)
+        for name, values in old.items():
+            getattr(self, name)[:len(live)] = values
+        self.size = len(live)
+        self.rows = {int(sid): row for row, sid in enumerate(self.ids[:self.size])}
+
+    def put(self, student_id, sleep, wake, quietness, cleanliness):
+        row = self.rows.get(student_id)
+        if row is None:
+            if self.size == len(self.ids):
+                self._resize()
+            row = self.rows[student_id] = self.size
+            self.size += 1
+            self.kth_score[row] = _NEVER
+        self.ids[row] = student_id
+        self.sleep[row] = sleep
+        self.wake[row] = wake
+        self.quietness[row] = quietness or 0
+        self.cleanliness[row] = cleanliness or 0
+        self.active[row] = True
+        return row
+
+    def remove(self, student_id):
+        row = self.rows.pop(student_id, None)
+        if row is not None:
+            self.active[row] = False
+            self.ids[row] = -1
+            self.kth_score[row] = _NEVER
+
+    def scores(self, sleep, wake, quietness, cleanliness):
+        """与池中每一行的匹配分：作息时间 (30 + 30) + 安静程度 (20) + 整洁程度 (20)"""
+        n = self.size
+        return (
+            (self.sleep[:n] == sleep) * 30
+            + (self.wake[:n] == wake) * 30
+            + _habit_score(self.quietness[:n], quietness)
+            + _habit_score(self.cleanliness[:n], cleanliness)
+        ).astype(np.int16)
+
+
+def _habit_score(values, mine):
+    """安静/整洁程度匹配 (20分)：双方都填写时 max(0, 20 - 差值*5)"""
+    if not mine:
+        return 0
+    diff = np.abs(values.astype(np.int16) - mine)
+    return np.where(values > 0, np.maximum(0, 20 - diff * 5), 0)
+
+
+def _top(ids, scores, limit):
+    """前 limit 名：[(学生ID, 分数)]，同分按学生ID升序"""
+    if len(ids) > limit:
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        # argpartition 只保证前 limit 个的集合，边界上同分的候选人按ID补齐
+        threshold = scores[top].min()
+        top = np.concatenate([np.flatnonzero(scores > threshold), np.flatnonzero(scores == threshold)])
+        ids, scores = ids[top], scores[top]
+    order = np.lexsort((ids, -scores))[:limit]
+    return [(int(ids[i]), int(scores[i])) for i in order]
+
+
+class RoommateMatcher:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._engine = None
+        self._codes = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._engine = None
+            self._expires_at = 0.0
+            self._pools = {}       # 性别 -> _Pool
+            self._cache = {}       # 学生ID -> [(候选人ID, 分数)]
+            self._profiles = {}    # 已缓存学生 -> (性别, 作息编码, 起床编码, 安静, 整洁)
+            self._holders = {}     # 候选人ID -> {把他列入前 N 名的学生ID}
+            self._outside = {}     # 不在候选池中的已缓存学生 -> (第 N 名分数, 第 N 名ID)
+
+    def _code(self, value):
+        # 作息字符串编码为整数；None 也有自己的编码，保持 None == None 计为匹配
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._codes)
+        return code
+
+    def _profile(self, gender, sleep_time, wake_time, quietness, cleanliness):
+        return gender, self._code(sleep_time), self._code(wake_time), quietness or 0, cleanliness or 0
+
+    def _ensure_loaded(self):
+        engine = db.engine
+        if self._engine is engine and time.monotonic() < self._expires_at:
+            return
+        with self._lock:
+            if self._engine is engine and time.monotonic() < self._expires_at:
+                return
+            self.reset()
+            rows = db.session.query(
+                Student.id, Student.gender, Student.sleep_time, Student.wake_time,
+                Student.quietness, Student.cleanliness
+            ).filter(
+                Student.current_bed_id == None,  # 未分配宿舍
+                Student.team_id == None  # 未加入团队
+            ).order_by(Student.id).all()
+            for student_id, *attrs in rows:
+                gender, *codes = self._profile(*attrs)
+                self._pools.setdefault(gender, _Pool()).put(student_id, *codes)
+            self._engine = engine
+            self._expires_at = time.monotonic() + current_app.config.get('ROOMMATE_CACHE_TTL', DEFAULT_TTL)
+
+    def _compute(self, student_id, profile, limit):
+        gender, *codes = profile
+        pool = self._pools.get(gender)
+        if pool is None:
+            return []
+        mask = pool.active[:pool.size] & (pool.ids[:pool.size] != student_id)
+        return _top(pool.ids[:pool.size][mask], pool.scores(*codes)[mask], limit)
+
+    def top_matches(self, student, limit=CACHE_SIZE):
+        """匹配度最高的 limit 名候选人：[(学生ID, 分数)]，同分按学生ID升序"""
+        self._ensure_loaded()
+        with self._lock:
+            cached = self._cache.get(student.id)
+            if cached is not None and limit <= CACHE_SIZE:
+                return cached[:limit]
+            profile = self._profile(student.gender, student.sleep_time, student.wake_time,
+                                    student.quietness, student.cleanliness)
+            matches = self._compute(student.id, profile, max(limit, CACHE_SIZE))
+            self._store(student.id, profile, matches[:CACHE_SIZE])
+            return matches[:limit]
+
+    def _store(self, student_id, profile, matches):
+        self._cache[student_id] = matches
+        self._profiles[student_id] = profile
+        for candidate_id, _ in matches:
+            self._holders.setdefault(candidate_id, set()).add(student_id)
+        self._set_kth(student_id, matches)
+
+    def _set_kth(self, student_id, matches):
+        kth = matches[-1][::-1] if len(matches) >= CACHE_SIZE else (_ALWAYS, 0)
+        pool = self._pools.get(self._profiles[student_id][0])
+        row = pool.rows.get(student_id) if pool else None
+        if row is None:
+            self._outside[student_id] = kth
+        else:
+            self._outside.pop(student_id, None)
+            pool.kth_score[row], pool.kth_id[row] = kth
+
+    def _drop(self, student_id):
+        """丢弃学生的缓存结果，下次访问时重新计算"""
+        matches = self._cache.pop(student_id, None)
+        profile = self._profiles.pop(student_id, None)
+        if matches is None:
+            return
+        for candidate_id, _ in matches:
+            self._holders.get(candidate_id, set()).discard(student_id)
+        self._outside.pop(student_id, None)
+        pool = self._pools.get(profile[0])
+        row = pool.rows.get(student_id) if pool else None
+        if row is not None:
+            pool.kth_score[row] = _NEVER
+
+    def _offer(self, holder_id, candidate_id, score):
+        """把新的候选人插入已缓存的前 N 名"""
+        matches = self._cache[holder_id]
+        matches.append((candidate_id, score))
+        matches.sort(key=lambda m: (-m[1], m[0]))
+        self._holders.setdefault(candidate_id, set()).add(holder_id)
+        for dropped_id, _ in matches[CACHE_SIZE:]:
+            self._holders.get(dropped_id, set()).discard(holder_id)
+        del matches[CACHE_SIZE:]
+        self._set_kth(holder_id, matches)
+
+    def _remove_candidate(self, student_id):
+        for pool in self._pools.values():
+            if student_id in pool.rows:
+                pool.remove(student_id)
+        if student_id in self._cache:
+            # 本人的缓存仍然有效，门槛改由 _outside 记录
+            self._set_kth(student_id, self._cache[student_id])
+        # 把他列入前 N 名的学生少了一个候选人（或分数已变），需要重新计算
+        for holder_id in self._holders.pop(student_id, set()):
+            self._drop(holder_id)
+
+    def _add_candidate(self, student_id, profile):
+        gender, *codes = profile
+        pool = self._pools.setdefault(gender, _Pool())
+        row = pool.put(student_id, *codes)
+        if student_id in self._cache:
+            self._set_kth(student_id, self._cache[student_id])
+
+        # 匹配分是对称的：用新候选人的资料对全池打一次分，找出他能挤进前 N 名的已缓存学生
+        scores = pool.scores(*codes)
+        n = pool.size
+        hits = (scores > pool.kth_score[:n]) | ((scores == pool.kth_score[:n]) & (student_id < pool.kth_id[:n]))
+        hits &= pool.active[:n]
+        hits[row] = False
+        for hit in np.flatnonzero(hits):
+            self._offer(int(pool.ids[hit]), student_id, int(scores[hit]))
+
+        # 已不在候选池中的学生（例如已分配床位）也可能缓存了结果
+        for holder_id, (kth_score, kth_id) in list(self._outside.items()):
+            holder = self._profiles[holder_id]
+            if holder_id == student_id or holder[0] != gender:
+                continue
+            score = int(_scalar_score(holder[1:], codes))
+            if score > kth_score or (score == kth_score and student_id < kth_id):
+                self._offer(holder_id, student_id, score)
+
+    def apply(self, changes):
+        """应用已提交的学生变更：{学生ID: (资料元组或 None, 是否候选, 资料是否变化)}"""
+        if self._engine is None:
+            return
+        with self._lock:
+            for student_id, (attrs, eligible, profile_changed) in changes.items():
+                if attrs is None or profile_changed:
+                    self._drop(student_id)
+                self._remove_candidate(student_id)
+                if attrs is not None and eligible:
+                    self._add_candidate(student_id, self._profile(*attrs))
+
+
+def _scalar_score(mine, theirs):
+    sleep, wake, quietness, cleanliness = mine
+    other_sleep, other_wake, other_quietness, other_cleanliness = theirs
+    score = (sleep == other_sleep) * 30 + (wake == other_wake) * 30
+    if quietness and other_quietness:
+        score += max(0, 20 - abs(quietness - other_quietness) * 5)
+    if cleanliness and other_cleanliness:
+        score += max(0, 20 - abs(cleanliness - other_cleanliness) * 5)
+    return score
+
+
+roommate_matcher = RoommateMatcher()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_student_changes(session, flush_context):
+    changes = None
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, Student):
+            continue
+        state = inspect(obj)
+        if obj in session.deleted:
+            profile_changed = True
+        elif obj in session.new:
+            profile_changed = True
+        else:
+            profile_changed = any(state.attrs[key].history.has_changes() for key in PROFILE_FIELDS)
+            if not profile_changed and not any(
+                    state.attrs[key].history.has_changes() for key in ELIGIBILITY_FIELDS):
+                continue
+        if changes is None:
+            changes = session.info.setdefault(_PENDING_KEY, {})
+        attrs = None if obj in session.deleted else (
+            obj.gender, obj.sleep_time, obj.wake_time, obj.quietness, obj.cleanliness)
+        eligible = obj.current_bed_id is None and obj.team_id is None
+        previous = changes.get(obj.id)
+        changes[obj.id] = (attrs, eligible, profile_changed or bool(previous and previous[2]))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_student_changes(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        roommate_matcher.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_student_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,236 @@
+"""
+选宿高峰模式
+
+选宿批次开放的那一刻，大量学生同时提交 /dorm/<id>/select。高峰模式下选床请求不再逐个访问数据库：
+- 空床以 bed_index 为准，本批次内已被抢到的床位记在内存账本中，抢床只是一次加锁的集合操作；
+- 后台线程把排队的抢床结果成批写回：逐条条件 UPDATE 预留床位、插入 DormApplication，一批只提交一次；
+- 写回时床位已被其他进程占用（条件 UPDATE 影响 0 行），该条抢床记为失败，学生可通过状态接口查询；
+- 整批写回出错时回滚后逐条重试，仍然出错的那一条记为失败，不会拖住同批其他学生，也不会反复重试。
+
+账本只在单个进程内有效；多进程部署时写回的条件 UPDATE 仍保证同一张床不会被重复预留。
+账本同一时间只服务一个批次，其他同时开放的批次（例如不同年级）的学生走逐请求流程。
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from models.database import db, ApplicationStatus
+from models.application import DormApplication
+from services import bed_service
+from services.bed_index import bed_index
+from services.bed_service import BedConflictError
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 抢床状态
+PENDING = 'pending'        # 已抢到，等待写回
+SUBMITTED = 'submitted'    # 已写入数据库，等待审核
+FAILED = 'failed'          # 写回时床位已被占用，或写回出错
+
+
+class ClaimRejected(Exception):
+    """抢床失败，消息可直接展示给学生"""
+
+
+class SelectionLedger:
+    """一个选宿批次的内存抢床账本"""
+
+    def __init__(self, flush_interval=0.05, flush_size=500):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        self._app = None
+        self.batch_id = None
+        self._window = None
+        self._max_claims = 1
+        self._taken = set()       # 本批次内已被抢到的床位
+        self._claims = Counter()  # 学生ID -> 已提交的申请数
+        self._states = {}         # 学生ID -> (状态, 床位ID)
+        self._queue = []          # 待写回的 (学生ID, 床位ID, 抢床时间)
+        self._closing = False
+        self.stats = Counter()
+
+    def is_open(self, now=None):
+        window = self._window
+        if window is None or self._closing:
+            return False
+        now = now or datetime.utcnow()
+        return window[0] <= now <= window[1]
+
+    def open(self, app, batch):
+        """
+        为批次开启高峰模式，需要在应用上下文中调用
+        返回账本是否属于该批次：账本正被另一个仍在开放的批次使用时不切换，返回 False
+        """
+        with self._open_lock:
+            if self.batch_id == batch.id and not self._closing:
+                return True
+            if self.is_open():
+                return False
+            self.close()
+
+            # 已有待审核选宿申请的学生计入申请数
+            pending = DormApplication.query.with_entities(DormApplication.student_id).filter(
+                DormApplication.application_type == 'new',
+                DormApplication.status == ApplicationStatus.PENDING.value
+            ).all()
+            bed_index.load()
+
+            with self._lock:
+                self._reset()
+                self._app = app
+                self.batch_id = batch.id
+                self._window = (batch.start_time, batch.end_time)
+                self._max_claims = batch.max_applications or 1
+                self._claims.update(student_id for student_id, in pending)
+                self._thread = threading.Thread(target=self._run, name='selection-flusher', daemon=True)
+                self._thread.start()
+            return True
+
+    def claim(self, student_id, bed_id, dorm_id, gender):
+        """抢床；床位需属于 dorm_id 且宿舍楼性别与学生一致。成功后立即返回，申请由后台线程写入数据库"""
+        try:
+            self._claim(student_id, bed_id, dorm_id, gender)
+        except ClaimRejected:
+            metrics.selection_claims.inc(result='rejected')
+            raise
+        metrics.selection_claims.inc(result='claimed')
+
+    def _claim(self, student_id, bed_id, dorm_id, gender):
+        if not self.is_open():
+            raise ClaimRejected('当前不在选宿时间内')
+        if bed_index.dorm_of(bed_id) != dorm_id:
+            raise ClaimRejected('床位不属于该宿舍')
+        if bed_index.dorm(dorm_id).gender != gender:
+            raise ClaimRejected('该宿舍楼与您的性别不符')
+        if not bed_index.is_free(bed_id):
+            raise ClaimRejected('该床位已被占用')
+        with self._lock:
+            if not self.is_open():
+                raise ClaimRejected('当前不在选宿时间内')
+            if self._claims[student_id] >= self._max_claims:
+                raise ClaimRejected('您已提交选宿申请，请等待审核')
+            if bed_id in self._taken:
+                raise ClaimRejected('该床位已被占用')
+            self._taken.add(bed_id)
+            self._claims[student_id] += 1
+            self._states[student_id] = (PENDING, bed_id)
+            self._queue.append((student_id, bed_id, datetime.utcnow()))
+            self.stats['claimed'] += 1
+            if len(self._queue) >= self.flush_size:
+                self._wakeup.notify()
+
+    def status(self, student_id):
+        """返回 (状态, 床位ID)，没有抢床记录时返回 None"""
+        return self._states.get(student_id)
+
+    def flush(self):
+        """把排队的抢床结果写入数据库，返回写入成功的条数"""
+        with self._flush_lock:
+            with self._lock:
+                queue, self._queue = self._queue, []
+            if not queue:
+                return 0
+            with self._app.app_context():
+                try:
+                    try:
+                        submitted, failed = self._write(queue)
+                        errors = []
+                    except Exception:
+                        db.session.rollback()
+                        submitted, failed, errors = self._write_each(queue)
+                finally:
+                    db.session.remove()
+            with self._lock:
+                for student_id, bed_id, _ in submitted:
+                    self._states[student_id] = (SUBMITTED, bed_id)
+                for student_id, bed_id, _ in failed + errors:
+                    self._claims[student_id] -= 1
+                    self._states[student_id] = (FAILED, bed_id)
+                # 写回出错的床位没有被预留，其他学生还可以抢
+                self._taken.difference_update(bed_id for _, bed_id, _ in errors)
+                self.stats['submitted'] += len(submitted)
+                self.stats['conflicts'] += len(failed)
+                self.stats['errors'] += len(errors)
+                self.stats['commits'] += 1
+            metrics.selection_writebacks.inc(len(submitted), result='submitted')
+            metrics.selection_writebacks.inc(len(failed), result='conflict')
+            metrics.selection_writebacks.inc(len(errors), result='error')
+            return len(submitted)
+
+    def _write(self, queue):
+        submitted, failed = [], []
+        for claim in queue:
+            student_id, bed_id, _ = claim
+            try:
+                bed_service.reserve(bed_id)
+                submitted.append(claim)
+            except BedConflictError:
+                failed.append(claim)
+        db.session.add_all(DormApplication(
+            student_id=student_id,
+            bed_id=bed_id,
+            application_type='new',
+            status=ApplicationStatus.PENDING.value,
+            created_at=claimed_at
+        ) for student_id, bed_id, claimed_at in submitted)
+        db.session.commit()
+        return submitted, failed
+
+    def _write_each(self, queue):
+        """整批写回出错后逐条写回，返回 (成功, 冲突, 出错)"""
+        submitted, failed, errors = [], [], []
+        for claim in queue:
+            try:
+                ok, conflict = self._write([claim])
+            except Exception:
+                db.session.rollback()
+                logger.exception('抢床写回失败: 学生 %s 床位 %s', claim[0], claim[1])
+                errors.append(claim)
+                continue
+            submitted.extend(ok)
+            failed.extend(conflict)
+        return submitted, failed, errors
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # 攒够一个间隔或一批再写回，让更多抢床结果合并到同一次提交
+                if len(self._queue) < self.flush_size and not self._closing:
+                    self._wakeup.wait(self.flush_interval)
+                finished = self._closing or (self._window and datetime.utcnow() > self._window[1])
+                idle = not self._queue
+            if idle:
+                if finished:
+                    return
+                continue
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(self.flush_interval)
+
+    def close(self):
+        """结束高峰模式：写回剩余的抢床结果并停止后台线程"""
+        with self._lock:
+            thread, self._closing = self._thread, True
+            self._wakeup.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+        if self._app is not None:
+            self.flush()
+
+
+selection_ledger = SelectionLedger()
+atexit.register(selection_ledger.close)
@@ -0,0 +1,389 @@
+"""
+批量导入学生
+
+从 CSV（UTF-8，可带 BOM；Excel 中“另存为 CSV UTF-8”即可）流式读取学生，每 chunk_size 行为一批：
+- 校验：必填项、格式、文件内重复，以及与数据库中已有用户名/学号重复（每批各一条 IN 查询）；
+- 密码哈希：generate_password_hash 是 CPU 密集的，放到进程池中并行计算；
+- 写入：users 和 students 各一条批量 INSERT，每批提交一次；批量写入出错时整批回滚，
+  再逐行写入（每行一个 SAVEPOINT），只有真正出错的行记为错误并给出数据库的报错；
+- 全部导入后可选为新导入的学生整批分配宿舍（services/assign_service.batch_assign）。
+
+管理员网页上传时不在请求内导入：import_jobs 把文件保存到 STUDENT_IMPORT_JOB_DIR 后在后台线程中导入，
+请求立即返回任务ID，任务状态写入同目录的 <任务ID>.json，任何 worker 都能查询。
+网页上传的行数不超过 STUDENT_IMPORT_MAX_ROWS，进程池只开 STUDENT_IMPORT_JOB_WORKERS 个进程；
+更大的文件使用 scripts/import_students.py 在命令行导入。
+
+表头使用字段名（username、password、student_id ...）或对应的中文列名（用户名、密码、学号 ...），
+专业可填 major_id，或填专业代码 major_code。每个出错的行都会在结果中给出行号和原因。
+"""
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.security import generate_password_hash
+
+from models.database import db, UserRole
+from models.user import User, Student, Major
+from services.assign_service import batch_assign
+from services.roommate_matcher import roommate_matcher
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('username', 'password', 'student_id', 'name', 'id_card', 'gender')
+
+# 中文表头 -> 字段名
+HEADER_ALIASES = {
+    '用户名': 'username', '密码': 'password', '学号': 'student_id', '姓名': 'name',
+    '身份证号': 'id_card', '性别': 'gender', '电话': 'phone', '邮箱': 'email',
+    '专业ID': 'major_id', '专业代码': 'major_code', '年级': 'grade',
+    '作息': 'sleep_time', '起床': 'wake_time', '安静程度': 'quietness', '清洁程度': 'cleanliness',
+    '爱好': 'hobbies',
+}
+
+_ID_CARD = re.compile(r'^\d{17}[\dXx]$')
+_LENGTHS = {'username': 50, 'student_id': 10, 'name': 50, 'phone': 20, 'email': 100,
+            'sleep_time': 20, 'wake_time': 20}
+# 少于这么多行时直接在本进程计算哈希，启动进程池不划算
+_POOL_MIN_ROWS = 16
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+_JOB_KEEP_SECONDS = 7 * 24 * 3600  # 任务状态文件保留时间
+
+
+def _db_error(error):
+    """数据库驱动的报错（例如 UNIQUE constraint failed: users.username），不含 SQL 和参数"""
+    return str(getattr(error, 'orig', None) or error).splitlines()[0]
+
+
+def _normalize_header(name):
+    name = (name or '').strip()
+    return HEADER_ALIASES.get(name, name.lower())
+
+
+def _read_header(reader):
+    header = [_normalize_header(name) for name in next(reader, [])]
+    missing = [field for field in REQUIRED_FIELDS if field not in header]
+    if missing:
+        raise ValueError(f"表头缺少列: {', '.join(missing)}")
+    return header
+
+
+def count_rows(stream):
+    """校验表头并返回数据行数（不含空行）；表头缺少必填列时抛出 ValueError"""
+    reader = csv.reader(stream)
+    _read_header(reader)
+    return sum(1 for values in reader if any(value.strip() for value in values))
+
+
+def _validate(row, majors):
+    """返回 (学生字段, 错误信息)，两者有且只有一个为 None"""
+    values = {key: (value or '').strip() for key, value in row.items() if key}
+    missing = [field for field in REQUIRED_FIELDS if not values.get(field)]
+    if missing:
+        return None, f"缺少必填项: {', '.join(missing)}"
+    for field, limit in _LENGTHS.items():
+        if len(values.get(field, '')) > limit:
+            return None, f'{field} 超过 {limit} 个字符'
+    if values['gender'] not in ('男', '女'):
+        return None, '性别只能是 男 或 女'
+    if not _ID_CARD.match(values['id_card']):
+        return None, '身份证号格式不正确'
+
+    fields = {key: values[key] for key in REQUIRED_FIELDS}
+    for key in ('phone', 'email', 'sleep_time', 'wake_time', 'hobbies'):
+        fields[key] = values.get(key) or None
+    try:
+        fields['grade'] = int(values['grade']) if values.get('grade') else datetime.now().year
+        for key in ('quietness', 'cleanliness'):
+            fields[key] = int(values[key]) if values.get(key) else None
+            if fields[key] is not None and not 1 <= fields[key] <= 5:
+                return None, f'{key} 应为 1-5'
+        fields['major_id'] = int(values['major_id']) if values.get('major_id') else None
+    except ValueError:
+        return None, 'grade、quietness、cleanliness、major_id 应为整数'
+    if values.get('major_code'):
+        if values['major_code'] not in majors:
+            return None, f"专业代码 {values['major_code']} 不存在"
+        fields['major_id'] = majors[values['major_code']]
+    elif fields['major_id'] is not None and fields['major_id'] not in majors.values():
+        return None, f"专业ID {fields['major_id']} 不存在"
+    return fields, None
+
+
+class StudentImporter:
+    """一次导入：按批校验、并行哈希、批量写入，汇总每行错误和导入速度"""
+
+    def __init__(self, chunk_size=500, workers=None):
+        self.chunk_size = chunk_size
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self._pool = None
+        self._majors = {}
+        self._seen_usernames = set()
+        self._seen_student_ids = set()
+        self.imported_ids = []
+        self.errors = []          # [(行号, 原因)]，行号为文件中的行号（表头为第 1 行）
+        self.total = 0
+
+    def run(self, stream, assign=False, preferred_capacity=None):
+        """stream 为文本流；返回导入结果，格式见 result()"""
+        started = time.perf_counter()
+        self._majors = {code: major_id for major_id, code in db.session.query(Major.id, Major.code)}
+        reader = csv.reader(stream)
+        header = _read_header(reader)
+
+        try:
+            chunk = []
+            for values in reader:
+                line_no = reader.line_num
+                if not any(value.strip() for value in values):
+                    continue
+                self.total += 1
+                chunk.append((line_no, dict(zip(header, values))))
+                if len(chunk) >= self.chunk_size:
+                    self._import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self._import_chunk(chunk)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+        # 批量 INSERT 不经过 ORM 事件，室友候选池需要重建
+        if self.imported_ids:
+            roommate_matcher.reset()
+        imported_elapsed = time.perf_counter() - started
+
+        assigned = None
+        if assign and self.imported_ids:
+            students = []
+            for start in range(0, len(self.imported_ids), 500):
+                students.extend(Student.query.filter(Student.id.in_(self.imported_ids[start:start + 500])))
+            assigned = batch_assign(students, preferred_capacity=preferred_capacity)
+        return self.result(imported_elapsed, time.perf_counter() - started, assigned)
+
+    def result(self, import_elapsed, elapsed, assigned=None):
+        result = {
+            'total': self.total,
+            'imported': len(self.imported_ids),
+            'failed': len(self.errors),
+            'errors': [{'line': line_no, 'message': message} for line_no, message in sorted(self.errors)],
+            'elapsed': elapsed,
+            'rate': self.total / import_elapsed if import_elapsed > 0 else 0.0,
+        }
+        if assigned is not None:
+            result['assigned'] = assigned['assigned']
+            result['unassigned'] = len(assigned['unassigned'])
+        return result
+
+    def _import_chunk(self, chunk):
+        valid = []
+        for line_no, row in chunk:
+            fields, error = _validate(row, self._majors)
+            if error is None and fields['username'] in self._seen_usernames:
+                error = f"用户名 {fields['username']} 在文件中重复"
+            elif error is None and fields['student_id'] in self._seen_student_ids:
+                error = f"学号 {fields['student_id']} 在文件中重复"
+            if error is not None:
+                self.errors.append((line_no, error))
+                continue
+            self._seen_usernames.add(fields['username'])
+            self._seen_student_ids.add(fields['student_id'])
+            valid.append((line_no, fields))
+        if not valid:
+            return
+
+        existing_usernames = {name for name, in db.session.query(User.username).filter(
+            User.username.in_([fields['username'] for _, fields in valid]))}
+        existing_student_ids = {sid for sid, in db.session.query(Student.student_id).filter(
+            Student.student_id.in_([fields['student_id'] for _, fields in valid]))}
+        rows = []
+        for line_no, fields in valid:
+            if fields['username'] in existing_usernames:
+                self.errors.append((line_no, f"用户名 {fields['username']} 已存在"))
+            elif fields['student_id'] in existing_student_ids:
+                self.errors.append((line_no, f"学号 {fields['student_id']} 已被注册"))
+            else:
+                rows.append((line_no, fields))
+        if not rows:
+            return
+
+        hashes = self._hash([fields['password'] for _, fields in rows])
+        users, students = [], []
+        for (_, fields), password_hash in zip(rows, hashes):
+            users.append({'username': fields.pop('username'), 'password_hash': password_hash,
+                          'role': UserRole.STUDENT.value})
+            del fields['password']
+            students.append(fields)
+        try:
+            db.session.execute(insert(User), users)
+            user_ids = dict(db.session.query(User.username, User.id).filter(
+                User.username.in_([user['username'] for user in users])))
+            for user, student in zip(users, students):
+                student['user_id'] = user_ids[user['username']]
+            db.session.execute(insert(Student), students)
+            student_ids = [student_id for student_id, in db.session.query(Student.id).filter(
+                Student.user_id.in_(list(user_ids.values())))]
+            db.session.commit()
+        except SQLAlchemyError:
+            # 例如导入期间有人注册了同名用户：整批回滚后逐行写入，找出出错的行
+            db.session.rollback()
+            student_ids = self._insert_each([line_no for line_no, _ in rows], users, students)
+        self.imported_ids.extend(student_ids)
+
+    def _insert_each(self, line_nos, users, students):
+        """逐行写入，每行一个 SAVEPOINT，出错的行回滚并记录原因；返回写入的学生ID"""
+        written = []
+        for line_no, user, student in zip(line_nos, users, students):
+            try:
+                with db.session.begin_nested():
+                    user_id = db.session.execute(insert(User.__table__), user).inserted_primary_key[0]
+                    result = db.session.execute(insert(Student.__table__), dict(student, user_id=user_id))
+                written.append((line_no, result.inserted_primary_key[0]))
+            except SQLAlchemyError as e:
+                self.errors.append((line_no, f'写入失败: {_db_error(e)}'))
+        try:
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            self.errors.extend((line_no, f'写入失败: {_db_error(e)}') for line_no, _ in written)
+            return []
+        return [student_id for _, student_id in written]
+
+    def _hash(self, passwords):
+        if self.workers <= 1 or len(passwords) < _POOL_MIN_ROWS:
+            return [generate_password_hash(password) for password in passwords]
+        if self._pool is None:
+            # spawn 启动的子进程不继承 Web 进程的线程和数据库连接
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return list(self._pool.map(generate_password_hash, passwords,
+                                   chunksize=max(1, len(passwords) // (self.workers * 4))))
+
+
+def import_students(stream, chunk_size=500, workers=None, assign=False, preferred_capacity=None):
+    """
+    从 CSV 文本流导入学生
+    返回 {'total', 'imported', 'failed', 'errors', 'elapsed', 'rate'}，rate 为每秒处理的行数；
+    assign 为 True 时另有 'assigned'（分配到床位的人数）和 'unassigned'
+    """
+    return StudentImporter(chunk_size, workers).run(stream, assign, preferred_capacity)
+
+
+class ImportJobs:
+    """后台导入任务：上传的文件落盘后在后台线程中导入，状态写入 <STUDENT_IMPORT_JOB_DIR>/<任务ID>.json"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = {}
+
+    def job_dir(self):
+        # 相对路径按应用根目录解析，各 worker 读写同一个目录
+        return os.path.join(current_app.root_path,
+                            current_app.config.get('STUDENT_IMPORT_JOB_DIR', 'logs/import_jobs'))
+
+    def submit(self, upload, assign=False, preferred_capacity=None):
+        """
+        保存上传的文件（werkzeug FileStorage）并在后台导入，返回任务状态
+        文件不是 UTF-8、表头缺少列或行数超过 STUDENT_IMPORT_MAX_ROWS 时抛出 ValueError，不创建任务
+        """
+        directory = self.job_dir()
+        os.makedirs(directory, exist_ok=True)
+        self._prune(directory)
+        job_id = uuid.uuid4().hex
+        path = os.path.join(directory, f'{job_id}.csv')
+        upload.save(path)
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                rows = count_rows(f)
+            limit = current_app.config.get('STUDENT_IMPORT_MAX_ROWS', 20000)
+            if rows > limit:
+                raise ValueError(f'共 {rows} 行，网页上传最多 {limit} 行，请使用 scripts/import_students.py 导入')
+        except ValueError:  # 含 UnicodeDecodeError
+            os.remove(path)
+            raise
+
+        job = {'id': job_id, 'status': 'pending', 'total': rows, 'created_at': datetime.utcnow().isoformat()}
+        self._save(directory, job)
+        thread = threading.Thread(
+            target=self._run, name=f'student-import-{job_id[:8]}', daemon=True,
+            args=(current_app._get_current_object(), directory, job, assign, preferred_capacity)
+        )
+        with self._lock:
+            self._threads[job_id] = thread
+        thread.start()
+        return job
+
+    def status(self, job_id):
+        """任务状态：status 为 pending / running / done / failed，done 时 result 为导入结果；任务不存在时返回 None"""
+        if not _JOB_ID.match(job_id or ''):
+            return None
+        try:
+            with open(os.path.join(self.job_dir(), f'{job_id}.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def wait(self, job_id, timeout=None):
+        """等待本进程中的任务结束（测试和脚本使用）"""
+        with self._lock:
+            thread = self._threads.get(job_id)
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self, app, directory, job, assign, preferred_capacity):
+        path = os.path.join(directory, f"{job['id']}.csv")
+        with app.app_context():
+            job = dict(job, status='running', started_at=datetime.utcnow().isoformat())
+            self._save(directory, job)
+            try:
+                with open(path, encoding='utf-8-sig', newline='') as f:
+                    result = import_students(
+                        f,
+                        chunk_size=app.config.get('STUDENT_IMPORT_CHUNK_SIZE', 500),
+                        workers=app.config.get('STUDENT_IMPORT_JOB_WORKERS', 2),
+                        assign=assign,
+                        preferred_capacity=preferred_capacity
+                    )
+                # 错误行太多时只保留前 1000 条，failed 为总数
+                result['errors'] = result['errors'][:1000]
+                job.update(status='done', result=result)
+            except Exception as e:
+                logger.exception('学生导入任务 %s 失败', job['id'])
+                db.session.rollback()
+                job.update(status='failed', error=str(e))
+            finally:
+                job['finished_at'] = datetime.utcnow().isoformat()
+                self._save(directory, job)
+                os.remove(path)
+                with self._lock:
+                    self._threads.pop(job['id'], None)
+
+    def _save(self, directory, job):
+        path = os.path.join(directory, f"{job['id']}.json")
+        tmp = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _prune(self, directory):
+        cutoff = time.time() - _JOB_KEEP_SECONDS
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+import_jobs = ImportJobs()
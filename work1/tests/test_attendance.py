@@ -0,0 +1,229 @@
+import unittest
+from datetime import date, datetime, timedelta
+from app import create_app
+from models.database import db, UserRole, AttendanceRecord, AttendanceDailyRollup, AttendanceMonthBitmap
+from models.user import User, Student
+from models.dormitory import Building, Dormitory, Bed
+from services import attendance_calendar, attendance_rollup, attendance_service
+from utils.query_counter import count_queries
+
+
+class TestAttendanceCheckIn(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='student', password_hash='x', role=UserRole.STUDENT.value)
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+            self.engine = db.engine
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_check_in_route_is_idempotent(self):
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+            session['_fresh'] = True
+        first = self.client.post('/attendance/check_in')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.get_json()['success'])
+        second = self.client.post('/attendance/check_in')
+        self.assertEqual(second.status_code, 400)
+        self.assertFalse(second.get_json()['success'])
+        with self.app.app_context():
+            self.assertEqual(AttendanceRecord.query.filter_by(user_id=self.user_id).count(), 1)
+
+    def test_check_in_is_an_upsert_plus_rollup_and_bitmap(self):
+        today = date.today()
+        with self.app.app_context():
+            db.session.add(AttendanceRecord(user_id=self.user_id, date=today - timedelta(days=1),
+                                            status=attendance_service.NOT_CHECKED, check_in_time=None))
+            db.session.commit()
+
+            # 一条 upsert，加当天汇总行的 UPDATE 和当月位图的 upsert，不先查询打卡记录
+            with count_queries(self.engine) as counter:
+                self.assertTrue(attendance_service.check_in(self.user_id, today))
+            self.assertEqual(counter.count, 3, counter.statements)
+            self.assertTrue(counter.statements[0].startswith('INSERT INTO attendance_records'))
+            self.assertFalse(attendance_service.check_in(self.user_id, today))
+
+            # 未打卡记录改为已打卡也算新打卡
+            self.assertTrue(attendance_service.check_in(self.user_id, today - timedelta(days=1)))
+            db.session.commit()
+            statuses = {r.date: r.status for r in AttendanceRecord.query.filter_by(user_id=self.user_id)}
+            self.assertEqual(statuses, {today: 'checked_in', today - timedelta(days=1): 'checked_in'})
+
+
+    def test_calendar_streak_and_monthly_rates_from_bitmaps(self):
+        # 9月28日到10月3日连续打卡，中间9月30日缺卡
+        days = [date(2026, 9, 1), date(2026, 9, 28), date(2026, 9, 29),
+                date(2026, 10, 1), date(2026, 10, 2), date(2026, 10, 3)]
+        with self.app.app_context():
+            for day in days[:3]:
+                attendance_service.check_in(self.user_id, day)
+            attendance_service.check_in_many([(self.user_id, day, datetime(2026, 10, 3)) for day in days[3:]])
+            db.session.commit()
+            bitmaps = {b.month: b.days for b in AttendanceMonthBitmap.query.filter_by(user_id=self.user_id)}
+            self.assertEqual(bitmaps, {202609: 1 | 1 << 27 | 1 << 28, 202610: 0b111})
+
+            with count_queries(self.engine) as counter:
+                records, streak, months = attendance_calendar.get_calendar(
+                    self.user_id, date(2026, 9, 27), date(2026, 10, 4))
+            self.assertEqual(counter.count, 1)
+        self.assertEqual([d['date'] for d in records if d['status'] == 'checked_in'], days[1:])
+        # 10月4日还没打卡，从10月3日往前数，到9月30日中断
+        self.assertEqual(streak, 3)
+        self.assertEqual(months, [
+            {'month': '2026-09', 'checked_days': 2, 'days': 4, 'rate': 0.5},
+            {'month': '2026-10', 'checked_days': 3, 'days': 4, 'rate': 0.75},
+        ])
+
+        # 跨月连续
+        bitmaps = {202609: (1 << 30) - 1, 202610: 0b11}
+        self.assertEqual(attendance_calendar.streak(bitmaps, date(2026, 10, 2)), 32)
+        self.assertEqual(attendance_calendar.streak(bitmaps, date(2026, 9, 15)), 15)
+
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+            session['_fresh'] = True
+        data = self.client.get('/attendance/records?start=2026-09-28&end=2026-10-03').get_json()
+        self.assertEqual([d['status'] for d in data['records']],
+                         ['checked_in', 'checked_in', 'not_checked', 'checked_in', 'checked_in', 'checked_in'])
+        self.assertEqual(data['streak'], 3)
+        self.assertEqual(len(self.client.get('/attendance/records').get_json()['records']), 31)
+        self.assertEqual(self.client.get('/attendance/records?start=2020-01-01').status_code, 400)
+
+        # 连续打卡超过已加载的月份时继续往前读：2025年12月20日到2026年10月3日
+        with self.app.app_context():
+            full = [(self.user_id, date(2025, 12, 20) + timedelta(days=n))
+                    for n in range((date(2026, 9, 28) - date(2025, 12, 20)).days)]
+            attendance_calendar.mark_days(db.session, full + [(self.user_id, date(2026, 9, 30))])
+            db.session.commit()
+            _, long_streak, _ = attendance_calendar.get_calendar(self.user_id, date(2026, 10, 1), date(2026, 10, 4))
+        self.assertEqual(long_streak, (date(2026, 10, 3) - date(2025, 12, 20)).days + 1)
+
+
+class TestAttendanceStatistics(unittest.TestCase):
+    """两栋楼各两间宿舍、每间 2 名学生，另有 1 名未分配床位的学生；偶数号学生已打卡"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.today = date.today()
+        with self.app.app_context():
+            db.create_all()
+            admin = User(username='admin', password_hash='x', role=UserRole.ADMIN.value)
+            db.session.add(admin)
+            beds = []
+            for b in range(2):
+                building = Building(name=f'{b + 1}号楼', gender='男', total_floors=6)
+                db.session.add(building)
+                db.session.flush()
+                for floor in (1, 2):
+                    dorm = Dormitory(building_id=building.id, room_number=f'{floor}01', floor=floor, capacity=4)
+                    db.session.add(dorm)
+                    db.session.flush()
+                    for n in (1, 2):
+                        bed = Bed(dorm_id=dorm.id, bed_number=n, status='occupied')
+                        db.session.add(bed)
+                        beds.append(bed)
+            db.session.flush()
+            for i in range(9):
+                user = User(username=f's{i}', password_hash='x', role=UserRole.STUDENT.value)
+                db.session.add(user)
+                db.session.flush()
+                db.session.add(Student(user_id=user.id, student_id=f'S{i:03d}', name=f'学生{i}',
+                                       id_card='110101200001010001', gender='男',
+                                       current_bed_id=beds[i].id if i < 8 else None))
+                if i % 2 == 0:
+                    attendance_service.check_in(user.id, self.today)
+            db.session.commit()
+            self.admin_id = admin.id
+            self.engine = db.engine
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def login(self):
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.admin_id)
+            session['_fresh'] = True
+
+    def test_summary_and_breakdown_use_one_query_each(self):
+        with self.app.app_context():
+            with count_queries(self.engine) as counter:
+                summary = attendance_service.daily_summary(self.today)
+                floors = attendance_service.daily_breakdown(self.today, 'floor')
+            self.assertEqual(counter.count, 2)
+        self.assertEqual((summary['total_students'], summary['checked_in'], summary['not_checked']), (9, 5, 4))
+        self.assertEqual([(g['building'], g['floor'], g['total'], g['checked_in']) for g in floors], [
+            (None, None, 1, 1),
+            ('1号楼', 1, 2, 1), ('1号楼', 2, 2, 1),
+            ('2号楼', 1, 2, 1), ('2号楼', 2, 2, 1),
+        ])
+
+        self.login()
+        data = self.client.get(f'/attendance/statistics?date={self.today.isoformat()}&group_by=dorm').get_json()
+        self.assertEqual((data['total_students'], data['checked_in'], data['not_checked']), (9, 5, 4))
+        self.assertEqual(len(data['groups']), 5)
+        self.assertEqual(self.client.get('/attendance/statistics?group_by=bed').status_code, 400)
+
+    def test_absentee_list_is_streamed_as_csv(self):
+        self.login()
+        response = self.client.get('/attendance/absentees')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[0], '学号,姓名,电话,楼栋,楼层,房间,床号')
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['S001', 'S003', 'S005', 'S007'])
+        self.assertEqual(lines[1], 'S001,学生1,,1号楼,1,101,2')
+
+    def test_rollup_rows_track_check_ins_and_trend(self):
+        yesterday = self.today - timedelta(days=1)
+        with self.app.app_context():
+            users = {u.username: u.id for u in User.query}
+            for name in ('s0', 's1', 's3'):
+                attendance_service.check_in(users[name], yesterday)
+            db.session.commit()
+
+            # 汇总行还没有建立时查询不写数据库，由调用方现算
+            self.assertIsNone(attendance_rollup.building_stats(self.today))
+            self.assertEqual(attendance_rollup.trend(self.today, self.today)[0]['checked_in'], 5)
+            self.assertEqual(AttendanceDailyRollup.query.count(), 0)
+
+            # 定时任务（或应用启动时）建立汇总行，之后的新打卡直接累加
+            attendance_rollup.open_day(self.today)
+            db.session.commit()
+            buildings = attendance_rollup.building_stats(self.today)
+            self.assertEqual([(g['building'], g['total'], g['checked_in']) for g in buildings],
+                             [(None, 1, 1), ('1号楼', 4, 2), ('2号楼', 4, 2)])
+            attendance_service.check_in(users['s1'], self.today)
+            attendance_service.check_in_many([(users['s5'], self.today, datetime.utcnow()),
+                                              (users['s7'], self.today, datetime.utcnow()),
+                                              (users['s0'], self.today, datetime.utcnow())])  # s0 已打卡
+            db.session.commit()
+            live = attendance_rollup.building_stats(self.today)
+            self.assertEqual([g['checked_in'] for g in live], [1, 3, 4])
+            exact = attendance_service.daily_breakdown(self.today, 'building')
+            self.assertEqual([g['checked_in'] for g in live], [g['checked_in'] for g in exact])
+
+            self.assertEqual(attendance_rollup.unfinalized_days(), [yesterday])
+            attendance_rollup.finalize_day(yesterday)
+            db.session.commit()
+            self.assertEqual(attendance_rollup.unfinalized_days(), [])
+
+        self.login()
+        data = self.client.get(f'/attendance/trend?start={yesterday.isoformat()}').get_json()
+        self.assertEqual([(d['date'], d['checked_in'], d['finalized']) for d in data['days']], [
+            (yesterday.isoformat(), 3, True),
+            (self.today.isoformat(), 8, False),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
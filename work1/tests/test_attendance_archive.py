@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from app import create_app
+from models.database import db, UserRole, AttendanceRecord, AttendanceArchive, AttendanceDailyRollup
+from models.user import User, Student
+from models.dormitory import Building, Dormitory, Bed
+from services import attendance_archive, attendance_calendar, attendance_service
+
+
+class TestAttendanceArchive(unittest.TestCase):
+    """3 名学生（1 名未分配床位），8 个月前的一个月有打卡记录"""
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.app = create_app('testing')
+        self.app.config['ATTENDANCE_ARCHIVE_DIR'] = self.archive_dir
+        self.client = self.app.test_client()
+        self.month = attendance_archive._shift_months(attendance_calendar.month_key(date.today()), -8)
+        self.first, _ = attendance_archive._month_bounds(self.month)
+        with self.app.app_context():
+            db.create_all()
+            admin = User(username='admin', password_hash='x', role=UserRole.ADMIN.value)
+            building = Building(name='1号楼', gender='男', total_floors=6)
+            db.session.add_all([admin, building])
+            db.session.flush()
+            dorm = Dormitory(building_id=building.id, room_number='101', floor=1, capacity=4)
+            db.session.add(dorm)
+            db.session.flush()
+            self.user_ids = []
+            for i in range(3):
+                bed = Bed(dorm_id=dorm.id, bed_number=i + 1, status='occupied')
+                user = User(username=f's{i}', password_hash='x', role=UserRole.STUDENT.value)
+                db.session.add_all([bed, user])
+                db.session.flush()
+                db.session.add(Student(user_id=user.id, student_id=f'S{i:03d}', name=f'学生{i}',
+                                       id_card='110101200001010001', gender='男',
+                                       current_bed_id=bed.id if i < 2 else None))
+                self.user_ids.append(user.id)
+            for offset in range(5):
+                day = self.first + timedelta(days=offset)
+                for user_id in self.user_ids[:1 + offset % 3]:
+                    attendance_service.check_in(user_id, day, datetime.combine(day, datetime.min.time()))
+            db.session.add(AttendanceRecord(user_id=self.user_ids[2], date=self.first,
+                                            status=attendance_service.NOT_CHECKED, check_in_time=None))
+            attendance_service.check_in(self.user_ids[0])
+            db.session.commit()
+            self.admin_id = admin.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+        shutil.rmtree(self.archive_dir)
+
+    def snapshot(self):
+        day = self.first + timedelta(days=1)
+        return (
+            attendance_service.daily_summary(day),
+            attendance_service.daily_breakdown(day, 'dorm'),
+            [row[1] for row in attendance_service.iter_absentees(day)],
+            attendance_calendar.get_calendar(self.user_ids[1], self.first, self.first + timedelta(days=6)),
+            list(attendance_archive.iter_records(self.first, date.today())),
+        )
+
+    def test_archived_month_reads_the_same(self):
+        with self.app.app_context():
+            before = self.snapshot()
+            self.assertEqual(attendance_archive.archivable_months(), [self.month])
+            self.assertEqual(attendance_archive.archive_month(self.month), 10)
+            self.assertEqual(attendance_archive.archivable_months(), [])
+            self.assertTrue(os.path.exists(os.path.join(self.archive_dir, f'attendance-{self.month}.csv.gz')))
+            self.assertEqual(AttendanceRecord.query.filter(AttendanceRecord.date < date.today()).count(), 0)
+            self.assertEqual(AttendanceArchive.query.one().checked_in, 9)
+            # 只为有打卡记录的 5 天结算汇总行
+            self.assertEqual(
+                sorted(day for day, in db.session.query(AttendanceDailyRollup.date).distinct()),
+                [self.first + timedelta(days=offset) for offset in range(5)])
+            self.assertEqual(self.snapshot(), before)
+            self.assertEqual(before[0]['checked_in'], 2)
+
+            # 归档后补写的记录与归档文件合并，再次归档时并入
+            late = self.first + timedelta(days=3)
+            attendance_service.check_in(self.user_ids[2], late)
+            db.session.commit()
+            self.assertEqual(len(list(attendance_archive.iter_records(late, late))), 2)
+            self.assertEqual(attendance_service.daily_summary(late)['checked_in'], 2)
+            self.assertEqual(attendance_archive.archive_month(self.month), 11)
+
+            with self.assertRaises(ValueError):
+                attendance_archive.archive_month(attendance_calendar.month_key(date.today()))
+
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.admin_id)
+            session['_fresh'] = True
+        lines = self.client.get(
+            f'/attendance/export?start={self.first.isoformat()}&user_id={self.user_ids[2]}'
+        ).get_data(as_text=True).splitlines()
+        self.assertEqual([line.split(',')[:3] for line in lines[1:]], [
+            [str(self.user_ids[2]), self.first.isoformat(), 'not_checked'],
+            [str(self.user_ids[2]), (self.first + timedelta(days=2)).isoformat(), 'checked_in'],
+            [str(self.user_ids[2]), late.isoformat(), 'checked_in'],
+        ])
+
+        with self.app.app_context():
+            self.assertEqual(attendance_archive.restore_month(self.month), 11)
+            self.assertEqual(AttendanceArchive.query.count(), 0)
+            self.assertEqual(os.listdir(self.archive_dir), [])
+            self.assertEqual(self.snapshot()[:4], before[:4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime
+from flask import Flask
+from sqlalchemy import text
+from models.database import db, AttendanceRecord
+from models.user import User
+from models.dormitory import Bed  # noqa: F401  students 表引用的模型，create_all 需要
+from models.application import DormTeam  # noqa: F401
+from services.attendance_writer import AttendanceWriter
+
+
+class TestAttendanceWriter(unittest.TestCase):
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.log_dir = tempfile.mkdtemp()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.db_path
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        users = [User(username=f'u{i}', password_hash='x') for i in range(3)]
+        db.session.add_all(users)
+        db.session.commit()
+        self.user_ids = [user.id for user in users]
+        self.writer = AttendanceWriter()
+
+    def tearDown(self):
+        self.writer.close()
+        db.session.remove()
+        self.app_context.pop()
+        os.remove(self.db_path)
+        shutil.rmtree(self.log_dir)
+
+    def records(self):
+        db.session.expire_all()
+        return {r.user_id: r.status for r in AttendanceRecord.query.filter_by(date=date.today())}
+
+    def test_check_ins_are_logged_then_flushed(self):
+        self.writer.start(self.app, self.log_dir, flush_interval=60)
+        self.assertTrue(self.writer.check_in(self.user_ids[0]))
+        self.assertTrue(self.writer.check_in(self.user_ids[1]))
+        self.assertFalse(self.writer.check_in(self.user_ids[0]))
+        self.assertIsNotNone(self.writer.checked_in_at(self.user_ids[1]))
+
+        # 已确认的打卡先在日志中，尚未写入数据库
+        log_path = os.path.join(self.log_dir, f'{os.getpid()}.log')
+        with open(log_path, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual(self.records(), {})
+
+        self.assertEqual(self.writer.flush(), 2)
+        self.assertEqual(self.records(), {self.user_ids[0]: 'checked_in', self.user_ids[1]: 'checked_in'})
+        self.assertEqual(os.path.getsize(log_path), 0)
+        self.assertEqual(os.listdir(self.log_dir), [f'{os.getpid()}.log'])
+
+    def test_failed_flush_keeps_segment_until_committed(self):
+        self.writer.start(self.app, self.log_dir, flush_interval=60)
+        self.writer.check_in(self.user_ids[0])
+        db.session.execute(text('ALTER TABLE attendance_records RENAME TO attendance_records_off'))
+        db.session.commit()
+        with self.assertRaises(Exception):
+            self.writer.flush()
+        # 写回失败期间的新打卡写入新日志，失败的那一批留在分段中
+        self.writer.check_in(self.user_ids[1])
+        segment = os.path.join(self.log_dir, f'{os.getpid()}-1.log')
+        with open(segment, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+        db.session.execute(text('ALTER TABLE attendance_records_off RENAME TO attendance_records'))
+        db.session.commit()
+        self.assertEqual(self.writer.flush(), 2)
+        self.assertEqual(set(self.records()), set(self.user_ids[:2]))
+        self.assertEqual(os.listdir(self.log_dir), [f'{os.getpid()}.log'])
+
+    @unittest.skipUnless(hasattr(os, 'fork'), '需要 fork')
+    def test_forked_child_uses_its_own_log_and_thread(self):
+        self.writer.start(self.app, self.log_dir, flush_interval=60)
+        self.writer.check_in(self.user_ids[0])
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                db.engine.dispose(close=False)
+                ok = (self.writer.enabled and self.writer.check_in(self.user_ids[1])
+                      and os.path.exists(os.path.join(self.log_dir, f'{os.getpid()}.log')))
+                self.writer.close()
+                code = 0 if ok else 1
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        # 父进程的打卡仍在父进程的队列和日志中，子进程只写回了自己的
+        self.assertEqual(set(self.records()), {self.user_ids[1]})
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(set(self.records()), set(self.user_ids[:2]))
+
+    def test_start_replays_logs_of_exited_processes(self):
+        dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+        dead.wait()
+        now = datetime.utcnow()
+        with open(os.path.join(self.log_dir, f'{dead.pid}.log'), 'w', encoding='utf-8') as f:
+            f.write(f'{self.user_ids[2]} {date.today().isoformat()} {now.isoformat()}\n')
+            f.write(f'{self.user_ids[2]} {date.today().isoformat()} {now.isoformat()}\n')
+            f.write(f'{self.user_ids[1]} 2026-')  # 崩溃时写了一半的行
+
+        self.writer.start(self.app, self.log_dir)
+        self.assertEqual(self.writer.stats['replayed'], 2)
+        self.assertEqual(self.records(), {self.user_ids[2]: 'checked_in'})
+        self.assertFalse(self.writer.check_in(self.user_ids[2]))
+        self.assertEqual(os.listdir(self.log_dir), [f'{os.getpid()}.log'])
+
+
+if __name__ == '__main__':
+    unittest.main()
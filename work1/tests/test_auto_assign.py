@@ -0,0 +1,212 @@
+import unittest
+from unittest import mock
+from flask import Flask
+from sqlalchemy import update
+from models.database import db, BedStatus
+from models.user import User, Student
+from models.dormitory import Building, Dormitory, Bed
+from services.bed_index import bed_index
+from services.dorm_profile import dorm_profiles
+from start import auto_assign_dorm
+from services.assign_service import batch_assign
+
+
+class TestAutoAssign(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        bed_index.reset()
+        dorm_profiles.reset()
+
+        for gender in ['男', '女']:
+            building = Building(name=f'{gender}生楼', gender=gender, total_floors=6)
+            db.session.add(building)
+            db.session.flush()
+            for room, capacity in [('0301', 4), ('0302', 6)]:
+                dorm = Dormitory(building_id=building.id, room_number=room, floor=3, capacity=capacity)
+                db.session.add(dorm)
+                db.session.flush()
+                for number in range(1, capacity + 1):
+                    db.session.add(Bed(dorm_id=dorm.id, bed_number=number, status=BedStatus.AVAILABLE.value))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        bed_index.reset()
+        dorm_profiles.reset()
+
+    def _student(self, gender='男', **habits):
+        user = User(username=f'u{User.query.count()}', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        student = Student(user_id=user.id, student_id=f'S{user.id}', name='测试',
+                          id_card='110101200001010001', gender=gender, **habits)
+        db.session.add(student)
+        db.session.flush()
+        return student
+
+    def test_buckets_by_gender_and_capacity(self):
+        free = bed_index.free_beds('女')
+        self.assertEqual(sorted(free), [4, 6])
+        self.assertEqual(sum(len(beds) for beds in free[6].values()), 6)
+        for bed_ids in free[4].values():
+            for bed in Bed.query.filter(Bed.id.in_(bed_ids)):
+                self.assertEqual(bed.dorm.building.gender, '女')
+
+    def test_index_follows_commits_only(self):
+        bed = Bed.query.join(Dormitory).join(Building).filter(
+            Building.gender == '男', Dormitory.capacity == 4).first()
+
+        bed.status = BedStatus.OCCUPIED.value
+        db.session.flush()
+        db.session.rollback()
+        self.assertIn(bed.id, bed_index.free_beds('男')[4][bed.dorm_id])
+
+        bed.status = BedStatus.OCCUPIED.value
+        db.session.commit()
+        self.assertNotIn(bed.id, bed_index.free_beds('男')[4][bed.dorm_id])
+
+        bed.status = BedStatus.AVAILABLE.value
+        db.session.commit()
+        self.assertIn(bed.id, bed_index.free_beds('男')[4][bed.dorm_id])
+
+    def test_auto_assign_uses_preferred_bucket(self):
+        student = self._student('女')
+        bed = auto_assign_dorm(student, preferred_capacity=6)
+        self.assertEqual(bed.dorm.capacity, 6)
+        self.assertEqual(bed.dorm.building.gender, '女')
+
+    def test_auto_assign_skips_stale_beds(self):
+        student = self._student('男')
+        # 绕过 ORM 直接占满4人间，索引此时仍认为它们空闲
+        dorm = Dormitory.query.join(Building).filter(
+            Building.gender == '男', Dormitory.capacity == 4).first()
+        bed_index.free_beds('男')
+        Bed.query.filter_by(dorm_id=dorm.id).update({'status': BedStatus.OCCUPIED.value})
+        db.session.commit()
+
+        bed = auto_assign_dorm(student, preferred_capacity=4)
+        self.assertEqual(bed.dorm.capacity, 6)
+        self.assertNotIn(4, bed_index.free_beds('男'))
+
+    def test_index_reloads_beds_released_elsewhere(self):
+        bed = Bed.query.join(Dormitory).join(Building).filter(
+            Building.gender == '男', Dormitory.capacity == 4).first()
+        bed.status = BedStatus.OCCUPIED.value
+        db.session.commit()
+        self.assertNotIn(bed.id, bed_index.free_beds('男')[4][bed.dorm_id])
+
+        # 模拟其他 worker 或脚本释放床位：直接在连接上执行，不经过本进程的 Session
+        with db.engine.begin() as conn:
+            conn.execute(update(Bed.__table__).where(Bed.__table__.c.id == bed.id).values(
+                status=BedStatus.AVAILABLE.value))
+        self.assertNotIn(bed.id, bed_index.free_beds('男')[4][bed.dorm_id])
+
+        expired = bed_index._expires_at + 1
+        with mock.patch('services.bed_index.time.monotonic', return_value=expired):
+            self.assertIn(bed.id, bed_index.free_beds('男')[4][bed.dorm_id])
+
+    def _move_in(self, student, bed):
+        student.current_bed_id = bed.id
+        bed.status = BedStatus.OCCUPIED.value
+        db.session.commit()
+
+    def test_profile_scores_match_roommates(self):
+        dorm = Dormitory.query.join(Building).filter(Building.gender == '男', Dormitory.capacity == 6).first()
+        beds = sorted(dorm.beds, key=lambda b: b.bed_number)
+        habits = [
+            dict(major_id=1, sleep_time='早睡', wake_time='早起', quietness=5, cleanliness=4),
+            dict(major_id=1, sleep_time='晚睡', wake_time='早起', quietness=2, cleanliness=None),
+            dict(major_id=2, sleep_time='早睡', wake_time='晚起', quietness=None, cleanliness=1),
+        ]
+        for bed, habit in zip(beds, habits):
+            self._move_in(self._student('男', **habit), bed)
+
+        profile = dorm_profiles.get(dorm.id)
+        student = self._student('男', major_id=1, sleep_time='早睡', wake_time='早起', quietness=4, cleanliness=3)
+        self.assertEqual(profile.count, 3)
+        self.assertEqual(profile.major_score(student), 20)
+        # 逐人计算：10+10+8+8 / 0+10+6+0 / 10+0+0+6，合计68，封顶40
+        self.assertEqual(profile.lifestyle_score(student), 40)
+        student.quietness = None
+        student.cleanliness = None
+        self.assertEqual(profile.lifestyle_score(student), 40)
+        student.sleep_time = '正常'
+        self.assertEqual(profile.lifestyle_score(student), 20)
+
+    def test_profile_follows_moves(self):
+        dorms = Dormitory.query.join(Building).filter(Building.gender == '男').order_by(Dormitory.id).all()
+        student = self._student('男', major_id=3)
+        self._move_in(student, dorms[0].beds[0])
+        self.assertEqual(dorm_profiles.get(dorms[0].id).majors[3], 1)
+
+        # 换宿：旧宿舍和新宿舍的画像都要更新
+        dorms[0].beds[0].status = BedStatus.AVAILABLE.value
+        self._move_in(student, dorms[1].beds[0])
+        self.assertEqual(dorm_profiles.get(dorms[0].id).count, 0)
+        self.assertEqual(dorm_profiles.get(dorms[1].id).majors[3], 1)
+
+        student.major_id = 4
+        db.session.commit()
+        self.assertEqual(dorm_profiles.get(dorms[1].id).majors[4], 1)
+
+    def test_auto_assign_prefers_best_dorm(self):
+        building = Building.query.filter_by(gender='男').first()
+        low = Dormitory(building_id=building.id, room_number='0101', floor=1, capacity=4)
+        db.session.add(low)
+        db.session.flush()
+        for number in range(1, 5):
+            db.session.add(Bed(dorm_id=low.id, bed_number=number))
+        db.session.commit()
+
+        # 1楼宿舍住着同专业、同作息的同学，专业分和生活习惯分足以抵消楼层分
+        self._move_in(self._student('男', major_id=7, sleep_time='早睡', wake_time='早起'), low.beds[0])
+        student = self._student('男', major_id=7, sleep_time='早睡', wake_time='早起')
+        bed = auto_assign_dorm(student, preferred_capacity=4)
+        self.assertEqual(bed.dorm_id, low.id)
+        self.assertEqual(bed.status, BedStatus.AVAILABLE.value)
+
+    def test_batch_assign(self):
+        students = [self._student('男', major_id=1 + i % 2, sleep_time='早睡', wake_time='早起')
+                    for i in range(8)]
+        students.append(self._student('女', major_id=1))
+        db.session.commit()
+
+        result = batch_assign(students, preferred_capacity=4)
+        self.assertEqual(result['assigned'], 9)
+        self.assertEqual(result['unassigned'], [])
+
+        db.session.expire_all()
+        bed_ids = [s.current_bed_id for s in Student.query.all()]
+        self.assertEqual(len(set(bed_ids)), 9)
+        for student in Student.query.all():
+            self.assertEqual(student.current_bed.status, BedStatus.OCCUPIED.value)
+            self.assertEqual(student.current_bed.dorm.building.gender, student.gender)
+            self.assertNotIn(student.current_bed_id, bed_index.free_beds(student.gender).get(4, {}).get(
+                student.current_bed.dorm_id, []))
+        # 同专业的学生被分到同一间宿舍
+        for major_id in (1, 2):
+            dorms = {s.current_bed.dorm_id for s in Student.query.filter_by(gender='男', major_id=major_id)}
+            self.assertEqual(len(dorms), 1)
+        self.assertEqual(dorm_profiles.get(students[-1].current_bed.dorm_id).count, 1)
+        # 批量 UPDATE 同步了宿舍计数
+        for dorm in Dormitory.query:
+            self.assertEqual(dorm.occupied_count, len([b for b in dorm.beds if b.status == BedStatus.OCCUPIED.value]))
+            self.assertEqual(dorm.available_count, len(dorm.available_beds))
+
+    def test_batch_assign_reports_unassigned(self):
+        students = [self._student('女') for _ in range(12)]
+        db.session.commit()
+        result = batch_assign(students)
+        self.assertEqual(result['assigned'], 10)
+        self.assertEqual(len(result['unassigned']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
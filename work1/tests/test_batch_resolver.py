@@ -0,0 +1,67 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from app import create_app
+from models.database import db
+from models.user import Student
+from models.application import SelectionBatch
+from services.batch_resolver import batch_resolver
+from utils.query_counter import count_queries
+
+
+class TestBatchResolver(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.now = datetime.utcnow()
+        hour = timedelta(hours=1)
+        db.session.add_all([
+            SelectionBatch(name='大一计算机', grade=2026, major_ids=json.dumps([1, 2]),
+                           start_time=self.now - hour, end_time=self.now + hour),
+            SelectionBatch(name='大一全体', grade=2026,
+                           start_time=self.now - 2 * hour, end_time=self.now + 3 * hour),
+            SelectionBatch(name='大二换宿', grade=2025,
+                           start_time=self.now + 2 * hour, end_time=self.now + 4 * hour),
+            SelectionBatch(name='已停用', start_time=self.now - hour, end_time=self.now + hour, is_active=False),
+        ])
+        db.session.commit()
+        batch_resolver.reset()
+
+    def tearDown(self):
+        batch_resolver.reset()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def resolve(self, grade, major_id, offset=timedelta()):
+        batch = batch_resolver.for_student(Student(grade=grade, major_id=major_id), self.now + offset)
+        return batch and batch.name
+
+    def test_matches_grade_and_major(self):
+        self.assertEqual(self.resolve(2026, 3), '大一全体')
+        self.assertEqual(self.resolve(2026, 1), '大一全体')  # 两个批次都适用时取最早开始的
+        self.assertIsNone(self.resolve(2025, 1))
+        self.assertEqual(self.resolve(None, None), '大一全体')
+        self.assertEqual(batch_resolver.current(self.now).name, '大一全体')
+
+        # 时间边界之间不再查询数据库
+        with count_queries(db.engine) as counter:
+            self.resolve(2026, 3, timedelta(minutes=3))
+            self.resolve(2025, 1, timedelta(minutes=4))
+        self.assertEqual(counter.count, 0)
+
+    def test_refreshes_at_boundaries_and_on_edit(self):
+        self.assertEqual(self.resolve(2025, 1, timedelta(hours=2, minutes=1)), '大二换宿')
+        self.assertIsNone(self.resolve(2026, 1, timedelta(hours=3, minutes=1)))
+
+        batch = SelectionBatch.query.filter_by(name='大一全体').one()
+        batch.major_ids = json.dumps([5])
+        db.session.commit()
+        self.assertEqual(self.resolve(2026, 1), '大一计算机')
+        self.assertEqual(self.resolve(2026, 5), '大一全体')
+
+
+if __name__ == '__main__':
+    unittest.main()
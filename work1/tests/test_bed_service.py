@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+import unittest
+from flask import Flask
+from models.database import db, BedStatus
+from models.user import User, Student
+from models.application import DormTeam  # students.team_id 外键引用的表
+from models.dormitory import Building, Dormitory, Bed
+from services import bed_service
+from services.bed_service import BedConflictError
+from services.bed_index import bed_index
+from services.dorm_profile import dorm_profiles
+from services.assign_service import batch_assign
+
+
+class TestBedService(unittest.TestCase):
+    def setUp(self):
+        # 使用文件数据库，多个线程各自持有连接
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.db_path
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        bed_index.reset()
+        dorm_profiles.reset()
+
+        building = Building(name='男生楼', gender='男', total_floors=6)
+        db.session.add(building)
+        db.session.flush()
+        self.dorm = Dormitory(building_id=building.id, room_number='0301', floor=3, capacity=4)
+        db.session.add(self.dorm)
+        db.session.flush()
+        for number in range(1, 5):
+            db.session.add(Bed(dorm_id=self.dorm.id, bed_number=number, status=BedStatus.AVAILABLE.value))
+        db.session.commit()
+        self.bed_ids = [bed.id for bed in Bed.query.order_by(Bed.id)]
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        bed_index.reset()
+        dorm_profiles.reset()
+        os.remove(self.db_path)
+
+    def test_transition_is_compare_and_set(self):
+        bed_service.reserve(self.bed_ids[0])
+        db.session.commit()
+        with self.assertRaises(BedConflictError):
+            bed_service.reserve(self.bed_ids[0])
+        with self.assertRaises(ValueError):
+            bed_service.transition(self.bed_ids[1], BedStatus.OCCUPIED.value, BedStatus.RESERVED.value)
+
+        bed_service.occupy(self.bed_ids[0])
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Bed, self.bed_ids[0]).status, BedStatus.OCCUPIED.value)
+        dorm = db.session.get(Dormitory, self.dorm.id)
+        self.assertEqual((dorm.available_count, dorm.reserved_count, dorm.occupied_count), (3, 0, 1))
+        self.assertNotIn(self.bed_ids[0], bed_index.free_beds('男')[4][self.dorm.id])
+
+    def test_rollback_keeps_index_and_counters(self):
+        bed_index.free_beds('男')
+        bed_service.reserve(self.bed_ids[0])
+        db.session.rollback()
+        self.assertIn(self.bed_ids[0], bed_index.free_beds('男')[4][self.dorm.id])
+        self.assertEqual(db.session.get(Dormitory, self.dorm.id).available_count, 4)
+
+    def test_concurrent_reservations_never_double_book(self):
+        results = []
+
+        def worker():
+            with self.app.app_context():
+                try:
+                    bed_service.reserve(self.bed_ids[0])
+                    db.session.commit()
+                    results.append(True)
+                except BedConflictError:
+                    db.session.rollback()
+                    results.append(False)
+
+        threads = [threading.Thread(target=worker) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(db.session.get(Dormitory, self.dorm.id).reserved_count, 1)
+
+    def test_batch_assign_replans_after_lost_race(self):
+        students = []
+        for i in range(3):
+            user = User(username=f'u{i}', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            students.append(Student(user_id=user.id, student_id=f'S{i}', name='测试',
+                                    id_card='110101200001010001', gender='男'))
+        db.session.add_all(students)
+        db.session.commit()
+
+        # 索引仍认为第一张床空闲，但它已被其他进程直接占用
+        bed_index.free_beds('男')
+        Bed.query.filter_by(id=self.bed_ids[0]).update({'status': BedStatus.OCCUPIED.value})
+        db.session.commit()
+
+        result = batch_assign(students)
+        self.assertEqual(result['assigned'], 3)
+        self.assertNotIn(self.bed_ids[0], [s.current_bed_id for s in students])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from flask import Flask
+from models.database import db, BedStatus
+from models.dormitory import Building, Dormitory, Bed
+from services.dorm_service import DormService
+
+
+class BedFixture(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        statuses = [s.value for s in BedStatus]
+        for b in range(2):
+            building = Building(name=f'{b + 1}号楼', gender='男', total_floors=3)
+            db.session.add(building)
+            db.session.flush()
+            for floor in (1, 2):
+                for room, capacity in enumerate((4, 6, 6)):
+                    dorm = Dormitory(building_id=building.id, room_number=f'{floor}0{room}',
+                                     floor=floor, capacity=capacity)
+                    db.session.add(dorm)
+                    db.session.flush()
+                    for number in range(capacity):
+                        status = statuses[(b + floor + room + number) % len(statuses)]
+                        db.session.add(Bed(dorm_id=dorm.id, bed_number=number + 1, status=status))
+        db.session.add(Building(name='空楼', gender='女', total_floors=1))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+
+
+class TestOccupancyStatistics(BedFixture):
+    def _legacy(self, dorms):
+        """逐个宿舍、逐张床位统计"""
+        entry = {'total_beds': sum(d.capacity for d in dorms)}
+        for status in BedStatus:
+            entry[f'{status.value}_beds'] = sum(1 for d in dorms for bed in d.beds
+                                               if bed.status == status.value)
+        return entry
+
+    def _assert_matches(self, stats, dorms):
+        for key, value in self._legacy(dorms).items():
+            self.assertEqual(stats[key], value, key)
+
+    def test_matches_relationship_walk(self):
+        stats = DormService().get_occupancy_statistics('floor')
+        self.assertEqual([s['building'] for s in stats], ['1号楼', '2号楼', '空楼'])
+        for building, entry in zip(Building.query.order_by(Building.id), stats):
+            self._assert_matches(entry, building.dormitories)
+            for floor in entry['floors']:
+                self._assert_matches(floor, [d for d in building.dormitories if d.floor == floor['floor']])
+        self.assertEqual(stats[2]['total_beds'], 0)
+        self.assertEqual(stats[2]['floors'], [])
+
+    def test_capacity_breakdown(self):
+        stats = DormService().get_occupancy_statistics('capacity')
+        building = Building.query.order_by(Building.id).first()
+        self.assertEqual([c['capacity'] for c in stats[0]['capacities']], [4, 6])
+        for entry in stats[0]['capacities']:
+            self._assert_matches(entry, [d for d in building.dormitories if d.capacity == entry['capacity']])
+
+
+class TestBedCounters(BedFixture):
+    def _assert_counters(self):
+        db.session.expire_all()
+        for dorm in Dormitory.query:
+            for status in ('available', 'occupied', 'reserved'):
+                expected = sum(1 for bed in dorm.beds if bed.status == status)
+                self.assertEqual(getattr(dorm, f'{status}_count'), expected, (dorm.id, status))
+        for building in Building.query:
+            for status in ('available', 'occupied', 'reserved'):
+                expected = sum(getattr(d, f'{status}_count') for d in building.dormitories)
+                self.assertEqual(getattr(building, f'{status}_count'), expected, (building.id, status))
+
+    def test_counters_follow_transitions(self):
+        self._assert_counters()
+        beds = Bed.query.order_by(Bed.id).all()
+        beds[0].status = BedStatus.OCCUPIED.value
+        beds[1].status = BedStatus.RESERVED.value
+        beds[2].dorm_id = beds[-1].dorm_id
+        db.session.delete(beds[3])
+        db.session.commit()
+        self._assert_counters()
+
+    def test_rollback_discards_counter_changes(self):
+        dorm = Dormitory.query.first()
+        before = dorm.available_count
+        for bed in dorm.beds:
+            bed.status = BedStatus.AVAILABLE.value
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(db.session.get(Dormitory, dorm.id).available_count, before)
+
+    def test_has_free_beds_filter(self):
+        dorm = Dormitory.query.first()
+        for bed in dorm.beds:
+            bed.status = BedStatus.OCCUPIED.value
+        db.session.commit()
+        free = Dormitory.query.filter(Dormitory.available_count > 0).all()
+        self.assertNotIn(dorm, free)
+        self.assertEqual(set(free), {d for d in Dormitory.query if d.available_beds})
+
+
+if __name__ == '__main__':
+    unittest.main()
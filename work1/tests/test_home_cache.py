@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime, timedelta
+from app import create_app
+from models.database import db
+from models.system import Announcement
+from models.application import SelectionBatch
+from services.home_cache import home_cache
+from utils.query_counter import count_queries
+
+
+class TestHomePageCache(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.now = datetime.utcnow()
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Announcement(title='入住须知', content='请按时办理入住', priority=1,
+                                        expire_at=self.now + timedelta(days=7)))
+            db.session.add(SelectionBatch(name='第一批', start_time=self.now - timedelta(hours=1),
+                                          end_time=self.now + timedelta(hours=1)))
+            db.session.commit()
+            self.engine = db.engine
+        home_cache.reset()
+
+    def tearDown(self):
+        home_cache.reset()
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_steady_state_home_page_runs_no_queries(self):
+        self.assertIn('入住须知', self.client.get('/').get_data(as_text=True))
+        with count_queries(self.engine) as counter:
+            page = self.client.get('/').get_data(as_text=True)
+        self.assertEqual(counter.count, 0, counter.statements)
+        self.assertIn('第一批', page)
+
+        # 新公告提交后缓存立即失效
+        with self.app.app_context():
+            db.session.add(Announcement(title='停水通知', content='周六停水', priority=2,
+                                        expire_at=self.now + timedelta(days=1)))
+            db.session.commit()
+        self.assertIn('停水通知', self.client.get('/').get_data(as_text=True))
+
+    def test_cache_expires_at_time_boundaries(self):
+        with self.app.app_context():
+            db.session.add(Announcement(title='临时通知', content='即将过期', priority=5,
+                                        expire_at=self.now + timedelta(seconds=30)))
+            db.session.add(SelectionBatch(name='第二批', start_time=self.now + timedelta(hours=2),
+                                          end_time=self.now + timedelta(hours=3)))
+            db.session.commit()
+
+            announcements, batch = home_cache.get(self.now)
+            self.assertEqual([a.title for a in announcements], ['临时通知', '入住须知'])
+            self.assertEqual(batch.name, '第一批')
+
+            # 缓存有效期内返回快照，不再查询
+            with count_queries(self.engine) as counter:
+                home_cache.get(self.now + timedelta(seconds=20))
+            self.assertEqual(counter.count, 0)
+
+            announcements, _ = home_cache.get(self.now + timedelta(seconds=31))
+            self.assertEqual([a.title for a in announcements], ['入住须知'])
+            _, batch = home_cache.get(self.now + timedelta(hours=1, minutes=30))
+            self.assertIsNone(batch)
+            _, batch = home_cache.get(self.now + timedelta(hours=2, minutes=1))
+            self.assertEqual(batch.name, '第二批')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from datetime import datetime
+from flask import Flask
+from sqlalchemy import text
+from models.database import db, BedStatus, ApplicationStatus
+from models.user import User, Student
+from models.dormitory import Dormitory, Bed
+from models.application import DormApplication, DormTeam
+from models.system import DormReview, Announcement, Message
+
+
+class TestHotQueryIndexes(unittest.TestCase):
+    """高频查询的执行计划必须走索引，不能全表扫描"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _plan(self, query):
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        return [row[-1] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+
+    def assertUsesIndex(self, query, index):
+        plan = self._plan(query)
+        self.assertTrue(any(index in step for step in plan), plan)
+        for step in plan:
+            self.assertFalse(step.startswith('SCAN') and 'INDEX' not in step, plan)
+
+    def test_hot_queries_use_indexes(self):
+        now = datetime(2026, 1, 1)
+        cases = [
+            (Bed.query.filter_by(dorm_id=1).order_by(Bed.bed_number), 'ix_beds_dorm_id_status'),
+            (db.session.query(Bed.dorm_id).filter(Bed.status == BedStatus.AVAILABLE.value), 'ix_beds_status_dorm_id'),
+            (Student.query.filter_by(current_bed_id=1), 'ix_students_current_bed_id'),
+            (Student.query.filter(Student.gender == '男', Student.team_id == None, Student.current_bed_id == None),
+             'ix_students_gender_team_id'),
+            (DormApplication.query.filter_by(student_id=1, application_type='change',
+                                             status=ApplicationStatus.PENDING.value),
+             'ix_dorm_applications_student_type_status'),
+            (DormApplication.query.filter_by(status=ApplicationStatus.PENDING.value),
+             'ix_dorm_applications_status_created_at'),
+            (DormApplication.query.order_by(DormApplication.created_at.desc()).limit(10),
+             'ix_dorm_applications_created_at'),
+            (Message.query.filter_by(receiver_id=1, is_read=False), 'ix_messages_receiver_id_is_read'),
+            (Message.query.filter_by(sender_id=1), 'ix_messages_sender_id'),
+            (DormReview.query.filter_by(dorm_id=1), 'ix_dorm_reviews_dorm_id_student_id'),
+            (DormReview.query.filter_by(student_id=1), 'ix_dorm_reviews_student_id'),
+            (Announcement.query.filter(Announcement.expire_at > now), 'ix_announcements_expire_at'),
+        ]
+        for query, index in cases:
+            with self.subTest(index=index):
+                self.assertUsesIndex(query, index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from app import create_app
+from models.database import db, UserRole
+from models.user import User
+from models.dormitory import Building
+from utils.metrics import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['METRICS_TOKEN'] = 'secret'
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Building(name='1号楼', gender='男', total_floors=6,
+                                    available_count=3, occupied_count=1, reserved_count=0))
+            user = User(username='student', password_hash='x', role=UserRole.STUDENT.value)
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        metrics.reset()
+
+    def tearDown(self):
+        metrics._dir = None
+        metrics.reset()
+        with self.app.app_context():
+            db.drop_all()
+
+    def _scrape(self):
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True).splitlines()
+
+    def test_request_histogram_and_domain_counters(self):
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+            session['_fresh'] = True
+        self.assertEqual(self.client.post('/attendance/check_in').status_code, 200)
+        self.client.get('/api/dorms/available')
+
+        lines = self._scrape()
+        self.assertIn('dorm_checkins_total 1', lines)
+        self.assertIn('dorm_checkins_last_minute 1', lines)
+        self.assertIn('dorm_http_requests_total{blueprint="attendance",endpoint="attendance.check_in",status="200"} 1',
+                      lines)
+        self.assertIn('dorm_http_request_duration_seconds_bucket{blueprint="core",endpoint="api_available_dorms",'
+                      'le="+Inf"} 1', lines)
+        self.assertIn('dorm_beds{building="1号楼",status="occupied"} 1', lines)
+        self.assertIn('dorm_occupancy_ratio 0.25', lines)
+
+    def test_scrape_requires_token_or_admin(self):
+        self.app.config['METRICS_TOKEN'] = None
+        with self.app.app_context():
+            admin = User(username='admin', password_hash='x', role=UserRole.ADMIN.value)
+            db.session.add(admin)
+            db.session.commit()
+            admin_id = admin.id
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+            session['_fresh'] = True
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+        # 配置令牌后必须带令牌，管理员登录也不行
+        self.app.config['METRICS_TOKEN'] = 'secret'
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_multiprocess_files_are_aggregated(self):
+        directory = tempfile.mkdtemp()
+        metrics._dir = directory
+        # 已退出进程的计数保留，仪表不计入
+        dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+        dead.wait()
+        for pid in (os.getppid(), dead.pid):
+            with open(os.path.join(directory, f'{pid}.json'), 'w', encoding='utf-8') as f:
+                json.dump({'pid': pid, 'metrics': {
+                    'dorm_checkins_total': [[[], 2]],
+                    'dorm_db_pool_checked_out': [[[], 3]],
+                }}, f)
+        metrics.record_checkin()
+
+        lines = self._scrape()
+        self.assertIn('dorm_checkins_total 5', lines)
+        self.assertIn('dorm_db_pool_checked_out 3', lines)
+        self.assertTrue(os.path.exists(os.path.join(directory, f'{os.getpid()}.json')))
+
+
+if __name__ == '__main__':
+    unittest.main()
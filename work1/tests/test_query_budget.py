@@ -0,0 +1,120 @@
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from app import create_app
+from models.database import db, UserRole, BedStatus, ApplicationStatus
+from models.user import User, Student, Major
+from models.dormitory import Building, Dormitory, Bed
+from models.application import DormApplication
+from models.system import DormReview
+from utils.query_counter import count_queries
+
+
+class TestQueryBudget(unittest.TestCase):
+    """页面的 SQL 条数必须是常数，不能随宿舍、学生、申请的数量增长"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        # 每个请求使用自己的应用上下文（与线上一致），这里只在准备数据时进入
+        with self.app.app_context():
+            db.create_all()
+            self._seed()
+            self.engine = db.engine
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def _seed(self):
+        majors = [Major(name=f'专业{i}', code=f'M{i}') for i in range(3)]
+        db.session.add_all(majors)
+        self.admin = User(username='admin', password_hash='x', role=UserRole.ADMIN.value)
+        db.session.add(self.admin)
+        db.session.flush()
+
+        beds = []
+        for b in range(3):
+            building = Building(name=f'{b + 1}号楼', gender='男', total_floors=6)
+            db.session.add(building)
+            db.session.flush()
+            for r in range(6):
+                dorm = Dormitory(building_id=building.id, room_number=f'{r + 1:02d}', floor=r + 1, capacity=4)
+                db.session.add(dorm)
+                db.session.flush()
+                for n in range(1, 5):
+                    bed = Bed(dorm_id=dorm.id, bed_number=n, status=BedStatus.AVAILABLE.value)
+                    db.session.add(bed)
+                    beds.append(bed)
+        db.session.flush()
+
+        now = datetime.utcnow()
+        students = []
+        for i in range(40):
+            user = User(username=f'u{i}', password_hash='x', role=UserRole.STUDENT.value)
+            db.session.add(user)
+            db.session.flush()
+            student = Student(user_id=user.id, student_id=f'S{i:04d}', name=f'学生{i}',
+                              id_card='110101200001010001', gender='男', major_id=majors[i % 3].id)
+            if i % 2 == 0:
+                # 每间宿舍住 2 人、预留 2 张床，分散在多个楼栋
+                beds[i].status = BedStatus.OCCUPIED.value
+                student.current_bed_id = beds[i].id
+            db.session.add(student)
+            students.append(student)
+        db.session.flush()
+
+        self.dorm_id = beds[0].dorm_id
+        self.bed_id = beds[0].id
+        for i, student in enumerate(students[1::2]):
+            bed = beds[i * 2 + 1]
+            bed.status = BedStatus.RESERVED.value
+            db.session.add(DormApplication(student_id=student.id, bed_id=bed.id, application_type='new',
+                                           status=ApplicationStatus.PENDING.value,
+                                           created_at=now - timedelta(minutes=i)))
+            db.session.add(DormReview(dorm_id=self.dorm_id, student_id=student.id, rating=4, comment='好'))
+        db.session.add(DormApplication(student_id=students[0].id, bed_id=beds[60].id, application_type='change',
+                                       status=ApplicationStatus.PENDING.value))
+        db.session.commit()
+        self.admin_id = self.admin.id
+        self.student_user_id = students[0].user_id
+
+    def _login(self, user_id):
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+    @contextmanager
+    def assertMaxQueries(self, budget, label=''):
+        with count_queries(self.engine) as counter:
+            yield counter
+        self.assertLessEqual(counter.count, budget,
+                             f'{label} 执行了 {counter.count} 条 SQL（预算 {budget}）：\n' + '\n'.join(counter.statements))
+
+    def assertViewBudget(self, url, budget):
+        with self.assertMaxQueries(budget, url):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+    def test_public_views(self):
+        self.assertViewBudget('/dorms/browse', 3)
+        self.assertViewBudget('/dorm/browse', 3)
+        self.assertViewBudget(f'/dorm/{self.dorm_id}', 2)
+        self.assertViewBudget('/api/dorms/available', 1)
+        self.assertViewBudget(f'/api/bed/{self.bed_id}/status', 2)
+        self.assertEqual(self.client.get(f'/api/bed/{self.bed_id}/status').get_json()['occupant']['name'], '学生0')
+
+    def test_admin_views(self):
+        self._login(self.admin_id)
+        self.assertViewBudget('/admin/dashboard', 8)
+        self.assertViewBudget('/admin/students', 4)
+        self.assertViewBudget('/admin/students?page=2', 4)
+
+    def test_student_views(self):
+        self._login(self.student_user_id)
+        self.assertViewBudget('/student/dashboard', 6)
+        self.assertViewBudget('/dorm/change', 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import random
+import unittest
+from flask import Flask
+from models.database import db
+from models.user import User, Student
+from models.dormitory import Bed  # students 表外键引用的表
+from models.application import DormTeam
+from services.roommate_matcher import roommate_matcher
+
+
+def legacy_score(s, student):
+    """原 /roommate/match 中的逐人打分逻辑"""
+    score = 0
+    if s.sleep_time == student.sleep_time:
+        score += 30
+    if s.wake_time == student.wake_time:
+        score += 30
+    if s.quietness and student.quietness:
+        score += max(0, 20 - abs(s.quietness - student.quietness) * 5)
+    if s.cleanliness and student.cleanliness:
+        score += max(0, 20 - abs(s.cleanliness - student.cleanliness) * 5)
+    return score
+
+
+class TestRoommateMatcher(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        roommate_matcher.reset()
+
+        rng = random.Random(42)
+        for i in range(300):
+            user = User(username=f'u{i}', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Student(
+                user_id=user.id, student_id=f'S{i}', name=f'学生{i}', id_card='110101200001010001',
+                gender=rng.choice(['男', '女']),
+                sleep_time=rng.choice(['早睡', '正常', '晚睡', None]),
+                wake_time=rng.choice(['早起', '正常', '晚起', None]),
+                quietness=rng.choice([1, 2, 3, 4, 5, None]),
+                cleanliness=rng.choice([1, 2, 3, 4, 5, None]),
+                team_id=1 if i % 10 == 0 else None,
+                current_bed_id=i if i % 7 == 0 else None,
+            ))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        roommate_matcher.reset()
+
+    def _legacy_top(self, student):
+        candidates = Student.query.filter(
+            Student.id != student.id,
+            Student.gender == student.gender,
+            Student.current_bed_id == None,
+            Student.team_id == None
+        ).order_by(Student.id).all()
+        matches = [(s.id, legacy_score(s, student)) for s in candidates]
+        matches.sort(key=lambda x: x[1], reverse=True)
+        return matches[:10]
+
+    def test_matches_legacy_ranking(self):
+        for student in Student.query.order_by(Student.id).limit(40):
+            self.assertEqual(roommate_matcher.top_matches(student), self._legacy_top(student))
+
+    def test_pool_refreshes_after_commit(self):
+        student = Student.query.filter_by(team_id=None, current_bed_id=None).first()
+        top_id = roommate_matcher.top_matches(student)[0][0]
+
+        Student.query.get(top_id).team_id = 2
+        db.session.commit()
+        self.assertNotIn(top_id, [sid for sid, _ in roommate_matcher.top_matches(student)])
+        self.assertEqual(roommate_matcher.top_matches(student), self._legacy_top(student))
+
+    def test_pool_reloads_after_ttl(self):
+        student = Student.query.filter_by(current_bed_id=None, team_id=None).first()
+        before = roommate_matcher.top_matches(student)
+        # 绕过 ORM 的写入（例如其他进程）：所有候选人都分配了床位
+        db.session.execute(Student.__table__.update().where(Student.id != student.id).values(current_bed_id=1))
+        db.session.commit()
+        self.assertEqual(roommate_matcher.top_matches(student), before)
+
+        self.app.config['ROOMMATE_CACHE_TTL'] = 0
+        roommate_matcher._expires_at = 0.0
+        self.assertEqual(roommate_matcher.top_matches(student), [])
+
+    def test_cache_stays_consistent_under_changes(self):
+        rng = random.Random(7)
+        students = Student.query.order_by(Student.id).all()
+        viewers = students[:60]
+        for student in viewers:
+            roommate_matcher.top_matches(student)
+
+        for _ in range(80):
+            student = rng.choice(students)
+            action = rng.choice(['profile', 'bed', 'team', 'release'])
+            if action == 'profile':
+                student.sleep_time = rng.choice(['早睡', '正常', '晚睡', None])
+                student.quietness = rng.choice([1, 2, 3, 4, 5, None])
+            elif action == 'bed':
+                student.current_bed_id = 1000 + student.id
+            elif action == 'team':
+                student.team_id = 3
+            else:
+                student.current_bed_id = None
+                student.team_id = None
+            db.session.commit()
+
+            for viewer in viewers:
+                self.assertEqual(roommate_matcher.top_matches(viewer), self._legacy_top(viewer))
+
+    def test_new_student_enters_cached_results(self):
+        student = Student.query.filter_by(team_id=None, current_bed_id=None, gender='男').first()
+        roommate_matcher.top_matches(student)
+
+        user = User(username='new', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        twin = Student(user_id=user.id, student_id='S-new', name='新生', id_card='110101200001010001',
+                       gender='男', sleep_time=student.sleep_time, wake_time=student.wake_time,
+                       quietness=student.quietness or 3, cleanliness=student.cleanliness or 3)
+        db.session.add(twin)
+        db.session.commit()
+
+        self.assertIn(twin.id, [sid for sid, _ in roommate_matcher.top_matches(student)])
+        self.assertEqual(roommate_matcher.top_matches(student), self._legacy_top(student))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import text
+from models.database import db, BedStatus
+from models.user import User, Student
+from models.dormitory import Building, Dormitory, Bed
+from models.application import DormApplication, DormTeam, SelectionBatch
+from services.bed_index import bed_index
+from services.dorm_profile import dorm_profiles
+from services.selection_rush import SelectionLedger, ClaimRejected, SUBMITTED, FAILED
+
+
+class TestSelectionLedger(unittest.TestCase):
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + self.db_path
+        db.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        bed_index.reset()
+        dorm_profiles.reset()
+
+        building = Building(name='男生楼', gender='男', total_floors=6)
+        db.session.add(building)
+        db.session.flush()
+        dorm = Dormitory(building_id=building.id, room_number='0301', floor=3, capacity=4)
+        db.session.add(dorm)
+        db.session.flush()
+        for number in range(1, 5):
+            db.session.add(Bed(dorm_id=dorm.id, bed_number=number, status=BedStatus.AVAILABLE.value))
+        self.student_ids = []
+        for i in range(3):
+            user = User(username=f'u{i}', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            student = Student(user_id=user.id, student_id=f'S{i}', name='测试',
+                              id_card='110101200001010001', gender='男')
+            db.session.add(student)
+            db.session.flush()
+            self.student_ids.append(student.id)
+        now = datetime.utcnow()
+        self.batch = SelectionBatch(name='测试批次', start_time=now - timedelta(minutes=1),
+                                    end_time=now + timedelta(hours=1))
+        db.session.add(self.batch)
+        db.session.commit()
+        self.bed_ids = [bed.id for bed in Bed.query.order_by(Bed.id)]
+        self.dorm_id = dorm.id
+        self.ledger = SelectionLedger(flush_interval=60)
+
+    def tearDown(self):
+        self.ledger.close()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        bed_index.reset()
+        dorm_profiles.reset()
+        os.remove(self.db_path)
+
+    def test_claims_are_exclusive_and_flushed_together(self):
+        self.ledger.open(self.app, self.batch)
+        first, second, third = self.student_ids
+        self.ledger.claim(first, self.bed_ids[0], self.dorm_id, '男')
+        with self.assertRaises(ClaimRejected):
+            self.ledger.claim(second, self.bed_ids[0], self.dorm_id, '男')
+        with self.assertRaises(ClaimRejected):
+            self.ledger.claim(first, self.bed_ids[1], self.dorm_id, '男')
+        self.ledger.claim(second, self.bed_ids[1], self.dorm_id, '男')
+
+        # 床位与宿舍不符、性别不符
+        with self.assertRaises(ClaimRejected):
+            self.ledger.claim(third, self.bed_ids[2], self.dorm_id + 1, '男')
+        with self.assertRaises(ClaimRejected):
+            self.ledger.claim(third, self.bed_ids[2], self.dorm_id, '女')
+
+        # 写回前床位被其他进程直接占用
+        Bed.query.filter_by(id=self.bed_ids[1]).update({'status': BedStatus.OCCUPIED.value})
+        db.session.commit()
+
+        self.assertEqual(self.ledger.flush(), 1)
+        self.assertEqual(self.ledger.status(first), (SUBMITTED, self.bed_ids[0]))
+        self.assertEqual(self.ledger.status(second), (FAILED, self.bed_ids[1]))
+        self.assertIsNone(self.ledger.status(third))
+        self.assertEqual(self.ledger.stats['commits'], 1)
+
+        db.session.expire_all()
+        self.assertEqual(DormApplication.query.filter_by(bed_id=self.bed_ids[0]).count(), 1)
+        self.assertEqual(DormApplication.query.count(), 1)
+        self.assertEqual(db.session.get(Bed, self.bed_ids[0]).status, BedStatus.RESERVED.value)
+
+        # 失败的学生可以重新抢床
+        self.ledger.claim(second, self.bed_ids[2], self.dorm_id, '男')
+
+    def test_failing_row_does_not_block_the_batch(self):
+        self.ledger.open(self.app, self.batch)
+        first, second, third = self.student_ids
+        # 数据库拒绝为 second 插入申请（非床位冲突的错误）
+        db.session.execute(text(
+            f"CREATE TRIGGER reject_second BEFORE INSERT ON dorm_applications WHEN NEW.student_id = {second} "
+            "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+        ))
+        db.session.commit()
+        for student_id, bed_id in zip(self.student_ids, self.bed_ids):
+            self.ledger.claim(student_id, bed_id, self.dorm_id, '男')
+
+        self.assertEqual(self.ledger.flush(), 2)
+        self.assertEqual(self.ledger.status(first), (SUBMITTED, self.bed_ids[0]))
+        self.assertEqual(self.ledger.status(second), (FAILED, self.bed_ids[1]))
+        self.assertEqual(self.ledger.status(third), (SUBMITTED, self.bed_ids[2]))
+        self.assertEqual(self.ledger.stats['errors'], 1)
+        self.assertEqual(self.ledger.flush(), 0)
+
+        db.session.expire_all()
+        self.assertEqual(DormApplication.query.count(), 2)
+        self.assertEqual(db.session.get(Bed, self.bed_ids[1]).status, BedStatus.AVAILABLE.value)
+        # 床位没有被预留，仍可重新抢
+        self.ledger.claim(second, self.bed_ids[1], self.dorm_id, '男')
+
+    def test_closed_window_rejects_claims(self):
+        self.batch.end_time = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        self.ledger.open(self.app, self.batch)
+        with self.assertRaises(ClaimRejected):
+            self.ledger.claim(self.student_ids[0], self.bed_ids[0], self.dorm_id, '男')
+
+    def test_ledger_is_not_taken_over_by_another_open_batch(self):
+        now = datetime.utcnow()
+        other = SelectionBatch(name='其他年级', start_time=now - timedelta(minutes=1),
+                               end_time=now + timedelta(hours=1), grade=2024)
+        db.session.add(other)
+        db.session.commit()
+        self.assertTrue(self.ledger.open(self.app, self.batch))
+        self.assertFalse(self.ledger.open(self.app, other))
+        self.assertEqual(self.ledger.batch_id, self.batch.id)
+        self.assertTrue(self.ledger.open(self.app, self.batch))
+
+
+if __name__ == '__main__':
+    unittest.main()
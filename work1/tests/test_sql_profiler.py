@@ -0,0 +1,74 @@
+import unittest
+from sqlalchemy import text
+from app import create_app
+from models.database import db, UserRole
+from models.user import User
+from utils.sql_profiler import sql_profiler
+
+
+class TestSQLProfiler(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            admin = User(username='admin', password_hash='x', role=UserRole.ADMIN.value)
+            student = User(username='student', password_hash='x', role=UserRole.STUDENT.value)
+            db.session.add_all([admin, student])
+            db.session.commit()
+            self.admin_id, self.student_id = admin.id, student.id
+        sql_profiler.reset()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+        sql_profiler.reset()
+
+    def _login(self, user_id):
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+    def test_server_timing_and_endpoint_stats(self):
+        response = self.client.get('/api/dorms/available')
+        timing = response.headers.getlist('Server-Timing')
+        self.assertTrue(timing[0].startswith('db;dur='))
+        self.assertIn('desc="1 queries"', timing[0])
+
+        self.client.get('/api/dorms/available')
+        stats = sql_profiler.snapshot()['api_available_dorms']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['queries_max'], 1)
+        self.assertTrue(stats['slowest'][0]['statement'].startswith('SELECT'))
+
+    def test_slow_query_log_omits_parameter_values(self):
+        self.addCleanup(setattr, sql_profiler, 'slow_ms', sql_profiler.slow_ms)
+        sql_profiler.slow_ms = 0
+        with self.assertLogs('dorm_system.slow_sql', 'WARNING') as logs:
+            self.client.post('/login', data={'username': 'admin', 'password': 'wrong-secret'})
+        self.assertTrue(any('users.username' in line for line in logs.output))
+        self.assertFalse(any('wrong-secret' in line or "'admin'" in line for line in logs.output))
+
+        # 出错的语句也弹出开始时间，不影响之后的计时
+        with self.app.test_request_context():
+            self.app.preprocess_request()
+            with self.assertRaises(Exception):
+                db.session.execute(text('SELECT * FROM no_such_table'))
+            db.session.rollback()
+            connection = db.session.connection()
+            self.assertEqual(connection.info.get('sql_profiler_start'), [])
+
+    def test_profile_endpoint_is_admin_only(self):
+        self._login(self.student_id)
+        self.assertEqual(self.client.get('/admin/sql-profile').status_code, 403)
+
+        self._login(self.admin_id)
+        self.client.get('/api/dorms/available')
+        data = self.client.get('/admin/sql-profile').get_json()
+        self.assertIn('api_available_dorms', data['endpoints'])
+        self.client.delete('/admin/sql-profile')
+        self.assertNotIn('api_available_dorms', sql_profiler.snapshot())
+
+
+if __name__ == '__main__':
+    unittest.main()
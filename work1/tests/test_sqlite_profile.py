@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from flask import Flask
+from config.config import DevelopmentConfig, ProductionConfig, TestingConfig
+from models.database import db
+from utils.sqlite_profile import configure_sqlite, current_pragmas
+
+
+class TestSQLiteProfile(unittest.TestCase):
+    def _app(self, uri, config):
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = uri
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.SQLALCHEMY_ENGINE_OPTIONS
+        app.config['SQLITE_PRAGMAS'] = config.SQLITE_PRAGMAS
+        db.init_app(app)
+        configure_sqlite(app)
+        return app
+
+    def test_file_database_uses_wal_profile(self):
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app = self._app('sqlite:///' + db_path, ProductionConfig)
+        try:
+            with app.app_context():
+                pragmas = current_pragmas()
+                self.assertEqual(pragmas['journal_mode'], 'wal')
+                self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+                self.assertEqual(pragmas['busy_timeout'], ProductionConfig.SQLITE_PRAGMAS['busy_timeout'])
+                self.assertEqual(db.engine.pool.size(), ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS['pool_size'])
+                db.session.remove()
+                db.engine.dispose()
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+    def test_development_database_keeps_default_journal(self):
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app = self._app('sqlite:///' + db_path, DevelopmentConfig)
+        try:
+            with app.app_context():
+                self.assertEqual(current_pragmas()['journal_mode'], 'delete')
+                db.session.remove()
+                db.engine.dispose()
+            self.assertFalse(os.path.exists(db_path + '-wal'))
+        finally:
+            os.remove(db_path)
+
+    def test_memory_database_is_left_alone(self):
+        app = self._app('sqlite:///:memory:', TestingConfig)
+        with app.app_context():
+            self.assertEqual(current_pragmas()['journal_mode'], 'memory')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import text
+from app import create_app
+from models.database import db, UserRole, BedStatus
+from models.user import User, Student, Major
+from models.dormitory import Building, Dormitory, Bed
+from services.bed_index import bed_index
+from services.dorm_profile import dorm_profiles
+from services.student_import import import_jobs, import_students
+from werkzeug.security import check_password_hash
+
+HEADER = 'username,password,student_id,name,id_card,gender,major_code,quietness\n'
+
+
+def make_csv(count, start=0, gender='男'):
+    return ''.join(f'imp{i},pw{i},I{i:05d},学生{i},11010120000101{i:04d},{gender},CS,3\n'
+                   for i in range(start, start + count))
+
+
+class TestStudentImport(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.job_dir = tempfile.mkdtemp()
+        self.app.config['STUDENT_IMPORT_JOB_DIR'] = self.job_dir
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        bed_index.reset()
+        dorm_profiles.reset()
+        db.session.add(Major(name='计算机', code='CS'))
+        admin = User(username='admin', password_hash='x', role=UserRole.ADMIN.value)
+        db.session.add(admin)
+        db.session.flush()
+        db.session.add(Student(user_id=admin.id, student_id='OLD001', name='老生',
+                               id_card='110101200001010001', gender='男'))
+        building = Building(name='1号楼', gender='男', total_floors=6)
+        db.session.add(building)
+        db.session.flush()
+        dorm = Dormitory(building_id=building.id, room_number='101', floor=1, capacity=4)
+        db.session.add(dorm)
+        db.session.flush()
+        for number in range(1, 5):
+            db.session.add(Bed(dorm_id=dorm.id, bed_number=number, status=BedStatus.AVAILABLE.value))
+        db.session.commit()
+        self.admin_id = admin.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        bed_index.reset()
+        dorm_profiles.reset()
+        shutil.rmtree(self.job_dir)
+
+    def test_chunks_report_per_row_errors(self):
+        content = HEADER + make_csv(5) + ''.join([
+            'imp0,pw,I99999,重复用户名,110101200001019999,男,CS,3\n',   # 第 7 行：文件内重复
+            'admin,pw,I99998,已有用户,110101200001019998,男,CS,3\n',    # 第 8 行：数据库中已有
+            'new1,pw,OLD001,已有学号,110101200001019997,男,CS,3\n',     # 第 9 行
+            'new2,pw,I99996,坏身份证,12345,男,CS,3\n',                  # 第 10 行
+            'new3,pw,I99995,坏性别,110101200001019995,未知,CS,3\n',     # 第 11 行
+            'new4,pw,I99994,坏专业,110101200001019994,男,XX,3\n',       # 第 12 行
+            'new5,,I99993,缺密码,110101200001019993,男,CS,3\n',         # 第 13 行
+            '\n',
+            'new6,pw,I99992,安静9,110101200001019992,男,CS,9\n',        # 第 15 行
+        ])
+        result = import_students(io.StringIO(content), chunk_size=3, workers=1)
+        self.assertEqual((result['total'], result['imported'], result['failed']), (13, 5, 8))
+        self.assertEqual([error['line'] for error in result['errors']], [7, 8, 9, 10, 11, 12, 13, 15])
+        self.assertIn('在文件中重复', result['errors'][0]['message'])
+        self.assertIn('已存在', result['errors'][1]['message'])
+        self.assertIn('已被注册', result['errors'][2]['message'])
+        self.assertGreater(result['rate'], 0)
+
+        student = Student.query.filter_by(student_id='I00003').one()
+        self.assertEqual((student.user.username, student.major.code, student.quietness), ('imp3', 'CS', 3))
+        self.assertEqual(student.user.role, UserRole.STUDENT.value)
+        self.assertTrue(check_password_hash(student.user.password_hash, 'pw3'))
+
+    def test_failed_chunk_is_retried_row_by_row(self):
+        # 数据库层面的约束（校验阶段查不出来）：第 4 行与第 2 行身份证号重复
+        db.session.execute(text('CREATE UNIQUE INDEX ux_students_id_card ON students (id_card)'))
+        db.session.commit()
+        content = (HEADER + make_csv(2, start=10) + 'dup,pw,I90000,重复身份证,110101200001010010,男,CS,3\n'
+                   + make_csv(1, start=15))
+        result = import_students(io.StringIO(content), chunk_size=10, workers=1)
+        self.assertEqual((result['total'], result['imported'], result['failed']), (4, 3, 1))
+        self.assertEqual(result['errors'], [
+            {'line': 4, 'message': '写入失败: UNIQUE constraint failed: students.id_card'}])
+        self.assertEqual(sorted(s.student_id for s in Student.query.filter(Student.student_id.like('I%'))),
+                         ['I00010', 'I00011', 'I00015'])
+        self.assertIsNone(User.query.filter_by(username='dup').first())
+
+    def test_process_pool_and_auto_assign(self):
+        content = '学号,用户名,密码,姓名,身份证号,性别\n' + ''.join(
+            f'P{i:05d},pool{i},secret{i},学生{i},11010120000101{i:04d},男\n' for i in range(20))
+        result = import_students(io.StringIO(content), chunk_size=100, workers=2,
+                                 assign=True, preferred_capacity=4)
+        self.assertEqual((result['imported'], result['failed']), (20, 0))
+        self.assertEqual((result['assigned'], result['unassigned']), (4, 16))
+        user = User.query.filter_by(username='pool12').one()
+        self.assertTrue(check_password_hash(user.password_hash, 'secret12'))
+        self.assertEqual(Bed.query.filter_by(status=BedStatus.OCCUPIED.value).count(), 4)
+
+    def test_admin_upload(self):
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.admin_id)
+            session['_fresh'] = True
+        data = {'file': (io.BytesIO(('\ufeff' + HEADER + make_csv(3)).encode('utf-8')), 'students.csv'),
+                'assign': '1'}
+        response = self.client.post('/admin/students/import', data=data)
+        self.assertEqual(response.status_code, 202)
+        job = response.get_json()
+        self.assertEqual(job['total'], 3)
+        import_jobs.wait(job['id'], timeout=60)
+        status = self.client.get(job['status_url']).get_json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual((status['result']['imported'], status['result']['assigned']), (3, 3))
+        self.assertEqual(sorted(os.listdir(self.job_dir)), [f"{job['id']}.json"])
+
+        bad = {'file': (io.BytesIO(b'name,gender\n'), 'bad.csv')}
+        self.assertEqual(self.client.post('/admin/students/import', data=bad).status_code, 400)
+        self.app.config['STUDENT_IMPORT_MAX_ROWS'] = 2
+        big = {'file': (io.BytesIO((HEADER + make_csv(3, start=10)).encode('utf-8')), 'big.csv')}
+        self.assertEqual(self.client.post('/admin/students/import', data=big).status_code, 400)
+        self.assertEqual(self.client.get('/admin/students/import/' + 'f' * 32).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,404 @@
+"""
+Prometheus 文本格式的运行指标（/metrics）
+
+不依赖外部服务：计数器、直方图都保存在进程内，更新时只持有一把很短的锁。
+- 请求延迟直方图按 blueprint / endpoint 分组（核心页面路由没有蓝图，记为 core）；
+- 业务计数：打卡、选宿抢床与冲突、申请审批结果，床位状态冲突；
+- 抓取时读取：连接池使用情况、各楼栋床位状态（来自楼栋计数列，一条查询）。
+
+多个 gunicorn worker 时设置 METRICS_MULTIPROC_DIR：每个进程定期把自己的计数写到 <目录>/<pid>.json，
+/metrics 汇总目录下所有文件——计数器和直方图累加（已退出进程的计数保留），
+仪表只累加仍存活的进程。其他 worker 的数据最多滞后 METRICS_FLUSH_INTERVAL 秒。
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import Response, abort, current_app, g, request
+from flask_login import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models.database import db, BedStatus, ApplicationStatus, UserRole
+from models.application import DormApplication
+from utils.process import pid_alive
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_PENDING_KEY = 'metrics_application_changes'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{_escape(v)}"' for n, v in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name} 需要标签 {self.labels}')
+        return tuple(str(labels[n]) for n in self.labels)
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [各桶计数（非累计，最后一个是 +Inf）, 总和, 次数]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+
+class MinuteRate(_Metric):
+    """最近 60 秒内的事件数（按秒分桶的环形数组），导出为仪表"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self._slots = [0] * 60
+        self._stamps = [0] * 60
+
+    def mark(self, amount=1):
+        second = int(time.time())
+        slot = second % 60
+        with self._lock:
+            if self._stamps[slot] != second:
+                self._stamps[slot] = second
+                self._slots[slot] = 0
+            self._slots[slot] += amount
+
+    def dump(self):
+        now = int(time.time())
+        with self._lock:
+            total = sum(n for n, stamp in zip(self._slots, self._stamps) if now - stamp < 60)
+        return [[[], total]]
+
+    def clear(self):
+        with self._lock:
+            self._slots = [0] * 60
+            self._stamps = [0] * 60
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._engines = []
+        self._dir = None
+        self._flush_interval = 5.0
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+
+        self.request_latency = self._add(Histogram(
+            'dorm_http_request_duration_seconds', '请求处理耗时', ('blueprint', 'endpoint')))
+        self.requests = self._add(Counter(
+            'dorm_http_requests_total', '请求数', ('blueprint', 'endpoint', 'status')))
+        self.checkins = self._add(Counter('dorm_checkins_total', '打卡成功次数'))
+        self.checkins_per_minute = self._add(MinuteRate('dorm_checkins_last_minute', '最近一分钟打卡次数'))
+        self.selection_claims = self._add(Counter(
+            'dorm_selection_claims_total', '高峰模式抢床结果', ('result',)))
+        self.selection_writebacks = self._add(Counter(
+            'dorm_selection_writebacks_total', '高峰模式写回结果（conflict 为写回时床位已被占用，error 为写回出错）', ('result',)))
+        self.bed_conflicts = self._add(Counter(
+            'dorm_bed_conflicts_total', '床位状态条件更新失败次数', ('target',)))
+        self.applications = self._add(Counter(
+            'dorm_applications_processed_total', '申请审批结果', ('type', 'status')))
+        self.pool_size = self._add(Gauge('dorm_db_pool_size', '连接池大小'))
+        self.pool_checked_out = self._add(Gauge('dorm_db_pool_checked_out', '正在使用的连接数'))
+        self.pool_overflow = self._add(Gauge('dorm_db_pool_overflow', '超出连接池大小的连接数'))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def record_checkin(self):
+        self.checkins.inc()
+        self.checkins_per_minute.mark()
+
+    def collector(self, func):
+        """注册抓取时执行的函数，返回 [(名称, 类型, 说明, 标签名, [(标签值, 数值)])]，不参与多进程汇总"""
+        self._collectors.append(func)
+        return func
+
+    # ---- Flask 集成 ----
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        self._dir = app.config.get('METRICS_MULTIPROC_DIR')
+        self._flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', self._flush_interval)
+        if self._dir:
+            os.makedirs(self._dir, exist_ok=True)
+        with app.app_context():
+            self._engines = list(db.engines.values())
+
+        @app.before_request
+        def _start_timer():
+            g.metrics_started = time.perf_counter()
+            if self._dir:
+                self._ensure_flusher()
+
+        @app.after_request
+        def _record_request(response):
+            self._observe_request(response.status_code)
+            return response
+
+        @app.teardown_request
+        def _record_failure(exc):
+            # 未处理的异常不会经过 after_request
+            if exc is not None:
+                self._observe_request(500)
+
+        def metrics_view():
+            # 抓取程序带 METRICS_TOKEN；没有配置令牌时只允许已登录的管理员查看
+            token = current_app.config.get('METRICS_TOKEN')
+            if token:
+                if request.headers.get('Authorization') != f'Bearer {token}':
+                    abort(403)
+            elif not (current_user.is_authenticated and current_user.role == UserRole.ADMIN.value):
+                abort(403)
+            return Response(self.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    def _observe_request(self, status):
+        started = g.pop('metrics_started', None)
+        if started is None or request.endpoint in (None, 'static', 'metrics'):
+            return
+        blueprint = request.blueprint or 'core'
+        self.request_latency.observe(time.perf_counter() - started, blueprint=blueprint, endpoint=request.endpoint)
+        self.requests.inc(blueprint=blueprint, endpoint=request.endpoint, status=status)
+
+    # ---- 输出 ----
+
+    def _update_pool_gauges(self):
+        size = checked_out = overflow = 0
+        for engine in self._engines:
+            pool = engine.pool
+            if hasattr(pool, 'checkedout'):
+                size += pool.size()
+                checked_out += pool.checkedout()
+                overflow += max(pool.overflow(), 0)
+        self.pool_size.set(size)
+        self.pool_checked_out.set(checked_out)
+        self.pool_overflow.set(overflow)
+
+    def _snapshot(self):
+        self._update_pool_gauges()
+        return {m.name: m.dump() for m in self._metrics}
+
+    def _merged(self):
+        """本进程或多进程汇总后的 {指标名: {标签值元组: 数值}}"""
+        if not self._dir:
+            return {name: {tuple(k): v for k, v in samples} for name, samples in self._snapshot().items()}
+
+        self.flush()
+        kinds = {m.name: m.kind for m in self._metrics}
+        merged = {m.name: {} for m in self._metrics}
+        for path in glob.glob(os.path.join(self._dir, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = pid_alive(data.get('pid'))
+            for name, samples in data.get('metrics', {}).items():
+                kind = kinds.get(name)
+                if kind is None or (kind == 'gauge' and not alive):
+                    continue
+                target = merged[name]
+                for labels, value in samples:
+                    key = tuple(labels)
+                    if kind == 'histogram':
+                        entry = target.setdefault(key, [[0] * len(value[0]), 0.0, 0])
+                        entry[0] = [a + b for a, b in zip(entry[0], value[0])]
+                        entry[1] += value[1]
+                        entry[2] += value[2]
+                    else:
+                        target[key] = target.get(key, 0) + value
+        return merged
+
+    def render(self):
+        lines = []
+        merged = self._merged()
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for key, value in sorted(merged[metric.name].items()):
+                if metric.kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), value[0]):
+                        cumulative += count
+                        labels = _format_labels(metric.labels, key, [('le', _format_value(bound))])
+                        lines.append(f'{metric.name}_bucket{labels} {cumulative}')
+                    labels = _format_labels(metric.labels, key)
+                    lines.append(f'{metric.name}_sum{labels} {_format_value(value[1])}')
+                    lines.append(f'{metric.name}_count{labels} {value[2]}')
+                else:
+                    lines.append(f'{metric.name}{_format_labels(metric.labels, key)} {_format_value(value)}')
+
+        for collect in self._collectors:
+            for name, kind, help_text, label_names, samples in collect():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for values, value in samples:
+                    lines.append(f'{name}{_format_labels(label_names, values)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    # ---- 多进程文件 ----
+
+    def flush(self):
+        """把本进程的指标写入共享目录（先写临时文件再替换，读取方不会读到半个文件）"""
+        if not self._dir:
+            return
+        pid = os.getpid()
+        path = os.path.join(self._dir, f'{pid}.json')
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'pid': pid, 'metrics': self._snapshot()}, f)
+        os.replace(tmp, path)
+
+    def _ensure_flusher(self):
+        # gunicorn 在 fork 之后才处理请求，按 pid 判断，每个 worker 启动自己的写文件线程
+        if self._flusher_pid == os.getpid():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self._flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.clear()
+
+
+metrics = MetricsRegistry()
+
+
+@atexit.register
+def _final_flush():
+    if metrics._dir and metrics._flusher_pid == os.getpid():
+        try:
+            metrics.flush()
+        except OSError:
+            pass
+
+
+@metrics.collector
+def _bed_gauges():
+    """各楼栋床位状态，读楼栋计数列"""
+    from models.dormitory import Building
+    rows = db.session.query(
+        Building.name, Building.available_count, Building.reserved_count, Building.occupied_count
+    ).order_by(Building.id).all()
+    samples = []
+    for name, available, reserved, occupied in rows:
+        samples.append(((name, BedStatus.AVAILABLE.value), available or 0))
+        samples.append(((name, BedStatus.RESERVED.value), reserved or 0))
+        samples.append(((name, BedStatus.OCCUPIED.value), occupied or 0))
+    total = sum(value for _, value in samples)
+    occupied = sum(value for (_, status), value in samples if status == BedStatus.OCCUPIED.value)
+    return [
+        ('dorm_beds', 'gauge', '各楼栋床位数（按状态）', ('building', 'status'), samples),
+        ('dorm_occupancy_ratio', 'gauge', '全校入住率', (), [((), occupied / total if total else 0)]),
+    ]
+
+
+# ---- 申请审批：在 flush 时记录状态变化，提交后计数 ----
+
+_FINAL_STATUSES = (ApplicationStatus.APPROVED.value, ApplicationStatus.REJECTED.value)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_application_changes(session, flush_context):
+    for obj in session.dirty:
+        if isinstance(obj, DormApplication) and obj.status in _FINAL_STATUSES:
+            history = inspect(obj).attrs.status.history
+            if history.has_changes():
+                session.info.setdefault(_PENDING_KEY, []).append((obj.application_type or 'unknown', obj.status))
+
+
+@event.listens_for(Session, 'after_commit')
+def _count_applications(session):
+    for application_type, status in session.info.pop(_PENDING_KEY, ()):
+        metrics.applications.inc(type=application_type, status=status)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_applications(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,19 @@
+"""
+进程相关的小工具
+"""
+import os
+
+
+def pid_alive(pid):
+    """pid 对应的进程是否仍在运行（无权限发信号的进程视为在运行）"""
+    if not pid:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,47 @@
+"""
+SQL 语句计数
+
+    with count_queries() as counter:
+        client.get('/admin/students')
+    print(counter.count, counter.statements)
+
+在当前应用的引擎上监听 before_cursor_execute，统计 with 块内执行的 SQL 条数（需要在应用上下文中使用）。
+"""
+import threading
+
+from sqlalchemy import event
+
+from models.database import db
+
+
+class QueryCounter:
+    """统计 with 块内当前线程执行的 SQL 语句"""
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.statements = []
+        self._thread = None
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # 只统计进入 with 块的线程，其他请求线程（如后台写回）不计入
+        if threading.get_ident() == self._thread:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        if self.engine is None:
+            self.engine = db.engine
+        self._thread = threading.get_ident()
+        event.listen(self.engine, 'before_cursor_execute', self._before_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_execute)
+        return False
+
+
+def count_queries(engine=None):
+    return QueryCounter(engine)
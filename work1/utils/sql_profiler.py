@@ -0,0 +1,174 @@
+"""
+请求级 SQL 性能统计
+
+在引擎的 before/after_cursor_execute 事件上计时，每个请求记录：
+- SQL 条数、数据库总耗时、最慢的几条语句；
+- 响应头 Server-Timing（浏览器开发者工具的 Timing 面板可直接查看）；
+- 超过 SQL_SLOW_QUERY_MS 的语句写入慢查询日志（只记录参数个数，不记录参数值，避免密码哈希、身份证号等落盘）；
+- 按端点保留最近 SQL_PROFILE_WINDOW 个请求的滚动统计，管理员可通过 /admin/sql-profile 查看。
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from models.database import db
+
+SLOWEST_PER_REQUEST = 3   # 每个请求保留的最慢语句数
+SLOWEST_PER_ENDPOINT = 5  # 每个端点汇总展示的最慢语句数
+STATEMENT_LIMIT = 500     # 记录语句时截断的长度
+
+slow_query_logger = logging.getLogger('dorm_system.slow_sql')
+
+
+class _EndpointStats:
+    """单个端点最近若干请求的统计"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)  # (SQL 条数, 数据库耗时ms, 请求耗时ms)
+        self.slowest = []                    # (耗时ms, 语句)，按耗时降序
+        self.requests = 0
+
+    def add(self, count, db_ms, total_ms, statements):
+        self.requests += 1
+        self.samples.append((count, db_ms, total_ms))
+        merged = {}
+        for duration, statement in self.slowest + statements:
+            merged[statement] = max(duration, merged.get(statement, 0))
+        self.slowest = sorted(((d, s) for s, d in merged.items()), reverse=True)[:SLOWEST_PER_ENDPOINT]
+
+    def summary(self):
+        counts = sorted(s[0] for s in self.samples)
+        db_times = sorted(s[1] for s in self.samples)
+        totals = [s[2] for s in self.samples]
+        n = len(self.samples)
+        return {
+            'requests': self.requests,
+            'window': n,
+            'queries_avg': round(sum(counts) / n, 2),
+            'queries_max': counts[-1],
+            'db_ms_avg': round(sum(db_times) / n, 2),
+            'db_ms_p95': round(db_times[min(n - 1, int(n * 0.95))], 2),
+            'db_ms_max': round(db_times[-1], 2),
+            'total_ms_avg': round(sum(totals) / n, 2),
+            'slowest': [{'ms': round(d, 2), 'statement': s} for d, s in self.slowest],
+        }
+
+
+class SQLProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.window = 500
+        self.slow_ms = 200.0
+
+    def init_app(self, app):
+        if not app.config.get('SQL_PROFILER_ENABLED', True):
+            return
+        self.window = app.config.get('SQL_PROFILE_WINDOW', self.window)
+        self.slow_ms = app.config.get('SQL_SLOW_QUERY_MS', self.slow_ms)
+        self._configure_log(app.config.get('SQL_SLOW_QUERY_LOG'))
+
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_execute)
+            event.listen(engine, 'handle_error', self._on_error)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _configure_log(self, path):
+        if not path or any(getattr(h, 'baseFilename', None) == os.path.abspath(path)
+                           for h in slow_query_logger.handlers):
+            return
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=5 * 1024 * 1024, backupCount=5, encoding='utf-8', delay=True)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.WARNING)
+
+    # ---- SQLAlchemy 事件 ----
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('sql_profiler_start', []).append(time.perf_counter())
+
+    def _on_error(self, context):
+        # 语句执行出错时不会触发 after_cursor_execute，弹出对应的开始时间
+        conn = context.connection
+        if context.execution_context is None or conn is None:
+            return
+        starts = conn.info.get('sql_profiler_start')
+        if starts:
+            starts.pop()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('sql_profiler_start')
+        if not starts:
+            return
+        duration = (time.perf_counter() - starts.pop()) * 1000
+        if not has_request_context():
+            return
+        profile = g.get('sql_profile')
+        if profile is None:
+            return
+        profile['count'] += 1
+        profile['db_ms'] += duration
+        slowest = profile['slowest']
+        if len(slowest) < SLOWEST_PER_REQUEST or duration > slowest[-1][0]:
+            slowest.append((duration, statement[:STATEMENT_LIMIT]))
+            slowest.sort(reverse=True)
+            del slowest[SLOWEST_PER_REQUEST:]
+        if duration >= self.slow_ms:
+            slow_query_logger.warning('%.1fms %s %s | %s | %s', duration, request.method, request.path,
+                                      ' '.join(statement.split())[:STATEMENT_LIMIT],
+                                      _describe_parameters(parameters, executemany))
+
+    # ---- Flask 请求钩子 ----
+
+    def _start_request(self):
+        g.sql_profile = {'count': 0, 'db_ms': 0.0, 'slowest': [], 'started': time.perf_counter()}
+
+    def _finish_request(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        total_ms = (time.perf_counter() - profile['started']) * 1000
+        response.headers.add('Server-Timing', f'db;dur={profile["db_ms"]:.2f};desc="{profile["count"]} queries"')
+        response.headers.add('Server-Timing', f'app;dur={total_ms:.2f}')
+
+        endpoint = request.endpoint or 'unknown'
+        if endpoint != 'static':
+            with self._lock:
+                stats = self._stats.get(endpoint)
+                if stats is None:
+                    stats = self._stats[endpoint] = _EndpointStats(self.window)
+                stats.add(profile['count'], profile['db_ms'], total_ms, profile['slowest'])
+        return response
+
+    def snapshot(self, order_by='db_ms_avg'):
+        """按端点返回滚动统计，默认按平均数据库耗时降序"""
+        with self._lock:
+            result = {endpoint: stats.summary() for endpoint, stats in self._stats.items()}
+        return dict(sorted(result.items(), key=lambda item: item[1].get(order_by, 0), reverse=True))
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+
+def _describe_parameters(parameters, executemany):
+    """参数的个数（批量执行时另加行数），不含参数值"""
+    if executemany:
+        rows = list(parameters)
+        return f'{len(rows)} 行 × {len(rows[0]) if rows else 0} 个参数'
+    return f'{len(parameters or ())} 个参数'
+
+
+sql_profiler = SQLProfiler()
@@ -0,0 +1,56 @@
+"""
+SQLite 连接配置
+
+默认的回滚日志模式下，每次 db.session.commit() 都要拿整库写锁，打卡、选宿高峰时读请求会被阻塞。
+configure_sqlite 在引擎的 connect 事件上挂钩子，每个新连接建立时执行 SQLITE_PRAGMAS：
+开启 WAL、调整 synchronous、页缓存、内存映射和 busy_timeout。非 SQLite 数据库不做处理。
+"""
+from sqlalchemy import event
+
+from models.database import db
+
+
+def is_file_sqlite(url):
+    """是否为文件型 SQLite 数据库（内存数据库不支持 WAL）"""
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def configure_sqlite(app):
+    """为应用的 SQLite 引擎注册 PRAGMA 钩子，需要在 db.init_app(app) 之后调用"""
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        if not is_file_sqlite(engine.url):
+            continue
+
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            apply_pragmas(dbapi_connection, pragmas)
+
+
+def current_pragmas(names=('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'busy_timeout')):
+    """读取当前连接上实际生效的 PRAGMA，便于核对配置"""
+    connection = db.session.connection().connection
+    cursor = connection.cursor()
+    try:
+        result = {}
+        for name in names:
+            row = cursor.execute(f'PRAGMA {name}').fetchone()
+            result[name] = row[0] if row else None  # 内存数据库不支持 mmap_size，没有返回值
+        return result
+    finally:
+        cursor.close()
@@ -0,0 +1,17 @@
+"""
+按数据库方言选择支持 ON CONFLICT 的 insert()
+
+SQLite 和 PostgreSQL 的 insert() 带有 on_conflict_do_update / on_conflict_do_nothing，
+其他数据库返回 None，调用方改为先查询再写入。
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+_UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def upsert_insert(session):
+    """会话所连数据库的 insert() 构造函数，不支持 ON CONFLICT 时返回 None"""
+    return _UPSERT_INSERTS.get(session.get_bind().dialect.name)